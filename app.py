@@ -1,17 +1,52 @@
-from fastapi import Depends, Query, HTTPException, FastAPI
+from fastapi import Depends, Query, Header, HTTPException, FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import Session, select, SQLModel, update
+from sqlmodel import Session, select, update
 from typing import Annotated
+from contextlib import nullcontext
 from cryptography.fernet import Fernet
 import httpx
-
-from core.db import get_dialect_table_names, engine, get_session
-from core.llm import answer_my_question
+import os
+import time
+
+# first: importing core.startup loads .env before any module reads os.environ
+from core.startup import preload_in_background
+from core.db import get_dialect_table_names, get_connection_uri, engine, get_session
+from core.cache import get_cache
+from core.sql_templates import template_stats
+from core.fast_path import fast_path_stats
+from core.model_router import router_stats
+from core.value_index import value_index_stats, forget_value_index
+from core.llm import answer_my_question, paginate_result, fetch_provider_models, forget_api_keys
+from core.warmup import schedule_user_warmup, warmup_metrics
 from core.api_keys import create_or_update_api_key, delete_api_key
 from core.s3_utils import save_query_to_s3, list_saved_queries_from_s3, delete_query_from_s3
-from core.auth_utils import get_current_user_id, get_user
+from core.saved_query_index import search_saved_queries, ensure_synced
+from core.bulkhead import bulkhead_metrics
+from core.usage_ledger import usage_report, start_usage_rollups
+from core.materialize import (
+    load_saved_query, run_saved_query, store_snapshot, get_snapshot, drop_snapshot, start_refresher,
+)
+from core.auth_utils import (
+    get_current_user_id, get_admin_user_id, get_user, create_access_token, decode_access_token, revoke_user_tokens,
+    is_admin, ACCESS_TOKEN_TTL,
+)
+from core.profiler import profile_request, list_profiles, get_profile, get_profile_folded_path
+from core.scheduler import scheduler, SchedulerFull
+from core.cancellation import CancelToken, run_cancellable
+from core.prompt_metrics import prompt_stats
+from core.query_log import record_answer, query_history, slow_queries, query_log_stats
+from core.federated import federated_answer
+from core.chat_session import ChatSession, serve_chat
+from core.index_advisor import advise, apply_indexes, benchmark
+from core.export import (
+    EXPORT_FORMATS, SINKS, submit_export, get_export_job, list_export_jobs, parse_range, start_export_cleanup,
+)
 from db.model import User, Connection, ConnectionInput, APIKey
+from db.main import get_connection_string
+from db.migrate import migrate_schema
 
 app = FastAPI()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
@@ -27,7 +62,11 @@ app.add_middleware(
 
 @app.on_event("startup")
 def on_startup():
-    SQLModel.metadata.create_all(engine)
+    migrate_schema(engine)
+    start_refresher()
+    start_usage_rollups()
+    start_export_cleanup()
+    preload_in_background()
 
 @app.get("/", include_in_schema=False)
 def home():
@@ -53,7 +92,22 @@ async def login(
     user = get_user(form_data.username, session)
     if not user or user.password != form_data.password:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    return {"access_token": str(user.id), "token_type": "bearer"}
+    # pay engine/schema/key setup now, in the background, not on the first /answer
+    schedule_user_warmup(user.id)
+    return {
+        "access_token": create_access_token(user),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL,
+    }
+
+@app.post("/logout")
+def logout(
+    session: Session = Depends(get_session),
+    user_id: int = Depends(get_current_user_id),
+):
+    """Revoke every token issued to the caller so far."""
+    revoke_user_tokens(user_id, session)
+    return {"message": "Logged out"}
 
 # -------- Fernet --------
 
@@ -65,6 +119,7 @@ def generate_fernet_key(
     key = Fernet.generate_key().decode()
     session.exec(update(User).where(User.id == user_id).values(fernet_key=key))
     session.commit()
+    forget_api_keys(user_id)
     return {"fernet_key": key}
 
 # -------- Providers/Models --------
@@ -95,44 +150,7 @@ def list_models(
     ).decode()
 
     try:
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Accept": "application/json",
-        }
-
-        if provider == "openai":
-            url = "https://api.openai.com/v1/models"
-            resp = httpx.get(url, headers=headers, timeout=20)
-            resp.raise_for_status()
-            data = resp.json()
-            raw = data.get("data", []) if isinstance(data, dict) else []
-        elif provider == "together":
-            # ✅ Correct API path; Together sometimes returns a list directly
-            url = "https://api.together.xyz/v1/models"
-            resp = httpx.get(url, headers=headers, timeout=20)
-            resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, dict):
-                raw = data.get("data") or data.get("models", []) or []
-            elif isinstance(data, list):
-                raw = data
-            else:
-                raw = []
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported provider: {provider}")
-
-        # Normalize items → model ids
-        models = []
-        for m in raw:
-            if isinstance(m, dict):
-                mid = m.get("id") or m.get("name") or m.get("model") or m.get("slug")
-                if mid:
-                    models.append(mid)
-            elif isinstance(m, str):
-                models.append(m)
-
-        # dedupe and sort for nicer UX
-        models = sorted(set(models))
+        models = fetch_provider_models(provider, api_key)
         return {"provider": provider, "models": models}
 
     except httpx.HTTPStatusError as e:
@@ -156,14 +174,42 @@ def get_db_info(
 ):
     return get_dialect_table_names(user_id, db_name)
 
+@app.get("/cache/stats")
+def cache_stats(admin_id: int = Depends(get_admin_user_id)):
+    """Cache, template and value-index stats across every tenant, so admins only."""
+    return {**get_cache().stats(), "sql_templates": template_stats(), "value_index": value_index_stats()}
+
+@app.post("/cache/invalidate")
+def invalidate_cache(
+    connection_name: str,
+    session: Session = Depends(get_session),
+    user_id: int = Depends(get_current_user_id),
+):
+    """Drop cached schema, SQL, values and results for a connection on every worker."""
+    try:
+        urls = {get_connection_string(user_id, connection_name, session), get_connection_uri(user_id, connection_name)}
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    for url in urls:
+        get_cache().invalidate_connection(url)
+        forget_value_index(url)
+    return {"message": f"Cache invalidated for {connection_name}"}
+
+@app.get("/warmup/metrics")
+def get_warmup_metrics(admin_id: int = Depends(get_admin_user_id)):
+    """Process-wide warm-up counters for every user, so admins only."""
+    return warmup_metrics()
+
 @app.get("/list_connections")
 def list_connections(
     session: Session = Depends(get_session),
     user_id: int = Depends(get_current_user_id),
 ):
-    return session.exec(
+    connections = session.exec(
         select(Connection).where(Connection.user_id == user_id)
     ).all()
+    schedule_user_warmup(user_id, [c.connection_name for c in connections])
+    return connections
 
 @app.post("/new_connection")
 def add_new_connection(
@@ -180,47 +226,350 @@ def add_new_connection(
 # -------- Answer --------
 
 @app.get("/answer")
-def get_answer(
+async def get_answer(
+    request: Request,
     question: str,
     connection_name: str,
     provider: str = "openai",
-    model: str = "gpt-4o",
+    model: str = Query("gpt-4o", description='Model id, or "auto" to route by question complexity'),
     page: int = Query(1, ge=1),
     page_size: int = Query(5, ge=1),
     save: bool = Query(False),
     query_key: str | None = Query(None),
+    compact_schema: bool = Query(False, description="Terse schema rendering in the prompt"),
+    sample_rows: int = Query(3, ge=0, le=10, description="Sample rows per table in the prompt"),
+    fast_path: bool = Query(True, description="Answer trivial questions without the LLM"),
+    approximate: bool = Query(False, description="Estimate COUNT/SUM/AVG from a sample of the largest table"),
+    profile: bool = Query(False, description="Admin only: run this request under the sampling profiler"),
+    x_profile: str | None = Header(None),
+    llm_deadline: float | None = Query(None, gt=0, description="Hard limit (s) for SQL generation"),
+    sql_deadline: float | None = Query(None, gt=0, description="Hard limit (s) for SQL execution"),
     session: Session = Depends(get_session),
     user_id: int = Depends(get_current_user_id),
 ):
+    """
+    Runs in the threadpool; if the client disconnects or a stage deadline
+    passes, the provider stream and the running statement are cancelled.
+    """
+    if save and not query_key:
+        raise HTTPException(status_code=400, detail="query_key required when save=true")
+    profile = profile or x_profile == "1"
+    if profile and not is_admin(user_id):
+        raise HTTPException(status_code=403, detail="Profiling is restricted to admins")
+    profiling = profile_request(
+        user_id=user_id, connection_name=connection_name, provider=provider, model=model, question=question,
+    ) if profile else nullcontext({})
+
+    deadlines = {k: v for k, v in (("llm", llm_deadline), ("sql", sql_deadline)) if v}
+    token = CancelToken(deadlines)
+
+    def _run():
+        with profiling as profile_meta:
+            result = answer_my_question(
+                question=question,
+                user_id=user_id,
+                db_name=connection_name,
+                model_name=model,
+                provider=provider,
+                page=page,
+                page_size=page_size,
+                session=session,   # ← important: pass the session
+                compact_schema=compact_schema,
+                sample_rows=sample_rows,
+                fast_path=fast_path,
+                approximate=approximate,
+            )
+            profile_meta["sql"] = result["last_sql_query"]
+        return result, profile_meta
+
+    started = time.perf_counter()
     try:
-        result = answer_my_question(
-            question=question,
-            user_id=user_id,
-            db_name=connection_name,
-            model_name=model,
-            provider=provider,
-            page=page,
-            page_size=page_size,
-            session=session,   # ← important: pass the session
-        )
+        result, profile_meta = await run_cancellable(request, token, _run)
+    except SchedulerFull:
+        raise
     except HTTPException as e:
+        record_answer(
+            user_id, connection_name, question, provider, model,
+            duration_ms=(time.perf_counter() - started) * 1000, error=str(e.detail),
+        )
         raise HTTPException(
             status_code=e.status_code,
             detail=f"Answer failed: {e.detail} | file_name={connection_name}",
+            headers=e.headers,
+        )
+    except Exception as e:
+        record_answer(
+            user_id, connection_name, question, provider, model,
+            duration_ms=(time.perf_counter() - started) * 1000, error=str(e),
         )
+        raise
+    record_answer(
+        user_id, connection_name, question, provider, result.get("model", model),
+        duration_ms=(time.perf_counter() - started) * 1000, result=result,
+        query_key=query_key if save else None,
+    )
 
     if save:
-        if not query_key:
-            raise HTTPException(status_code=400, detail="query_key required when save=true")
-        save_query_to_s3(
+        await run_in_threadpool(
+            save_query_to_s3,
             user_id=user_id,
             query_key=query_key,
             question=question,
             sql_query=result["last_sql_query"],
             answer=result["answer"],
+            connection_name=connection_name,
         )
+    if profile:
+        result["profile_id"] = profile_meta["id"]
     return result
 
+@app.get("/answer/federated")
+async def get_federated_answer(
+    question: str,
+    connection_names: list[str] = Query(..., description="Connections to ask in parallel"),
+    provider: str = "openai",
+    model: str = "gpt-4o",
+    timeout: float = Query(60, gt=0, le=600, description="Seconds to wait for the slowest connection"),
+    merge: str = Query("auto", pattern="^(auto|union|join|none)$"),
+    user_id: int = Depends(get_current_user_id),
+):
+    token = CancelToken()
+    stream = federated_answer(
+        question=question,
+        user_id=user_id,
+        connection_names=connection_names,
+        provider=provider,
+        model_name=model,
+        timeout=timeout,
+        merge=merge,
+        token=token,
+    )
+
+    async def _events():
+        try:
+            async for chunk in iterate_in_threadpool(stream):
+                yield chunk
+        finally:
+            # the response task is cancelled when the client disconnects; stop
+            # the legs still running (a no-op once the stream has finished)
+            token.cancel("client disconnected")
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/chat")
+async def chat_socket(
+    websocket: WebSocket,
+    connection_name: str,
+    token: str,
+    provider: str = "openai",
+    model: str = "gpt-4o",
+    compact_schema: bool = False,
+    sample_rows: int = Query(3, ge=0, le=10),
+):
+    """
+    One chat per socket (browsers can't set headers, so the bearer token is
+    a query param). Send {"question": ..., "follow_up": null|true|false},
+    {"type": "cancel"} or {"type": "reset"}; receive status, sql, rows
+    (in chunks) and done/error events.
+    """
+    try:
+        user_id = int(decode_access_token(token)["sub"])
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    chat = ChatSession(user_id, connection_name, provider, model, compact_schema, sample_rows)
+    try:
+        ready = await run_in_threadpool(chat.open)
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+        await websocket.close(code=1011)
+        return
+    await websocket.send_json({"type": "ready", "connection_name": connection_name, **ready})
+    try:
+        await serve_chat(websocket, chat)
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/queries/history")
+def get_query_history(
+    connection_name: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    user_id: int = Depends(get_current_user_id),
+):
+    return {"history": query_history(user_id, connection_name, limit)}
+
+@app.get("/queries/slow")
+def get_slow_queries(
+    connection_name: str | None = Query(None),
+    since_hours: float | None = Query(None, gt=0),
+    limit: int = Query(20, ge=1, le=200),
+    user_id: int = Depends(get_current_user_id),
+):
+    """Generated SQL ranked by mean execution time, per connection."""
+    return {
+        "slow_queries": slow_queries(user_id, connection_name, since_hours, limit),
+        "log": query_log_stats(),
+    }
+
+@app.get("/fast_path/stats")
+def get_fast_path_stats(admin_id: int = Depends(get_admin_user_id)):
+    """Hit/miss counters across every user, so admins only."""
+    return fast_path_stats()
+
+@app.get("/router/stats")
+def get_router_stats(admin_id: int = Depends(get_admin_user_id)):
+    """Routing and escalation counts across every user, so admins only."""
+    return router_stats()
+
+@app.get("/usage")
+def get_usage(
+    since_hours: float = Query(24, gt=0),
+    group_by: list[str] | None = Query(None, description="Any of hour, user_id, connection_name, provider, model"),
+    all_users: bool = Query(False, description="Admin only: every user's usage"),
+    user_id: int = Depends(get_current_user_id),
+):
+    """Tokens, provider calls, retries and estimated cost from the hourly rollups."""
+    if all_users and not is_admin(user_id):
+        raise HTTPException(status_code=403, detail="Usage across users is restricted to admins")
+    return usage_report(None if all_users else user_id, since_hours, group_by)
+
+@app.get("/scheduler/metrics")
+def scheduler_metrics(admin_id: int = Depends(get_admin_user_id)):
+    """Queue depth and usage for every user, so admins only."""
+    return scheduler.metrics()
+
+@app.get("/bulkheads/metrics")
+def get_bulkhead_metrics(
+    connection_name: str | None = None,
+    session: Session = Depends(get_session),
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    Per target database: concurrency, queue, circuit state and timeout rate.
+    Without connection_name, every tenant's databases: admins only.
+    """
+    if connection_name is None:
+        if not is_admin(user_id):
+            raise HTTPException(status_code=403, detail="Metrics across connections are restricted to admins")
+        return {"bulkheads": bulkhead_metrics()}
+    try:
+        db_url = get_connection_string(user_id, connection_name, session)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"DB connection error: {e}")
+    return {"bulkheads": bulkhead_metrics(db_url)}
+
+@app.get("/prompt_stats")
+def get_prompt_stats(user_id: int = Depends(get_current_user_id)):
+    return {"prompt_stats": prompt_stats(user_id)}
+
+# -------- Index advisor --------
+
+@app.get("/indexes/advice")
+def get_index_advice(
+    connection_name: str,
+    since_hours: float | None = Query(None, gt=0, description="Only look at recent history"),
+    session: Session = Depends(get_session),
+    user_id: int = Depends(get_current_user_id),
+):
+    """CREATE INDEX proposals from the slow-query history and EXPLAIN plans."""
+    return advise(user_id, connection_name, session, since_hours=since_hours)
+
+@app.post("/indexes/apply")
+def apply_index_advice(
+    connection_name: str,
+    names: list[str] | None = Query(None, description="Proposal names to create (default: all)"),
+    since_hours: float | None = Query(None, gt=0),
+    session: Session = Depends(get_session),
+    user_id: int = Depends(get_current_user_id),
+):
+    """Only for connections flagged writable."""
+    return apply_indexes(user_id, connection_name, session, names=names, since_hours=since_hours)
+
+@app.post("/indexes/benchmark")
+def benchmark_index_advice(
+    connection_name: str,
+    names: list[str] | None = Query(None),
+    since_hours: float | None = Query(None, gt=0),
+    repeat: int = Query(3, ge=1, le=20),
+    keep: bool = Query(False, description="Keep the indexes after the run"),
+    session: Session = Depends(get_session),
+    user_id: int = Depends(get_current_user_id),
+):
+    """Replay the workload before and after creating the proposed indexes."""
+    return benchmark(user_id, connection_name, session, names=names, since_hours=since_hours,
+                     repeat=repeat, keep=keep)
+
+# -------- Exports --------
+
+@app.post("/exports")
+def create_export(
+    connection_name: str,
+    question: str | None = Query(None),
+    sql_query: str | None = Query(None, description="Skip generation and export this SQL"),
+    format: str = Query("csv", description="csv | parquet"),
+    sink: str = Query("local", description="local | s3"),
+    provider: str = "openai",
+    model: str = "gpt-4o",
+    user_id: int = Depends(get_current_user_id),
+):
+    job = submit_export(
+        user_id=user_id,
+        connection_name=connection_name,
+        fmt=format,
+        sink=sink,
+        question=question,
+        sql_query=sql_query,
+        provider=provider,
+        model_name=model,
+    )
+    return job.to_dict()
+
+@app.get("/exports")
+def list_exports(user_id: int = Depends(get_current_user_id)):
+    return {"exports": list_export_jobs(user_id)}
+
+@app.get("/exports/{job_id}")
+def export_status(job_id: str, user_id: int = Depends(get_current_user_id)):
+    return get_export_job(user_id, job_id).to_dict()
+
+@app.get("/exports/{job_id}/download")
+def download_export(
+    job_id: str,
+    request: Request,
+    user_id: int = Depends(get_current_user_id),
+):
+    job = get_export_job(user_id, job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+
+    media_type = EXPORT_FORMATS[job.format]
+    if job.sink == "local":
+        if not os.path.exists(job.location):
+            # expired, or written on a host that doesn't share EXPORT_DIR
+            raise HTTPException(status_code=404, detail="Export file is not available on this server")
+        # FileResponse handles Range / If-Range itself
+        return FileResponse(job.location, media_type=media_type, filename=job.filename)
+
+    sink = SINKS[job.sink]
+    size = sink.size(job.location)
+    byte_range = parse_range(request.headers.get("range"), size)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{job.filename}"',
+    }
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(sink.read_range(job.location, 0, size - 1), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        sink.read_range(job.location, start, end), status_code=206, media_type=media_type, headers=headers
+    )
+
 # -------- Saved queries --------
 
 @app.post("/save_query")
@@ -229,23 +578,80 @@ def save_query(
     question: str,
     sql_query: str,
     answer: str,
+    connection_name: str | None = Query(None),
     user_id: int = Depends(get_current_user_id),
 ):
-    save_query_to_s3(user_id, query_key, question, sql_query, answer)
+    save_query_to_s3(user_id, query_key, question, sql_query, answer, connection_name)
     return {"message": "Saved"}
 
 @app.get("/list_saved_queries")
 def list_saved(user_id: int = Depends(get_current_user_id)):
     return {"saved_queries": list_saved_queries_from_s3(user_id)}
 
+@app.get("/saved_queries/search")
+def search_saved(
+    q: str = Query(..., min_length=1, description="Words to find; each matches as a prefix"),
+    connection_name: str | None = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    user_id: int = Depends(get_current_user_id),
+):
+    """Ranked full-text search over saved questions, SQL and answers."""
+    synced = ensure_synced(user_id)
+    result = search_saved_queries(user_id, q, page=page, page_size=page_size, connection_name=connection_name)
+    result["indexing"] = not synced  # first search: older saves are still being indexed
+    return result
+
 @app.delete("/delete_query")
 def delete_query(
     query_key: str,
     user_id: int = Depends(get_current_user_id),
 ):
     msg = delete_query_from_s3(user_id, query_key)
+    drop_snapshot(user_id, query_key)
     return {"message": msg}
 
+@app.post("/saved_queries/{query_key}/run")
+def run_saved(
+    query_key: str,
+    connection_name: str | None = Query(None, description="Override the saved connection"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(5, ge=1),
+    materialize: bool = Query(False, description="Keep a snapshot of the result"),
+    refresh_interval: int | None = Query(None, ge=1, description="Seconds between background refreshes"),
+    session: Session = Depends(get_session),
+    user_id: int = Depends(get_current_user_id),
+):
+    saved = load_saved_query(user_id, query_key, connection_name)
+    df = run_saved_query(user_id, saved, session, query_key)
+    result = paginate_result(df, saved["sql_query"], page, page_size)
+    if materialize:
+        snapshot = store_snapshot(user_id, query_key, saved, df, refresh_interval)
+        result["materialized_at"] = snapshot["refreshed_at"]
+    return result
+
+@app.get("/saved_queries/{query_key}/snapshot")
+def saved_snapshot(
+    query_key: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(5, ge=1),
+    user_id: int = Depends(get_current_user_id),
+):
+    snapshot = get_snapshot(user_id, query_key)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No snapshot for {query_key}; run it with materialize=true")
+    import pandas as pd
+
+    df = pd.DataFrame(snapshot["rows"], columns=snapshot["columns"])
+    result = paginate_result(df, snapshot["sql_query"], page, page_size)
+    result.update({
+        "refreshed_at": snapshot["refreshed_at"],
+        "age_seconds": snapshot["age_seconds"],
+        "refresh_interval": snapshot["refresh_interval"],
+        "truncated": snapshot["truncated"],
+    })
+    return result
+
 # -------- API key storage --------
 
 @app.post("/api_keys")
@@ -255,7 +661,9 @@ def upsert_key(
     session: Session = Depends(get_session),
     user_id: int = Depends(get_current_user_id),
 ):
-    return {"message": create_or_update_api_key(session, user_id, provider, api_key)}
+    message = create_or_update_api_key(session, user_id, provider, api_key)
+    forget_api_keys(user_id)
+    return {"message": message}
 
 @app.delete("/api_keys")
 def delete_key(
@@ -263,4 +671,40 @@ def delete_key(
     session: Session = Depends(get_session),
     user_id: int = Depends(get_current_user_id),
 ):
-    return {"message": delete_api_key(session, user_id, provider)}
+    message = delete_api_key(session, user_id, provider)
+    forget_api_keys(user_id)
+    return {"message": message}
+
+# -------- Admin --------
+
+@app.post("/admin/users/{target_user_id}/revoke")
+def admin_revoke_user(
+    target_user_id: int,
+    session: Session = Depends(get_session),
+    admin_id: int = Depends(get_admin_user_id),
+):
+    revoke_user_tokens(target_user_id, session)
+    return {"message": f"Tokens revoked for user {target_user_id}"}
+
+@app.get("/admin/profiles")
+def admin_list_profiles(
+    for_user_id: int | None = Query(None),
+    connection_name: str | None = Query(None),
+    admin_id: int = Depends(get_admin_user_id),
+):
+    return {"profiles": list_profiles(for_user_id, connection_name)}
+
+@app.get("/admin/profiles/{profile_id}")
+def admin_get_profile(profile_id: str, admin_id: int = Depends(get_admin_user_id)):
+    meta = get_profile(profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return meta
+
+@app.get("/admin/profiles/{profile_id}/folded")
+def admin_download_profile(profile_id: str, admin_id: int = Depends(get_admin_user_id)):
+    """Collapsed stacks, ready for flamegraph.pl or speedscope."""
+    path = get_profile_folded_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
@@ -0,0 +1,94 @@
+"""
+Cold-start benchmark: how long does `import app` take, and which modules
+dominate it?
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports the median total plus the slowest modules by cumulative time.
+
+    python benchmarks/import_time.py                 # report
+    python benchmarks/import_time.py --json out.json # also write JSON
+    python benchmarks/import_time.py --max-ms 1500   # exit 1 if slower (CI)
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+# Should never be on the `import app` path; they are loaded lazily / preloaded
+HEAVY_MODULES = ("pandas", "langchain_openai", "langchain_community", "boto3", "openai")
+
+
+def run_once(module: str) -> dict:
+    env = {"AUTH_DEV_MODE": "1", **os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            self_us, cumulative_us, _, name = m.groups()
+            modules[name] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", dest="json_path")
+    parser.add_argument("--max-ms", type=float)
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    totals_ms = [r[args.module][1] / 1000 for r in runs]
+    median_ms = statistics.median(totals_ms)
+
+    # slowest modules by median cumulative time
+    names = set().union(*runs)
+    cumulative = {
+        name: statistics.median(r[name][1] for r in runs if name in r) / 1000
+        for name in names
+    }
+    top = sorted(cumulative.items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+    heavy_loaded = sorted(m for m in HEAVY_MODULES if m in names)
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals_ms):.1f}, max {max(totals_ms):.1f})")
+    print(f"heavy modules on the import path: {', '.join(heavy_loaded) or 'none'}")
+    print()
+    print(f"{'cumulative ms':>14}  module")
+    for name, ms in top:
+        print(f"{ms:14.1f}  {name}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "module": args.module,
+                "runs": args.runs,
+                "median_ms": round(median_ms, 1),
+                "totals_ms": [round(t, 1) for t in totals_ms],
+                "heavy_modules_loaded": heavy_loaded,
+                "top": [{"module": n, "cumulative_ms": round(ms, 1)} for n, ms in top],
+            }, f, indent=2)
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"\nFAIL: median {median_ms:.1f} ms exceeds budget {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
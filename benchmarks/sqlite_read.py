@@ -0,0 +1,118 @@
+"""
+SQLite read-profile benchmark: concurrent analytic queries against one file,
+default engine vs. the read-only reader pool (mode=ro, mmap, large page
+cache, query_only).
+
+Builds a scratch database, then runs the same query mix from N threads
+with each engine and reports queries/second.
+
+    python benchmarks/sqlite_read.py                      # 200k rows, 8 threads
+    python benchmarks/sqlite_read.py --rows 1000000 --threads 16 --seconds 10
+    python benchmarks/sqlite_read.py --db data/northwind_small.sqlite --query "SELECT COUNT(*) FROM Orders"
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from core.sqlite_profile import sqlite_url, create_reader_engine  # noqa: E402
+
+QUERIES = [
+    "SELECT region, COUNT(*), AVG(total) FROM orders GROUP BY region",
+    "SELECT customer_id, SUM(total) AS spent FROM orders WHERE year = 2021 GROUP BY customer_id "
+    "ORDER BY spent DESC LIMIT 10",
+    "SELECT year, MAX(total) FROM orders WHERE region = 'EU' GROUP BY year",
+    "SELECT COUNT(*) FROM orders WHERE total BETWEEN 100 AND 200",
+]
+
+
+def build(path: str, rows: int) -> None:
+    rng = random.Random(0)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INT, region TEXT, year INT, total REAL)")
+        conn.executemany(
+            "INSERT INTO orders (customer_id, region, year, total) VALUES (?, ?, ?, ?)",
+            ((rng.randrange(5000), rng.choice(("EU", "US", "APAC", "LATAM")), rng.randrange(2015, 2025),
+              rng.expovariate(1 / 120)) for _ in range(rows)),
+        )
+
+
+def run(engine, queries: list[str], threads: int, seconds: float) -> dict:
+    done, latencies, errors = [0] * threads, [[] for _ in range(threads)], []
+    stop = time.monotonic() + seconds
+
+    def worker(i: int):
+        rng = random.Random(i)
+        while time.monotonic() < stop:
+            sql = rng.choice(queries)
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(sql)).fetchall()
+            except Exception as e:
+                errors.append(str(e))
+                return
+            latencies[i].append((time.perf_counter() - started) * 1000)
+            done[i] += 1
+
+    # warm the pool and the OS page cache so both engines start even
+    for sql in queries:
+        with engine.connect() as conn:
+            conn.execute(text(sql)).fetchall()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    if errors:
+        raise RuntimeError(errors[0])
+    all_ms = sorted(ms for per in latencies for ms in per)
+    return {
+        "queries": sum(done),
+        "qps": round(sum(done) / seconds, 1),
+        "p50_ms": round(statistics.median(all_ms), 2) if all_ms else None,
+        "p95_ms": round(all_ms[int(len(all_ms) * 0.95) - 1], 2) if all_ms else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="existing SQLite file (default: build a scratch one)")
+    parser.add_argument("--query", action="append", help="query to run (repeatable; default: built-in mix)")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.db:
+        path, queries = os.path.abspath(args.db), args.query or QUERIES
+    else:
+        path, queries = os.path.join(tempfile.mkdtemp(), "bench.sqlite"), args.query or QUERIES
+        build(path, args.rows)
+
+    baseline = create_engine(sqlite_url(path, writable=True), connect_args={"check_same_thread": False})
+    readers = create_reader_engine(sqlite_url(path))
+    results = {}
+    for name, engine in (("default", baseline), ("read profile", readers)):
+        results[name] = run(engine, queries, args.threads, args.seconds)
+        engine.dispose()
+        r = results[name]
+        print(f"{name:>13}: {r['qps']:>8} q/s   p50 {r['p50_ms']} ms   p95 {r['p95_ms']} ms   ({r['queries']} queries)")
+    gain = results["read profile"]["qps"] / max(results["default"]["qps"], 1e-9)
+    print(f"{'speedup':>13}: {gain:.2f}x with {args.threads} threads")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+# core/approximate.py
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+
+APPROX_SAMPLE_ROWS = int(os.getenv("APPROX_SAMPLE_ROWS", "100000"))  # target rows in the sample
+APPROX_MAX_FRACTION = float(os.getenv("APPROX_MAX_FRACTION", "0.25"))  # above this, just run it exactly
+APPROX_Z = 1.96  # 95% intervals
+
+_IDENT = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|[A-Za-z_][\w$]*)'
+_TABLE_REF = re.compile(
+    rf"\b(?P<kw>from|join)\s+(?P<table>{_IDENT}(?:\.{_IDENT})?)(?:\s+(?:as\s+)?(?P<alias>{_IDENT}))?",
+    re.IGNORECASE,
+)
+_KEYWORDS = frozenset(
+    "where on join inner left right full outer cross natural group order limit offset using as".split()
+)
+_INELIGIBLE = re.compile(
+    r"\b(?:union|intersect|except|having|distinct|over|min|max|with|fetch|window|median|percentile\w*|"
+    r"string_agg|group_concat|array_agg|stddev\w*|variance|var_\w+)\b|\(\s*select\b",
+    re.IGNORECASE,
+)
+_AGGREGATE = re.compile(
+    rf"^(?P<func>count|sum|avg)\s*\((?P<arg>.*)\)(?:\s+(?:as\s+)?(?P<alias>{_IDENT}))?$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ROUNDED = re.compile(
+    rf"^round\s*\((?P<inner>.*),\s*(?P<digits>\d+)\s*\)(?:\s+(?:as\s+)?(?P<alias>{_IDENT}))?$",
+    re.IGNORECASE | re.DOTALL,
+)
+_HAS_AGGREGATE = re.compile(r"\b(?:count|sum|avg)\s*\(", re.IGNORECASE)
+_ITEM_ALIAS = re.compile(rf"\)\s*(?:as\s+)?(?P<alias>{_IDENT})\s*$", re.IGNORECASE)
+
+
+@dataclass
+class Aggregate:
+    position: int
+    kind: str  # count | sum | avg
+    arg: str
+    digits: int | None = None
+    extras: dict[str, int] = field(default_factory=dict)  # helper name -> result column position
+
+
+@dataclass
+class SampledQuery:
+    sql: str
+    table: str
+    fraction: float
+    table_rows: int
+    aggregates: list[Aggregate]
+    width: int  # columns the original query returns
+    grouped: bool = False  # GROUP BY: groups with no sampled rows are absent from the result
+
+
+# -------- Reading the SQL --------
+
+def _mask_literals(sql: str) -> str:
+    """Same length, with string literal contents blanked, so scans ignore them."""
+    return re.sub(r"'(?:[^']|'')*'", lambda m: "'" + " " * (len(m.group()) - 2) + "'", sql)
+
+
+def _top_level(masked: str, start: int, end: int):
+    depth = 0
+    for i in range(start, end):
+        ch = masked[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        yield i, ch, depth
+
+
+def _split_select(sql: str) -> tuple[list[str], int] | None:
+    """Top-level select items and the index of the top-level FROM."""
+    masked = _mask_literals(sql)
+    m = re.match(r"\s*select\s+", masked, re.IGNORECASE)
+    if not m:
+        return None
+    items, item_start, from_at = [], m.end(), None
+    for i, ch, depth in _top_level(masked, m.end(), len(masked)):
+        if depth == 0 and ch == ",":
+            items.append(sql[item_start:i].strip())
+            item_start = i + 1
+        elif depth == 0 and re.match(r"\sfrom\s", masked[i:i + 6], re.IGNORECASE):
+            from_at = i + 1
+            break
+    if from_at is None:
+        return None
+    items.append(sql[item_start:from_at].strip())
+    return items, from_at
+
+
+def _balanced(text: str) -> bool:
+    depth = 0
+    for ch in _mask_literals(text):
+        depth += ch == "("
+        depth -= ch == ")"
+        if depth < 0:
+            return False
+    return depth == 0
+
+
+def _parse_aggregate(position: int, item: str) -> Aggregate | None:
+    digits = None
+    rounded = _ROUNDED.match(item)
+    if rounded and _balanced(rounded.group("inner")):
+        item, digits = rounded.group("inner").strip(), int(rounded.group("digits"))
+    m = _AGGREGATE.match(item)
+    if not m or not _balanced(m.group("arg")):
+        return None
+    arg = m.group("arg").strip()
+    kind = m.group("func").lower()
+    if kind == "count" and arg in ("*", "1"):
+        arg = "*"
+    return Aggregate(position, kind, arg, digits)
+
+
+def _ranks_by_aggregate(masked: str, from_at: int, items: list[str], aggregates: list[Aggregate]) -> bool:
+    """
+    ORDER BY <aggregate> ... LIMIT n: a top-k picked from sampled estimates
+    can be the wrong groups, however good each estimate's bounds are.
+    """
+    order_at = limit_at = None
+    for i, ch, depth in _top_level(masked, from_at, len(masked)):
+        if depth or not ch.isspace():
+            continue
+        if order_at is None and re.match(r"\sorder\s+by\s", masked[i:i + 20], re.IGNORECASE):
+            order_at = i
+        elif order_at is not None and re.match(r"\slimit\s", masked[i:i + 7], re.IGNORECASE):
+            limit_at = i
+            break
+    if order_at is None or limit_at is None:
+        return False
+    order = masked[order_at:limit_at]
+    if _HAS_AGGREGATE.search(order):
+        return True
+    for agg in aggregates:
+        alias = _ITEM_ALIAS.search(items[agg.position])
+        if alias and re.search(rf"(?<![\w$]){re.escape(alias.group('alias'))}(?![\w$])", order, re.IGNORECASE):
+            return True
+        if re.search(rf"(?<![\w.]){agg.position + 1}(?![\w.])", order):
+            return True  # ORDER BY 2
+    return False
+
+
+def _has_group_by(masked: str, from_at: int) -> bool:
+    return any(
+        depth == 0 and ch.isspace() and re.match(r"\sgroup\s+by\s", masked[i:i + 20], re.IGNORECASE)
+        for i, ch, depth in _top_level(masked, from_at, len(masked))
+    )
+
+
+# -------- Planning --------
+
+def _row_estimate(conn, dialect: str, table: str) -> int | None:
+    from sqlalchemy import text
+
+    bare = table.split(".")[-1].strip('"`[]')
+    try:
+        if dialect == "postgresql":
+            value = conn.execute(text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:t)"),
+                                 {"t": table}).scalar()
+        elif dialect in ("mysql", "mariadb"):
+            value = conn.execute(text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t"
+            ), {"t": bare}).scalar()
+        elif dialect == "sqlite":
+            # O(log n) on the rowid b-tree; close to COUNT(*) unless many rows were deleted
+            value = conn.exec_driver_sql(f"SELECT max(rowid) FROM {table}").scalar()
+        else:
+            return None
+    except Exception:
+        conn.rollback()
+        return None
+    return int(value) if value and value > 0 else None
+
+
+def _sampled_source(dialect: str, table: str, alias: str, fraction: float) -> str:
+    """
+    Independent row-level (Bernoulli) sampling on every dialect, which is
+    what the bounds in _estimate assume. Each one still reads the whole
+    table: TABLESAMPLE SYSTEM would read only ~fraction of the pages, but
+    it samples whole pages, and on clustered data the row-sampling bounds
+    would then be far too narrow.
+    """
+    if dialect == "postgresql":
+        return f"{table} AS {alias} TABLESAMPLE BERNOULLI ({fraction * 100:.6f})"
+    if dialect == "sqlite":
+        return f"(SELECT * FROM {table} WHERE abs(random() % 1000000) < {int(fraction * 1_000_000)}) AS {alias}"
+    return f"(SELECT * FROM {table} WHERE RAND() < {fraction:.8f}) AS {alias}"
+
+
+def plan_sample(conn, sql: str, sample_rows: int = APPROX_SAMPLE_ROWS) -> SampledQuery | tuple[None, str]:
+    """
+    Rewrite an aggregate query (COUNT/SUM/AVG, optionally ROUND()ed, with
+    GROUP BY, joins, WHERE, ORDER BY, LIMIT) to run over a sample of its
+    largest table, adding the sums of squares needed for error bounds.
+    Returns (None, reason) when the query is not eligible, which includes
+    top-k by an aggregate (ORDER BY SUM(x) DESC LIMIT n).
+    The sample is filtered row by row during a full scan (see
+    _sampled_source), so this saves join, grouping and transfer work on the
+    rows left out, not I/O.
+    """
+    dialect = conn.dialect.name
+    if dialect not in ("postgresql", "sqlite", "mysql", "mariadb"):
+        return None, f"sampling is not supported for {dialect}"
+    sql = sql.strip().rstrip(";").strip()
+    masked = _mask_literals(sql)
+    if _INELIGIBLE.search(masked):
+        return None, "query uses constructs that can't be estimated from a sample"
+    split = _split_select(sql)
+    if split is None:
+        return None, "not a plain SELECT"
+    items, from_at = split
+
+    aggregates = []
+    for i, item in enumerate(items):
+        agg = _parse_aggregate(i, item)
+        if agg is not None:
+            aggregates.append(agg)
+        elif _HAS_AGGREGATE.search(_mask_literals(item)) or item == "*":
+            return None, f"select item {item!r} can't be estimated"
+    if not aggregates:
+        return None, "no COUNT/SUM/AVG to estimate"
+    if _ranks_by_aggregate(masked, from_at, items, aggregates):
+        return None, "top-k by an estimated aggregate (ORDER BY ... LIMIT) could pick the wrong groups"
+
+    # sample the largest table the query reads
+    refs = []
+    for m in _TABLE_REF.finditer(masked, from_at):
+        alias = m.group("alias")
+        if alias and alias.lower() in _KEYWORDS:
+            alias = None
+        rows = _row_estimate(conn, dialect, m.group("table"))
+        refs.append((rows or 0, m, alias))
+    if not refs:
+        return None, "no table found"
+    table_rows, ref, alias = max(refs, key=lambda r: r[0])
+    if not table_rows:
+        return None, "table size unknown"
+    fraction = min(1.0, sample_rows / table_rows)
+    if fraction > APPROX_MAX_FRACTION:
+        return None, f"table has only ~{table_rows} rows"
+
+    table = ref.group("table")
+    source = _sampled_source(dialect, table, alias or table.split(".")[-1], fraction)
+    end = ref.end("alias") if ref.group("alias") and alias else ref.end("table")
+    rewritten_from = sql[from_at:ref.start("table")] + source + sql[end:]
+
+    extras, position = [], len(items)
+    for agg in aggregates:
+        wanted = {"sum": ("ss",), "avg": ("s", "ss", "c")}.get(agg.kind, ())
+        for name in wanted:
+            expr = {"s": f"SUM({agg.arg})", "ss": f"SUM(({agg.arg}) * ({agg.arg}))", "c": f"COUNT({agg.arg})"}[name]
+            extras.append(f"{expr} AS __approx_{name}{agg.position}")
+            agg.extras[name] = position
+            position += 1
+
+    select_list = ", ".join(items + extras)
+    return SampledQuery(
+        sql=f"SELECT {select_list} {rewritten_from}",
+        table=table.strip('"`[]'),
+        fraction=fraction,
+        table_rows=table_rows,
+        aggregates=aggregates,
+        width=len(items),
+        grouped=_has_group_by(masked, from_at),
+    )
+
+
+# -------- Estimates --------
+
+def _estimate(agg: Aggregate, row: tuple, f: float) -> tuple[float | None, float | None]:
+    value = row[agg.position]
+    if value is None:
+        return None, None
+    if agg.kind == "count":
+        n = float(value)
+        return n / f, math.sqrt(n * (1 - f)) / f
+    if agg.kind == "sum":
+        ss = float(row[agg.extras["ss"]] or 0)
+        return float(value) / f, math.sqrt(max(0.0, (1 - f) * ss)) / f
+    # avg
+    s, ss, c = (float(row[agg.extras[k]] or 0) for k in ("s", "ss", "c"))
+    if c == 0:
+        return None, None
+    mean = s / c
+    var = max(0.0, ss / c - mean * mean) * (c / (c - 1) if c > 1 else 0)
+    return mean, math.sqrt(var / c * (1 - f))
+
+
+def estimate_frame(df, plan: SampledQuery):
+    """Scale the sampled aggregates and add <col>_low / <col>_high (95%) columns."""
+    import pandas as pd
+
+    columns = list(df.columns[:plan.width])
+    rows = list(df.itertuples(index=False, name=None))
+    out = {c: [r[i] for r in rows] for i, c in enumerate(columns)}
+    order = list(columns)
+    for agg in plan.aggregates:
+        name = columns[agg.position]
+        points, lows, highs = [], [], []
+        for r in rows:
+            point, se = _estimate(agg, r, plan.fraction)
+            if point is None:
+                points.append(None)
+                lows.append(None)
+                highs.append(None)
+                continue
+            lo, hi = point - APPROX_Z * se, point + APPROX_Z * se
+            if agg.kind == "count":
+                lo = max(lo, 0.0)
+            digits = agg.digits if agg.digits is not None else (0 if agg.kind == "count" else 6)
+            points.append(round(point, digits))
+            lows.append(round(lo, digits))
+            highs.append(round(hi, digits))
+        out[name] = points
+        out[f"{name}_low"], out[f"{name}_high"] = lows, highs
+        at = order.index(name) + 1
+        order[at:at] = [f"{name}_low", f"{name}_high"]
+    return pd.DataFrame(out, columns=order)
+
+
+def describe_plan(plan: SampledQuery, columns) -> dict:
+    """
+    `groups_may_be_missing` is set for GROUP BY queries: a group none of
+    whose rows were sampled is not in the result at all (groups smaller
+    than ~1/sample_fraction rows are likely to be missed).
+    """
+    return {
+        "table": plan.table,
+        "table_rows_estimate": plan.table_rows,
+        "sample_fraction": round(plan.fraction, 6),
+        "confidence": 0.95,
+        "estimated_columns": {str(columns[a.position]): a.kind for a in plan.aggregates},
+        "groups_may_be_missing": plan.grouped,
+    }
@@ -1,12 +1,46 @@
 # core/auth_utils.py
 
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select, or_
-from db.model import get_session, User, UserInDBAPI
+from db.model import get_session, User, UserInDBAPI, RevokedUser
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Must be the same on every worker. Without it the app refuses to start unless
+# AUTH_DEV_MODE=1, which signs with a random per-process key (single dev process only)
+AUTH_SECRET_KEY = os.getenv("AUTH_SECRET_KEY")
+AUTH_DEV_MODE = os.getenv("AUTH_DEV_MODE", "0") == "1"
+if not AUTH_SECRET_KEY:
+    if not AUTH_DEV_MODE:
+        raise RuntimeError(
+            "AUTH_SECRET_KEY is not set. Set it to the same secret on every worker, "
+            "or set AUTH_DEV_MODE=1 to use a throwaway key for local development."
+        )
+    logging.getLogger(__name__).warning(
+        "AUTH_SECRET_KEY is not set: AUTH_DEV_MODE signs tokens with a random per-process key. "
+        "Tokens stop working on restart and are rejected by other workers. Do not use in production."
+    )
+    AUTH_SECRET_KEY = secrets.token_urlsafe(32)
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", str(12 * 3600)))
+REVOCATION_REFRESH = float(os.getenv("REVOCATION_REFRESH", "30"))
+ADMIN_USER_IDS = {int(x) for x in os.getenv("ADMIN_USER_IDS", "").split(",") if x.strip()}
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in ADMIN_USER_IDS
+
+
 def get_user(username: str, session: Session) -> UserInDBAPI | None:
     """
     Lookup a user by email OR name for login purposes.
@@ -18,33 +52,148 @@ def get_user(username: str, session: Session) -> UserInDBAPI | None:
         return None
     return UserInDBAPI(**result.dict())
 
+# -------- Signed tokens (JWT, HS256) --------
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+_JWT_HEADER = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+def _sign(signing_input: str) -> str:
+    return _b64(hmac.new(AUTH_SECRET_KEY.encode(), signing_input.encode(), hashlib.sha256).digest())
+
+def create_access_token(user, ttl: int = ACCESS_TOKEN_TTL) -> str:
+    """Claims carry everything handlers need, so requests never load the User row."""
+    now = time.time()
+    claims = {
+        "sub": str(user.id),
+        "name": user.name,
+        "email": user.email,
+        "admin": is_admin(user.id),
+        "iat": now,
+        "exp": int(now + ttl),
+    }
+    payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{_JWT_HEADER}.{payload}"
+    return f"{signing_input}.{_sign(signing_input)}"
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_access_token(token: str) -> dict:
+    """Verify signature, expiry and revocation in memory."""
+    try:
+        header, payload, signature = token.split(".")
+        if header != _JWT_HEADER:
+            raise ValueError("unexpected header")
+        if not hmac.compare_digest(signature, _sign(f"{header}.{payload}")):
+            raise ValueError("bad signature")
+        claims = json.loads(_unb64(payload))
+        user_id = int(claims["sub"])
+    except (ValueError, KeyError, TypeError):
+        raise _unauthorized("Invalid authentication credentials")
+
+    if claims.get("exp", 0) < time.time():
+        raise _unauthorized("Token expired")
+    if _revocations.is_revoked(user_id, claims.get("iat", 0)):
+        raise _unauthorized("Token revoked")
+    return claims
+
+# -------- Revocation list (cached in-process) --------
+
+class _RevocationList:
+    """
+    user_id -> revoked_at, reloaded from the metadata DB at most every
+    REVOCATION_REFRESH seconds in a background thread, so verification
+    itself never waits on I/O. Revocations made by this process apply
+    immediately; other workers pick them up within one refresh interval.
+    """
+
+    def __init__(self):
+        self._revoked: dict[int, float] = {}
+        self._loaded_at = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from core.db import engine
+
+        try:
+            with Session(engine) as session:
+                rows = session.exec(select(RevokedUser)).all()
+            revoked = {r.user_id: r.revoked_at for r in rows}
+            with self._lock:
+                # keep local revocations that may not be visible yet
+                for uid, ts in self._revoked.items():
+                    revoked[uid] = max(ts, revoked.get(uid, 0))
+                self._revoked = revoked
+        except Exception:
+            pass  # table missing or DB busy: keep the previous list
+        finally:
+            with self._lock:
+                self._loaded_at = time.monotonic()
+                self._loading = False
+
+    def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        if not self._loaded_at:
+            self._load()  # once per process, so nothing slips through at startup
+        with self._lock:
+            stale = time.monotonic() - self._loaded_at > REVOCATION_REFRESH and not self._loading
+            if stale:
+                self._loading = True
+            revoked_at = self._revoked.get(user_id)
+        if stale:
+            threading.Thread(target=self._load, name="revocations", daemon=True).start()
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def revoke(self, user_id: int, session: Session) -> None:
+        now = time.time()
+        row = session.get(RevokedUser, user_id)
+        if row is None:
+            session.add(RevokedUser(user_id=user_id, revoked_at=now))
+        else:
+            row.revoked_at = now
+        session.commit()
+        with self._lock:
+            self._revoked[user_id] = now
+
+_revocations = _RevocationList()
+
+def revoke_user_tokens(user_id: int, session: Session) -> None:
+    """Invalidate every token issued to the user so far."""
+    _revocations.revoke(user_id, session)
+
+# -------- Dependencies --------
+
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    return decode_access_token(token)
+
+def get_current_user_id(claims: dict = Depends(get_token_claims)) -> int:
+    return int(claims["sub"])
+
 async def get_current_user(
-    token: str = Depends(oauth2_scheme),
+    user_id: int = Depends(get_current_user_id),
     session: Session = Depends(get_session)
 ) -> User:
     """
-    Treat the bearer token as the user's ID (stringified).
-    Fetch the User record by PK.
+    The full User row, for the few handlers that need more than the claims.
     """
-    try:
-        user_id = int(token)
-    except ValueError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
     user = session.get(User, user_id)
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("User not found")
     return user
 
-def get_current_user_id(
-    current_user: User = Depends(get_current_user)
+def get_admin_user_id(
+    user_id: int = Depends(get_current_user_id)
 ) -> int:
-    return current_user.id
+    """Admins are listed in ADMIN_USER_IDS."""
+    if not is_admin(user_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user_id
@@ -0,0 +1,316 @@
+# core/bulkhead.py
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+
+from core.cache import connection_fingerprint
+from core.cancellation import RequestCancelled, current_token, check_cancelled
+from core.sqlite_profile import SQLITE_READERS, is_read_only_sqlite
+
+# Per target database (overridable via env)
+BULKHEAD_MAX_CONCURRENCY = int(os.getenv("BULKHEAD_MAX_CONCURRENCY", "4"))  # below the engine pool (5 + 10)
+BULKHEAD_MAX_QUEUE = int(os.getenv("BULKHEAD_MAX_QUEUE", "8"))
+BULKHEAD_MAX_WAIT = float(os.getenv("BULKHEAD_MAX_WAIT", "10"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))  # consecutive timeouts
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+# Across all target databases: statements run in (and queue on) Starlette's
+# threadpool (40 threads), so a few degraded databases must not pin all of it
+BULKHEAD_TOTAL_THREADS = int(os.getenv("BULKHEAD_TOTAL_THREADS", "32"))
+BULKHEAD_TOTAL_QUEUE = int(os.getenv("BULKHEAD_TOTAL_QUEUE", "16"))
+
+# Driver errors that mean "the database was too slow", not "the SQL was wrong"
+_TIMEOUT_SQLSTATES = {"57014", "55P03"}  # postgres: statement_timeout / query_canceled, lock_timeout
+_TIMEOUT_ERRNOS = {1205, 3024, 1969}  # mysql: lock wait timeout, max_execution_time; mariadb: max_statement_time
+
+
+class BulkheadRejected(HTTPException):
+    """503: the target database is saturated or its circuit is open."""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(
+            status_code=503, detail=detail, headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+        )
+        self.retry_after = retry_after
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeout
+
+    if isinstance(exc, (PoolTimeout, TimeoutError)):
+        return True
+    orig = exc.orig if isinstance(exc, DBAPIError) else exc
+    if isinstance(orig, TimeoutError):
+        return True
+    if (getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)) in _TIMEOUT_SQLSTATES:
+        return True
+    args = getattr(orig, "args", ())
+    if args and isinstance(args[0], int) and args[0] in _TIMEOUT_ERRNOS:
+        return True
+    return getattr(orig, "sqlite_errorcode", None) == sqlite3.SQLITE_BUSY  # busy_timeout ran out
+
+
+def _outcome(exc: BaseException | None) -> str:
+    """ok | error (the database answered) | timeout | cancelled (client left; says nothing about the DB)."""
+    if exc is None:
+        return "ok"
+    token = current_token()
+    if isinstance(exc, RequestCancelled):
+        return "timeout" if exc.status_code == 504 else "cancelled"
+    if token is not None and token.cancelled:
+        # the driver error raised by an interrupted statement
+        return "timeout" if token.status_code == 504 else "cancelled"
+    return "timeout" if _is_timeout(exc) else "error"
+
+
+class _ThreadBudget:
+    """Threads held by bulkheads (running or queued), summed over every target database."""
+
+    def __init__(self, max_held: int, max_queued: int):
+        self.max_held = max_held
+        self.max_queued = max_queued
+        self.held = 0
+        self.queued = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> bool:
+        with self._lock:
+            if self.held >= self.max_held:
+                return False
+            self.held += 1
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.held -= 1
+
+    def queue(self) -> bool:
+        with self._lock:
+            if self.queued >= self.max_queued:
+                return False
+            self.queued += 1
+            return True
+
+    def dequeue(self) -> None:
+        with self._lock:
+            self.queued -= 1
+
+
+_threads = _ThreadBudget(BULKHEAD_TOTAL_THREADS, BULKHEAD_TOTAL_QUEUE)
+
+
+class Bulkhead:
+    """
+    Isolation for one target database: at most `max_concurrency` statements
+    run at once, at most `max_queue` wait (each for up to `max_wait` s), and
+    a circuit breaker opens after `failure_threshold` consecutive timeouts.
+    While open every request is rejected at once; after `cooldown` a single
+    probe is let through and its outcome closes or re-opens the circuit.
+    All bulkheads together hold at most BULKHEAD_TOTAL_THREADS threads, of
+    which at most BULKHEAD_TOTAL_QUEUE wait.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dialect: str = "",
+        max_concurrency: int = BULKHEAD_MAX_CONCURRENCY,
+        max_queue: int = BULKHEAD_MAX_QUEUE,
+        max_wait: float = BULKHEAD_MAX_WAIT,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+    ):
+        self.name = name
+        self.dialect = dialect
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._state = "closed"  # closed | open | half_open
+        self._opened_at = 0.0
+        self._probing = False
+        self._consecutive_timeouts = 0
+
+        # metrics
+        self._counts = {"ok": 0, "error": 0, "timeout": 0, "cancelled": 0}
+        self._rejected = 0
+        self._opened = 0
+        self._avg_ms = 0.0
+        self._avg_wait_ms = 0.0
+        self._last_failure: str | None = None
+
+    # -------- admission --------
+
+    def _retry_after(self, now: float) -> float:
+        if self._state == "open":
+            return max(1.0, self.cooldown - (now - self._opened_at))
+        return max(1.0, (self._waiting + 1) * self._avg_ms / 1000 / self.max_concurrency)
+
+    def _reject(self, detail: str, now: float):
+        self._rejected += 1
+        raise BulkheadRejected(detail, self._retry_after(now))
+
+    def check_admission(self) -> None:
+        """
+        Raise BulkheadRejected now if a statement would be rejected outright,
+        so callers can skip the LLM call that would produce it.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if self._state == "open" and now - self._opened_at < self.cooldown:
+                self._reject("Target database is unavailable (circuit open after repeated timeouts)", now)
+            if self._state == "half_open" and self._probing:
+                self._reject("Target database is recovering; a probe query is in flight", now)
+            if self._active >= self.max_concurrency and self._waiting >= self.max_queue:
+                self._reject("Too many queries queued for this database, please retry later", now)
+
+    def acquire(self) -> bool:
+        """Blocks for a slot; returns True when this request is the half-open probe."""
+        if not _threads.enter():
+            with self._cond:
+                self._reject("Too many database queries in flight, please retry later", time.monotonic())
+        try:
+            return self._acquire()
+        except BaseException:
+            _threads.leave()
+            raise
+
+    def _acquire(self) -> bool:
+        with self._cond:
+            now = time.monotonic()
+            if self._state == "open":
+                if now - self._opened_at < self.cooldown:
+                    self._reject("Target database is unavailable (circuit open after repeated timeouts)", now)
+                self._state = "half_open"
+            if self._state == "half_open":
+                if self._probing:
+                    self._reject("Target database is recovering; a probe query is in flight", now)
+                self._probing = True
+                self._active += 1
+                return True
+
+            if self._active >= self.max_concurrency:
+                if self._waiting >= self.max_queue:
+                    self._reject("Too many queries queued for this database, please retry later", now)
+                if not _threads.queue():
+                    self._reject("Too many database queries queued, please retry later", now)
+                self._waiting += 1
+                deadline = now + self.max_wait
+                try:
+                    while self._active >= self.max_concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject("Timed out waiting for this database", time.monotonic())
+                        self._cond.wait(timeout=min(remaining, 0.25))
+                        check_cancelled()
+                        if self._state != "closed":
+                            # shed the queue as soon as the breaker trips
+                            self._reject("Target database is unavailable (circuit open after repeated timeouts)",
+                                         time.monotonic())
+                finally:
+                    self._waiting -= 1
+                    _threads.dequeue()
+                self._avg_wait_ms = 0.9 * self._avg_wait_ms + 0.1 * (time.monotonic() - now) * 1000
+            self._active += 1
+            return False
+
+    def release(self, probe: bool, outcome: str, elapsed: float, detail: str | None = None) -> None:
+        with self._cond:
+            self._active -= 1
+            self._counts[outcome] += 1
+            self._avg_ms = 0.9 * self._avg_ms + 0.1 * elapsed * 1000
+            if outcome == "timeout":
+                self._consecutive_timeouts += 1
+                self._last_failure = detail
+                if probe or (self._state == "closed" and self._consecutive_timeouts >= self.failure_threshold):
+                    self._state, self._opened_at = "open", time.monotonic()
+                    self._opened += 1
+            elif outcome in ("ok", "error"):
+                self._consecutive_timeouts = 0
+                if probe:
+                    self._state = "closed"
+            if probe:
+                self._probing = False
+            self._cond.notify_all()
+        _threads.leave()
+
+    @contextmanager
+    def slot(self):
+        probe = self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            # the class only: driver messages carry the SQL text ([SQL: ...])
+            self.release(probe, _outcome(e), time.monotonic() - started, type(e).__name__)
+            raise
+        self.release(probe, "ok", time.monotonic() - started)
+
+    # -------- metrics --------
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            state = self._state
+            if state == "open" and now - self._opened_at >= self.cooldown:
+                state = "half_open"  # the next request will probe
+            total = sum(self._counts.values())
+            return {
+                "connection": self.name,
+                "dialect": self.dialect,
+                "state": state,
+                "active": self._active,
+                "queued": self._waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "consecutive_timeouts": self._consecutive_timeouts,
+                "reopens_in_s": round(max(0.0, self.cooldown - (now - self._opened_at)), 1)
+                if self._state == "open" else None,
+                "executed_total": total,
+                **{f"{k}_total": v for k, v in self._counts.items()},
+                "rejected_total": self._rejected,
+                "opened_total": self._opened,
+                "timeout_rate": round(self._counts["timeout"] / total, 3) if total else None,
+                "avg_execution_ms": round(self._avg_ms, 1),
+                "avg_wait_ms": round(self._avg_wait_ms, 1),
+                "last_failure": self._last_failure,
+            }
+
+
+# -------- Registry (one bulkhead per target database) --------
+
+_bulkheads: dict[str, Bulkhead] = {}
+_lock = threading.Lock()
+
+
+def bulkhead_for(db_url: str) -> Bulkhead:
+    name = connection_fingerprint(db_url)
+    bulkhead = _bulkheads.get(name)
+    if bulkhead is None:
+        with _lock:
+            bulkhead = _bulkheads.get(name)
+            if bulkhead is None:
+                dialect = db_url.split(":", 1)[0].split("+", 1)[0]
+                # read-only SQLite files serve as many statements as the reader pool holds
+                limit = SQLITE_READERS if is_read_only_sqlite(db_url) else BULKHEAD_MAX_CONCURRENCY
+                bulkhead = _bulkheads[name] = Bulkhead(name, dialect, max_concurrency=limit)
+    return bulkhead
+
+
+def bulkhead_metrics(db_url: str | None = None) -> list[dict]:
+    """Health of every target database seen so far (or just `db_url`'s)."""
+    if db_url is not None:
+        name = connection_fingerprint(db_url)
+        return [_bulkheads[name].metrics()] if name in _bulkheads else []
+    with _lock:
+        bulkheads = list(_bulkheads.values())
+    return sorted((b.metrics() for b in bulkheads), key=lambda m: m["connection"])
@@ -0,0 +1,578 @@
+# core/cache.py
+
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, time as dtime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")  # sqlite | redis | memory
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(BASE_DIR, "data", "cache.sqlite3"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "512"))
+CACHE_EVENT_POLL = float(os.getenv("CACHE_EVENT_POLL", "0.5"))
+CACHE_LOCAL_TTL = int(os.getenv("CACHE_LOCAL_TTL", "30"))
+# SQLite tier: reads record last_access in memory and write it back in batches
+CACHE_TOUCH_FLUSH = float(os.getenv("CACHE_TOUCH_FLUSH", "5"))
+CACHE_TOUCH_BATCH = int(os.getenv("CACHE_TOUCH_BATCH", "256"))
+
+# Default TTLs per namespace kind (seconds)
+SCHEMA_TTL = int(os.getenv("CACHE_SCHEMA_TTL", "600"))
+SQL_TTL = int(os.getenv("CACHE_SQL_TTL", "86400"))
+RESULT_TTL = int(os.getenv("CACHE_RESULT_TTL", "60"))
+
+
+def connection_fingerprint(db_url: str) -> str:
+    """Stable, credential-free id for a target database (used in namespaces)."""
+    return hashlib.sha256(db_url.encode()).hexdigest()[:16]
+
+
+def _hash_key(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+# -------- Serialization --------
+
+# Shared values are JSON, never pickle: a process that can write the cache
+# file or the Redis server must not be able to run code in every worker.
+# Types JSON lacks are written as {"__t": <type>, "v": <payload>}.
+
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {"__t": "tuple", "v": [_encode(v) for v in value]}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value) and "__t" not in value:
+            return {k: _encode(v) for k, v in value.items()}
+        return {"__t": "dict", "v": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, (set, frozenset)):
+        return {"__t": "set", "v": [_encode(v) for v in value]}
+    if isinstance(value, datetime):
+        return {"__t": "datetime", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {"__t": "date", "v": value.isoformat()}
+    if isinstance(value, dtime):
+        return {"__t": "time", "v": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"__t": "timedelta", "v": value.total_seconds()}
+    if isinstance(value, Decimal):
+        return {"__t": "decimal", "v": str(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__t": "bytes", "v": base64.b64encode(bytes(value)).decode()}
+    if isinstance(value, uuid.UUID):
+        return {"__t": "uuid", "v": str(value)}
+    if type(value).__name__ == "DataFrame":
+        return {"__t": "frame", "v": {
+            "columns": _encode(list(value.columns)),
+            "rows": [_encode(list(r)) for r in value.itertuples(index=False, name=None)],
+        }}
+    if type(value).__module__ == "numpy" and hasattr(value, "item"):
+        return _encode(value.item())
+    raise TypeError(f"cannot cache a {type(value).__name__}")
+
+
+def _decode_tagged(obj: dict):
+    tag = obj.get("__t")
+    if tag is None:
+        return obj
+    v = obj["v"]
+    if tag == "tuple":
+        return tuple(v)
+    if tag == "dict":
+        return {k: item for k, item in v}
+    if tag == "set":
+        return set(v)
+    if tag == "datetime":
+        return datetime.fromisoformat(v)
+    if tag == "date":
+        return date.fromisoformat(v)
+    if tag == "time":
+        return dtime.fromisoformat(v)
+    if tag == "timedelta":
+        return timedelta(seconds=v)
+    if tag == "decimal":
+        return Decimal(v)
+    if tag == "bytes":
+        return base64.b64decode(v)
+    if tag == "uuid":
+        return uuid.UUID(v)
+    if tag == "frame":
+        import pandas as pd
+
+        return pd.DataFrame(v["rows"], columns=v["columns"])
+    raise ValueError(f"unknown cached type {tag!r}")
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(_encode(value), separators=(",", ":")).encode()
+
+
+def _loads(raw: bytes):
+    return json.loads(raw, object_hook=_decode_tagged)
+
+
+# -------- Shared backends --------
+
+class CacheBackend(ABC):
+    """
+    Storage shared by all workers on a host (or cluster), plus a channel for
+    invalidation messages so each worker can drop its in-process copies.
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[int]) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, namespace: str, key: Optional[str] = None) -> None:
+        """Delete one key, or the whole namespace when key is None."""
+
+    @abstractmethod
+    def publish(self, namespace: str, key: Optional[str]) -> None:
+        pass
+
+    @abstractmethod
+    def poll(self) -> list[tuple[str, Optional[str]]]:
+        """Invalidation messages published (by any worker) since the last poll."""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """Process-local only; for single-worker runs and tests."""
+
+    def __init__(self):
+        self._data: dict[tuple[str, str], tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            item = self._data.get((namespace, key))
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires < time.time():
+            return None
+        return value
+
+    def set(self, namespace, key, value, ttl):
+        with self._lock:
+            self._data[(namespace, key)] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, namespace, key=None):
+        with self._lock:
+            for k in [k for k in self._data if k[0] == namespace and (key is None or k[1] == key)]:
+                del self._data[k]
+
+    def publish(self, namespace, key):
+        pass
+
+    def poll(self):
+        return []
+
+    def stats(self):
+        return {"backend": "memory", "entries": len(self._data)}
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Host-local shared tier: one SQLite file (WAL) that every uvicorn worker
+    opens. Size-bounded with LRU eviction; invalidations are appended to an
+    events table that workers poll. Reads don't write: last_access is kept
+    in memory and flushed in batches (LRU order is approximate by up to
+    CACHE_TOUCH_FLUSH seconds).
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._last_event = 0
+        self._sets_since_check = 0
+        self._evicted = 0
+        self._touched: dict[tuple[str, str], float] = {}
+        self._touch_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries(last_access);
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                key TEXT,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+        row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+        self._last_event = row[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < now:
+            # left for _evict: deleting here would make a read take the write lock
+            return None
+        self._touch(namespace, key, now)
+        return value
+
+    def _touch(self, namespace, key, now):
+        with self._touch_lock:
+            self._touched[(namespace, key)] = now
+            due = (
+                len(self._touched) >= CACHE_TOUCH_BATCH
+                or time.monotonic() - self._last_flush >= CACHE_TOUCH_FLUSH
+            )
+        if due:
+            self._flush_touches()
+
+    def _flush_touches(self):
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if touched:
+            self._conn().executemany(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                [(ts, ns, key) for (ns, key), ts in touched.items()],
+            )
+
+    def set(self, namespace, key, value, ttl):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, value, len(value), now + ttl if ttl else None, now),
+        )
+        self._sets_since_check += 1
+        if self._sets_since_check >= 32:
+            self._sets_since_check = 0
+            self._evict()
+
+    def _evict(self):
+        self._flush_touches()
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # drop least recently used until we're at 90% of the budget
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for namespace, key, size in conn.execute(
+            "SELECT namespace, key, size FROM entries ORDER BY last_access ASC"
+        ):
+            victims.append((namespace, key))
+            freed += size
+            if total - freed <= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+        self._evicted += len(victims)
+
+    def delete(self, namespace, key=None):
+        if key is None:
+            self._conn().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        else:
+            self._conn().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def publish(self, namespace, key):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO events (namespace, key, created_at) VALUES (?, ?, ?)",
+            (namespace, key, time.time()),
+        )
+        # keep the log short; workers only need the recent tail
+        conn.execute("DELETE FROM events WHERE created_at < ?", (time.time() - 3600,))
+
+    def poll(self):
+        rows = self._conn().execute(
+            "SELECT id, namespace, key FROM events WHERE id > ? ORDER BY id", (self._last_event,)
+        ).fetchall()
+        if rows:
+            self._last_event = rows[-1][0]
+        return [(ns, key) for _, ns, key in rows]
+
+    def stats(self):
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "evicted": self._evicted,
+        }
+
+
+class RedisBackend(CacheBackend):
+    """
+    Optional cross-host tier for any Redis-compatible server. Eviction is left
+    to the server (TTL + maxmemory-policy); invalidations go over pub/sub.
+    """
+
+    CHANNEL = "dbllm:cache:invalidate"
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        import redis  # optional dependency
+
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.CHANNEL)
+
+    @staticmethod
+    def _k(namespace, key):
+        return f"dbllm:{namespace}:{key}"
+
+    def get(self, namespace, key):
+        return self._redis.get(self._k(namespace, key))
+
+    def set(self, namespace, key, value, ttl):
+        pipe = self._redis.pipeline()
+        pipe.set(self._k(namespace, key), value, ex=ttl)
+        pipe.sadd(f"dbllm:ns:{namespace}", key)
+        pipe.execute()
+
+    def delete(self, namespace, key=None):
+        if key is not None:
+            self._redis.delete(self._k(namespace, key))
+            self._redis.srem(f"dbllm:ns:{namespace}", key)
+            return
+        members = self._redis.smembers(f"dbllm:ns:{namespace}")
+        if members:
+            self._redis.delete(*[self._k(namespace, m.decode()) for m in members])
+        self._redis.delete(f"dbllm:ns:{namespace}")
+
+    def publish(self, namespace, key):
+        self._redis.publish(self.CHANNEL, f"{namespace}\x00{key or ''}")
+
+    def poll(self):
+        events = []
+        while True:
+            msg = self._pubsub.get_message()
+            if msg is None:
+                break
+            namespace, _, key = msg["data"].decode().partition("\x00")
+            events.append((namespace, key or None))
+        return events
+
+    def stats(self):
+        info = self._redis.info("memory")
+        return {"backend": "redis", "used_memory": info.get("used_memory")}
+
+
+# -------- Two-tier cache --------
+
+class Cache:
+    """
+    Small in-process LRU in front of a shared backend. Values are encoded
+    to JSON once and shared; invalidations are broadcast so other workers drop
+    their local copies too.
+    """
+
+    def __init__(self, backend: CacheBackend, local_max_entries: int = CACHE_LOCAL_MAX_ENTRIES):
+        self.backend = backend
+        self.local_max_entries = local_max_entries
+        self._local: OrderedDict[tuple[str, str], tuple[Any, Optional[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+        self._stats = defaultdict(lambda: {"local_hits": 0, "shared_hits": 0, "misses": 0})
+        self._listeners: dict[str, list[Callable[[str, Optional[str]], None]]] = defaultdict(list)
+
+    @staticmethod
+    def _kind(namespace: str) -> str:
+        return namespace.split(":", 1)[0]
+
+    def subscribe(self, kind: str, callback: Callable[[str, Optional[str]], None]) -> None:
+        """
+        Call `callback(namespace, key)` for every invalidation of a `kind:`
+        namespace, local or from another worker: for process-only state kept
+        outside the cache (e.g. decrypted API keys).
+        """
+        self._listeners[kind].append(callback)
+
+    def _notify(self, namespace: str, key: Optional[str]) -> None:
+        for callback in self._listeners.get(self._kind(namespace), ()):
+            try:
+                callback(namespace, key)
+            except Exception:
+                pass
+
+    def drain_events(self):
+        """Apply invalidations other workers published (at most every CACHE_EVENT_POLL s)."""
+        now = time.monotonic()
+        if now - self._last_poll < CACHE_EVENT_POLL:
+            return
+        self._last_poll = now
+        try:
+            events = self.backend.poll()
+        except Exception:
+            return
+        if not events:
+            return
+        with self._lock:
+            for namespace, key in events:
+                if key is None:
+                    for k in [k for k in self._local if k[0] == namespace]:
+                        del self._local[k]
+                else:
+                    self._local.pop((namespace, key), None)
+        for namespace, key in events:
+            self._notify(namespace, key)
+
+    def _remember(self, namespace, hkey, value, ttl):
+        with self._lock:
+            self._local[(namespace, hkey)] = (value, time.time() + ttl if ttl else None)
+            self._local.move_to_end((namespace, hkey))
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        self.drain_events()
+        hkey = _hash_key(key)
+        stats = self._stats[self._kind(namespace)]
+
+        with self._lock:
+            item = self._local.get((namespace, hkey))
+            if item is not None and (item[1] is None or item[1] >= time.time()):
+                self._local.move_to_end((namespace, hkey))
+                stats["local_hits"] += 1
+                return item[0]
+
+        try:
+            raw = self.backend.get(namespace, hkey)
+        except Exception:
+            raw = None
+        if raw is None:
+            stats["misses"] += 1
+            return None
+        try:
+            value = _loads(raw)
+        except ValueError:
+            # written by an older version, or not ours: treat as a miss
+            stats["misses"] += 1
+            return None
+        stats["shared_hits"] += 1
+        # the shared tier owns the real expiry; keep local copies short-lived
+        self._remember(namespace, hkey, value, CACHE_LOCAL_TTL)
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        if value is None:
+            return
+        hkey = _hash_key(key)
+        self._remember(namespace, hkey, value, min(ttl, CACHE_LOCAL_TTL) if ttl else CACHE_LOCAL_TTL)
+        try:
+            self.backend.set(namespace, hkey, _dumps(value), ttl)
+        except Exception:
+            # shared tier is best-effort; the local copy still helps
+            pass
+
+    def get_or_set(self, namespace: str, key: str, compute: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        value = self.get(namespace, key)
+        if value is None:
+            value = compute()
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        hkey = _hash_key(key) if key is not None else None
+        with self._lock:
+            if hkey is None:
+                for k in [k for k in self._local if k[0] == namespace]:
+                    del self._local[k]
+            else:
+                self._local.pop((namespace, hkey), None)
+        self._notify(namespace, hkey)
+        self.backend.delete(namespace, hkey)
+        self.backend.publish(namespace, hkey)
+
+    def invalidate_connection(self, db_url: str) -> None:
+        fp = connection_fingerprint(db_url)
+        for kind in ("schema", "sql", "sqltpl", "values", "result"):
+            self.invalidate(f"{kind}:{fp}")
+
+    def stats(self) -> dict:
+        try:
+            backend = self.backend.stats()
+        except Exception as e:
+            backend = {"error": str(e)}
+        return {
+            "local_entries": len(self._local),
+            "by_kind": {k: dict(v) for k, v in self._stats.items()},
+            "backend": backend,
+        }
+
+
+def _make_backend() -> CacheBackend:
+    if CACHE_BACKEND == "redis":
+        try:
+            return RedisBackend()
+        except Exception:
+            # redis package missing or server unreachable: stay host-local
+            return SQLiteBackend()
+    if CACHE_BACKEND == "memory":
+        return MemoryBackend()
+    return SQLiteBackend()
+
+
+_cache: Optional[Cache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Cache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = Cache(_make_backend())
+    return _cache
@@ -0,0 +1,203 @@
+# core/cancellation.py
+
+import asyncio
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+from fastapi import HTTPException
+
+DISCONNECT_POLL = float(os.getenv("DISCONNECT_POLL", "0.25"))
+
+# Hard per-stage limits (seconds); 0 disables a stage's deadline
+STAGE_DEADLINES = {
+    "llm": float(os.getenv("LLM_STAGE_DEADLINE", "90")),
+    "sql": float(os.getenv("SQL_STAGE_DEADLINE", "120")),
+}
+
+_current: contextvars.ContextVar["CancelToken | None"] = contextvars.ContextVar("cancel_token", default=None)
+
+
+class RequestCancelled(HTTPException):
+    """499 when the client went away, 504 when a stage ran out of time."""
+
+    def __init__(self, reason: str, status_code: int):
+        super().__init__(status_code=status_code, detail=f"Request cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Shared between the event loop (which watches for disconnects) and the
+    worker thread running the pipeline. Stages register callbacks that abort
+    whatever they are blocked on (a provider stream, a DB statement); the
+    pipeline calls `check()` between steps. `cancel()` only sets the flag:
+    the callbacks (some open a connection to kill a statement) run on a
+    daemon thread, so cancelling from the event loop never blocks it.
+    """
+
+    def __init__(self, deadlines: dict[str, float] | None = None):
+        self.deadlines = {**STAGE_DEADLINES, **(deadlines or {})}
+        self.reason: str | None = None
+        self.status_code = 499
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: dict[int, Callable[[], None]] = {}
+        self._next_id = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str, status_code: int = 499) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason, self.status_code = reason, status_code
+            self._event.set()
+            handles = list(self._callbacks)
+        if handles:
+            threading.Thread(target=self._run_callbacks, args=(handles,), daemon=True,
+                             name="cancel-callbacks").start()
+
+    def _run_callbacks(self, handles: list[int]) -> None:
+        for handle in handles:
+            # skip stages that finished (and unregistered) in the meantime, so a
+            # pooled connection isn't interrupted while serving someone else
+            with self._lock:
+                cb = self._callbacks.get(handle)
+            if cb is None:
+                continue
+            try:
+                cb()
+            except Exception:
+                pass  # best effort: the statement may already have finished
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise RequestCancelled(self.reason, self.status_code)
+
+    def on_cancel(self, cb: Callable[[], None]) -> Callable[[], None]:
+        """Register `cb`; returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                handle = self._next_id
+                self._next_id += 1
+                self._callbacks[handle] = cb
+                return lambda: self._callbacks.pop(handle, None)
+        cb()
+        return lambda: None
+
+    def run(self, fn, *args, **kwargs):
+        """Run `fn` with this token as the current one (in the worker thread)."""
+        reset = _current.set(self)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(reset)
+
+
+def current_token() -> CancelToken | None:
+    return _current.get()
+
+
+def check_cancelled() -> None:
+    token = _current.get()
+    if token is not None:
+        token.check()
+
+
+@contextmanager
+def stage(name: str):
+    """Enforce the current token's hard deadline for one pipeline stage."""
+    token = _current.get()
+    limit = token.deadlines.get(name) if token is not None else None
+    if not limit:
+        yield
+        return
+    token.check()
+    timer = threading.Timer(limit, token.cancel, args=(f"{name} stage exceeded {limit:g}s", 504))
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
+    token.check()
+
+
+# -------- Statement cancellation --------
+
+def _backend_id(conn, query: str):
+    # cached on the pooled DBAPI connection, so it costs one round trip per connection
+    info = conn.connection.info
+    if "backend_id" not in info:
+        from sqlalchemy import text
+        info["backend_id"] = conn.execute(text(query)).scalar()
+    return info["backend_id"]
+
+
+def _statement_canceller(conn) -> Callable[[], None] | None:
+    from sqlalchemy import text
+
+    dialect = conn.dialect.name
+    engine = conn.engine
+    if dialect == "sqlite":
+        dbapi_conn = conn.connection.dbapi_connection
+        return dbapi_conn.interrupt  # thread-safe; aborts the running step
+    if dialect == "postgresql":
+        pid = _backend_id(conn, "SELECT pg_backend_pid()")
+
+        def cancel():
+            with engine.connect() as other:
+                other.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+        return cancel
+    if dialect in ("mysql", "mariadb"):
+        cid = _backend_id(conn, "SELECT CONNECTION_ID()")
+
+        def cancel():
+            with engine.connect() as other:
+                other.execute(text(f"KILL QUERY {int(cid)}"))
+        return cancel
+    return None
+
+
+@contextmanager
+def cancellable_statement(conn):
+    """
+    While the block runs, cancelling the current token aborts the statement
+    on `conn` (an SQLAlchemy Connection) server-side.
+    """
+    token = _current.get()
+    canceller = _statement_canceller(conn) if token is not None else None
+    if canceller is None:
+        yield
+        return
+    token.check()
+    unregister = token.on_cancel(canceller)
+    try:
+        yield
+    finally:
+        unregister()
+
+
+# -------- Disconnect watching (event loop side) --------
+
+async def run_cancellable(request, token: CancelToken, fn, *args, **kwargs):
+    """
+    Run the blocking `fn` in the threadpool while polling for a client
+    disconnect; on disconnect the token is cancelled and we wait for the
+    worker to unwind so its scheduler slot and DB connection are released.
+    """
+    from starlette.concurrency import run_in_threadpool
+
+    task = asyncio.ensure_future(run_in_threadpool(token.run, fn, *args, **kwargs))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            token.cancel("client disconnected")
+            return await task
@@ -0,0 +1,296 @@
+# core/chat_session.py
+
+import asyncio
+import json
+import os
+import re
+import time
+from collections import deque
+
+from fastapi import HTTPException
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from core.bulkhead import bulkhead_for, BulkheadRejected
+from core.db import engine
+from core.scheduler import scheduler, SchedulerFull, SCHEDULER_COMPLETION_TOKENS
+from core.prompt_metrics import count_tokens, record_prompt
+from core.cancellation import CancelToken, RequestCancelled, stage, check_cancelled
+from core.model_router import AUTO_MODEL, tier_models
+from core.usage_ledger import metered_call
+
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "5"))
+CHAT_EDIT_TURNS = int(os.getenv("CHAT_EDIT_TURNS", "2"))  # prior turns shown in the edit prompt
+CHAT_CHUNK_ROWS = int(os.getenv("CHAT_CHUNK_ROWS", "500"))
+
+_FOLLOW_UP_START = re.compile(
+    r"^(?:now|only|just|and|but|also|instead|what about|how about|same|then|exclude|excluding|include|"
+    r"including|without|filter|sort|order|group|limit|for|in|by|per|except)\b"
+)
+_REFERS_BACK = re.compile(r"\b(?:those|them|these|that|it|its|their|same|previous|above|instead)\b")
+
+_EDIT_PROMPT = """You are editing a {dialect} query in a conversation about a database.
+Columns of the tables involved:
+{columns}
+
+{history}
+Follow-up: {question}
+Rewrite the last SQLQuery so it answers the follow-up, keeping everything the follow-up does not change.
+Return only the SQL.
+SQLQuery: """
+
+
+def is_follow_up(question: str, has_history: bool) -> bool:
+    """Heuristic: "now only for 1997", "sort those by price", ..."""
+    if not has_history:
+        return False
+    q = " ".join(question.lower().split())
+    return bool(_FOLLOW_UP_START.match(q)) or (len(q.split()) <= 8 and bool(_REFERS_BACK.search(q)))
+
+
+class ChatSession:
+    """
+    Server-side state for one chat: the target DB handle, a schema snapshot,
+    the LLM client and the last few (question, SQL) turns. Follow-ups are
+    generated as edits of the previous SQL with a prompt that carries only
+    the columns of the tables it uses, instead of the whole schema.
+    """
+
+    def __init__(self, user_id: int, connection_name: str, provider: str, model_name: str,
+                 compact_schema: bool = False, sample_rows: int = 3):
+        self.user_id = user_id
+        self.connection_name = connection_name
+        self.provider = provider
+        self.model_name = model_name
+        self.compact_schema = compact_schema
+        self.sample_rows = sample_rows
+        self.history: deque[tuple[str, str]] = deque(maxlen=CHAT_HISTORY_TURNS)
+        self.schema: dict[str, list[str]] = {}
+        self.db = None
+        self.llm = None
+        self.edit_model = model_name
+
+    def open(self) -> dict:
+        """Resolve the connection, schema and LLM client once per chat (blocking)."""
+        from core.llm import _open_sql_database, _get_llm
+        from db.main import get_connection_string, get_tables_and_schemas
+
+        if self.model_name == AUTO_MODEL:
+            # follow-up edits are small prompts: the fast tier is enough
+            self.edit_model = tier_models(self.provider)[0]
+        with Session(engine) as session:
+            try:
+                db_url = get_connection_string(self.user_id, self.connection_name, session)
+            except Exception as e:
+                raise HTTPException(400, f"DB connection error: {e}")
+            self.db = _open_sql_database(db_url, self.sample_rows)
+            self.schema = get_tables_and_schemas(self.user_id, self.connection_name, session)
+            try:
+                self.llm = _get_llm(self.provider, self.edit_model, session, self.user_id)
+            except HTTPException:
+                self.llm = None  # no key yet; the fast path may still answer
+        return {"dialect": self.db.dialect, "tables": len(self.schema)}
+
+    # -------- Follow-up edits --------
+
+    def _tables_in(self, sql: str) -> list[str]:
+        words = set(re.findall(r"[\w$]+", sql.lower()))
+        return [t for t in self.schema if t.lower() in words]
+
+    def edit_prompt(self, question: str) -> str:
+        _, last_sql = self.history[-1]
+        tables = self._tables_in(last_sql) or list(self.schema)
+        columns = "\n".join(f"{t}({', '.join(self.schema[t])})" for t in tables)
+        history = "\n".join(f"Question: {q}\nSQLQuery: {s}" for q, s in list(self.history)[-CHAT_EDIT_TURNS:])
+        return _EDIT_PROMPT.format(dialect=self.db.dialect, columns=columns, history=history, question=question)
+
+    def _edit(self, question: str, session: Session) -> dict:
+        from core.llm import _get_llm, _invoke_llm, _extract_sql, _run_sql, _db_url
+
+        bulkhead_for(_db_url(self.db)).check_admission()
+        if self.llm is None:
+            self.llm = _get_llm(self.provider, self.edit_model, session, self.user_id)
+        prompt_text = self.edit_prompt(question)
+        prompt_tokens = count_tokens(prompt_text, self.edit_model)
+
+        with scheduler.slot(self.user_id, self.provider, prompt_tokens + SCHEDULER_COMPLETION_TOKENS):
+            started = time.perf_counter()
+            try:
+                with metered_call(self.user_id, self.connection_name, self.provider, self.edit_model, "edit",
+                                  prompt_tokens) as call, stage("llm"):
+                    message = call.message = _invoke_llm(self.llm, prompt_text)
+                sql = _extract_sql(message.content)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(500, f"Error generating SQL: {e}")
+        record_prompt(self.user_id, self.connection_name, "edit", prompt_tokens,
+                      (time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        try:
+            df, result_cache_hit = _run_sql(self.db, sql)
+        except HTTPException:
+            raise
+        except Exception as e:
+            check_cancelled()
+            raise HTTPException(500, f"Error executing SQL: {e}\nSQL:\n{sql}")
+        return {
+            "df": df,
+            "sql": sql,
+            "sql_source": "edit",
+            "model": self.edit_model,
+            "prompt_tokens": prompt_tokens,
+            "sql_cache_hit": False,
+            "sql_template_hit": False,
+            "fast_path_hit": False,
+            "result_cache_hit": result_cache_hit,
+            "execution_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    # -------- Turns --------
+
+    def ask(self, question: str, follow_up: bool | None = None) -> dict:
+        """
+        One turn (blocking; run it under a CancelToken). Returns run_question's
+        dict. A follow-up whose edited SQL fails is retried as a full
+        question with the previous one as context; history keeps the
+        question as asked, so later turns don't nest those prefixes, and
+        the combined text is neither cached nor learned as a template.
+        """
+        from core.llm import run_question
+
+        if follow_up is None:
+            follow_up = is_follow_up(question, bool(self.history))
+        follow_up = follow_up and bool(self.history)
+
+        with Session(engine) as session:
+            check_cancelled()
+            run = None
+            full_question = question
+            if follow_up:
+                try:
+                    run = self._edit(question, session)
+                except (RequestCancelled, SchedulerFull, BulkheadRejected):
+                    raise
+                except HTTPException:
+                    full_question = f"{self.history[-1][0]} Follow-up: {question}"
+            if run is None:
+                run = run_question(
+                    full_question, self.user_id, self.connection_name, self.model_name, self.provider, session,
+                    compact_schema=self.compact_schema, sample_rows=self.sample_rows,
+                    db=self.db, llm=None if self.model_name == AUTO_MODEL else self.llm,
+                    remember=full_question == question,
+                )
+        self.history.append((question, run["sql"]))
+        return run
+
+
+def result_messages(run: dict, chunk_rows: int = CHAT_CHUNK_ROWS):
+    """The socket events for one finished turn: sql, rows (chunked), done."""
+    from core.result_summary import summarize_frame
+
+    df = run["df"]
+    yield {"type": "sql", "sql": run["sql"], "source": run["sql_source"], "execution_ms": run["execution_ms"]}
+    for start in range(0, len(df), chunk_rows):
+        yield {"type": "rows", "offset": start, "rows": df.iloc[start:start + chunk_rows].to_dict(orient="records")}
+    summary = summarize_frame(df)
+    yield {
+        "type": "done",
+        "answer": summary.describe(),
+        "summary": summary.summary(),
+        "total_records": len(df),
+        "truncated": run.get("truncated", False),
+        "prompt_tokens": run["prompt_tokens"],
+    }
+
+
+# -------- Socket loop --------
+
+async def _receive(websocket) -> dict:
+    try:
+        msg = await websocket.receive_json()
+    except ValueError:
+        return {"type": "invalid"}
+    return msg if isinstance(msg, dict) else {"type": "invalid"}
+
+
+async def serve_chat(websocket, chat: ChatSession) -> None:
+    """
+    Questions are answered one at a time; ones sent meanwhile are queued.
+    {"type": "cancel"} or a disconnect cancels the running turn (provider
+    stream and SQL statement included).
+    """
+    from core.query_log import record_answer, run_result
+
+    async def send(payload: dict):
+        await websocket.send_text(json.dumps(payload, default=str))
+
+    queued: deque[dict] = deque()
+    receiver = None
+    try:
+        while True:
+            if queued:
+                msg = queued.popleft()
+            else:
+                receiver = receiver or asyncio.ensure_future(_receive(websocket))
+                msg = await receiver
+                receiver = None
+
+            kind = msg.get("type", "question")
+            if kind == "reset":
+                chat.history.clear()
+                await send({"type": "reset"})
+                continue
+            if kind == "cancel":
+                continue  # nothing running
+            question = str(msg.get("question") or "").strip()
+            if kind != "question" or not question:
+                await send({"type": "error", "status": 400, "detail": "Expected {\"question\": ...}"})
+                continue
+
+            token = CancelToken()
+            started = time.perf_counter()
+            await send({"type": "status", "stage": "working", "question": question})
+            work = asyncio.ensure_future(run_in_threadpool(token.run, chat.ask, question, msg.get("follow_up")))
+            while not work.done():
+                receiver = receiver or asyncio.ensure_future(_receive(websocket))
+                done, _ = await asyncio.wait({work, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    try:
+                        incoming = receiver.result()
+                    except Exception:
+                        token.cancel("client disconnected")
+                        await asyncio.wait({work})
+                        raise
+                    receiver = None
+                    if incoming.get("type") == "cancel":
+                        token.cancel("cancelled by client")
+                    else:
+                        queued.append(incoming)
+
+            duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                run = work.result()
+            except SchedulerFull as e:
+                await send({"type": "error", "status": 429, "detail": e.detail, "retry_after": e.retry_after})
+                continue
+            except HTTPException as e:
+                record_answer(chat.user_id, chat.connection_name, question, chat.provider, chat.model_name,
+                              duration_ms=duration_ms, error=str(e.detail))
+                await send({"type": "error", "status": e.status_code, "detail": e.detail})
+                continue
+            except Exception as e:
+                record_answer(chat.user_id, chat.connection_name, question, chat.provider, chat.model_name,
+                              duration_ms=duration_ms, error=str(e))
+                raise
+            # the model that wrote the SQL: routed, or the edit model for follow-ups
+            record_answer(
+                chat.user_id, chat.connection_name, question, chat.provider, run.get("model", chat.model_name),
+                duration_ms=duration_ms, result=run_result(run),
+            )
+            for payload in result_messages(run):
+                await send(payload)
+    finally:
+        if receiver is not None:
+            receiver.cancel()
@@ -1,10 +1,17 @@
+from __future__ import annotations
+
 import os
+import threading
 import urllib.parse
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 from sqlmodel import create_engine, Session, select
-from langchain_community.utilities import SQLDatabase
 from db.model import Connection
+from core.cache import get_cache, connection_fingerprint, SCHEMA_TTL
+from core.sqlite_profile import sqlite_path, sqlite_url, is_read_only_sqlite, create_reader_engine
+
+if TYPE_CHECKING:
+    from langchain_community.utilities import SQLDatabase
 
 # App metadata DB (users/connections)
 DATABASE_URL = "sqlite:///data/db_llm.sqlite3"
@@ -14,11 +21,45 @@ def get_session():
     with Session(engine) as session:
         yield session
 
+# Target-DB engines (and their connection pools) shared across requests
+_engines: dict = {}
+_engines_lock = threading.Lock()
+
+def get_engine(db_url: str, count_hit: bool = True):
+    from core.warmup import record_hit
+
+    eng = _engines.get(db_url)
+    if count_hit:
+        record_hit("engine", eng is not None)
+    if eng is None:
+        with _engines_lock:
+            eng = _engines.get(db_url)
+            if eng is None:
+                if is_read_only_sqlite(db_url):
+                    eng = _engines[db_url] = create_reader_engine(db_url)
+                else:
+                    eng = _engines[db_url] = create_engine(db_url, pool_pre_ping=True)
+    return eng
+
 def get_dialect_table_names(user_id: str, connection_name: str) -> dict:
-    db = get_langchain_db_object(user_id, connection_name)
-    return {"dialect": db.dialect, "table_names": db.get_usable_table_names()}
+    db_uri = get_connection_uri(user_id, connection_name)
+
+    def _load():
+        db = _sql_database(db_uri)
+        return {"dialect": db.dialect, "table_names": db.get_usable_table_names()}
+
+    namespace = f"schema:{connection_fingerprint(db_uri)}"
+    return get_cache().get_or_set(namespace, "dialect_table_names", _load, SCHEMA_TTL)
 
 def get_langchain_db_object(user_id: str, connection_name: str) -> SQLDatabase:
+    return _sql_database(get_connection_uri(user_id, connection_name))
+
+def _sql_database(db_uri: str) -> SQLDatabase:
+    from langchain_community.utilities import SQLDatabase
+    # tables are reflected on first use instead of all up front
+    return SQLDatabase(get_engine(db_uri), lazy_table_reflection=True)
+
+def get_connection_uri(user_id: str, connection_name: str) -> str:
     session_gen = get_session()
     session = next(session_gen)
     try:
@@ -31,11 +72,11 @@ def get_langchain_db_object(user_id: str, connection_name: str) -> SQLDatabase:
             raise Exception(f"No DB connection found for user={user_id}, connection_name={connection_name}")
 
         if connection.db_type == "sqlite":
-            basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            sqlite_path = os.path.normpath(os.path.join(basedir, "data", connection.connection_name))
-            if not os.path.isfile(sqlite_path):
-                raise FileNotFoundError(f"SQLite DB file not found at: {sqlite_path}")
-            db_uri = f"sqlite:///{sqlite_path}?check_same_thread=False"
+            path = sqlite_path(connection.connection_name)
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"SQLite DB file not found at: {path}")
+            # same URL as get_connection_string, so both share one engine per file
+            db_uri = sqlite_url(path, connection.writable, connection.immutable)
 
         elif connection.db_type == "postgresql":
             db_uri = (
@@ -52,7 +93,7 @@ def get_langchain_db_object(user_id: str, connection_name: str) -> SQLDatabase:
         else:
             raise ValueError(f"Unsupported DB type: {connection.db_type}")
 
-        return SQLDatabase.from_uri(db_uri)
+        return db_uri
 
     finally:
         session.close()
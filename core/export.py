@@ -0,0 +1,483 @@
+# core/export.py
+
+import csv
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text, or_, and_
+from sqlmodel import Session, select
+
+from core.bulkhead import bulkhead_for
+from core.db import engine
+from db.model import Export
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(BASE_DIR, "data", "exports"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_PROGRESS_INTERVAL = float(os.getenv("EXPORT_PROGRESS_INTERVAL", "2"))  # s between progress writes
+EXPORT_TTL = int(os.getenv("EXPORT_TTL", "86400"))  # s a job (row and file) is kept
+EXPORT_CLEANUP_INTERVAL = float(os.getenv("EXPORT_CLEANUP_INTERVAL", "3600"))
+EXPORT_PARQUET_HOLD_CHUNKS = int(os.getenv("EXPORT_PARQUET_HOLD_CHUNKS", "4"))
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+# -------- Sinks --------
+
+class ExportSink(ABC):
+    """Where finished export files live and how they are read back."""
+
+    name: str
+
+    @abstractmethod
+    def store(self, local_path: str, user_id: int, filename: str) -> str:
+        """Take ownership of a finished local file, return its location."""
+
+    @abstractmethod
+    def size(self, location: str) -> int:
+        pass
+
+    @abstractmethod
+    def read_range(self, location: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield bytes [start, end] (inclusive) of the stored file."""
+
+    @abstractmethod
+    def delete(self, location: str) -> None:
+        pass
+
+
+class LocalDiskSink(ExportSink):
+    name = "local"
+
+    def store(self, local_path: str, user_id: int, filename: str) -> str:
+        # files are already written under EXPORT_DIR
+        return local_path
+
+    def size(self, location: str) -> int:
+        return os.path.getsize(location)
+
+    def read_range(self, location: str, start: int, end: int) -> Iterator[bytes]:
+        with open(location, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, location: str) -> None:
+        if os.path.exists(location):
+            os.remove(location)
+
+
+class S3Sink(ExportSink):
+    """Same bucket as saved queries, under exports/{user_id}/."""
+
+    name = "s3"
+
+    def store(self, local_path: str, user_id: int, filename: str) -> str:
+        from core.s3_utils import get_s3_client, BUCKET_NAME
+
+        key = f"exports/{user_id}/{filename}"
+        # upload_file streams from disk (multipart for large files)
+        get_s3_client().upload_file(local_path, BUCKET_NAME, key)
+        os.remove(local_path)
+        return key
+
+    def size(self, location: str) -> int:
+        from core.s3_utils import get_s3_client, BUCKET_NAME
+
+        return get_s3_client().head_object(Bucket=BUCKET_NAME, Key=location)["ContentLength"]
+
+    def read_range(self, location: str, start: int, end: int) -> Iterator[bytes]:
+        from core.s3_utils import get_s3_client, BUCKET_NAME
+
+        if end < start:
+            return
+        body = get_s3_client().get_object(Bucket=BUCKET_NAME, Key=location, Range=f"bytes={start}-{end}")["Body"]
+        yield from body.iter_chunks(64 * 1024)
+
+    def delete(self, location: str) -> None:
+        from core.s3_utils import get_s3_client, BUCKET_NAME
+
+        get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=location)
+
+
+SINKS = {"local": LocalDiskSink(), "s3": S3Sink()}
+
+
+# -------- Writers --------
+
+class _CsvWriter:
+    def __init__(self, path: str, columns: list[str]):
+        self._f = open(path, "w", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+        self._w.writerow(columns)
+
+    def write(self, rows):
+        self._w.writerows(rows)
+
+    def close(self):
+        self._f.close()
+
+
+class _ParquetWriter:
+    """
+    One row group per chunk; needs pyarrow. The file's schema is fixed by the
+    first chunks, and a column that is all NULL there has no type yet: chunks
+    are held back (up to EXPORT_PARQUET_HOLD_CHUNKS) until every column has
+    one, and columns still untyped after that are written as strings. Held
+    chunks that disagree widen the column (int -> float -> string); a later
+    chunk that doesn't fit the fixed type fails the job rather than being
+    silently truncated.
+    """
+
+    def __init__(self, path: str, columns: list[str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self._path = path
+        self._columns = columns
+        self._writer = None
+        self._held = []
+
+    def _widen(self, a, b):
+        types = self._pa.types
+        if types.is_null(a) or a == b:
+            return b
+        if types.is_null(b):
+            return a
+        if (types.is_integer(a) or types.is_floating(a)) and (types.is_integer(b) or types.is_floating(b)):
+            return self._pa.float64()
+        return self._pa.string()
+
+    def _array(self, values: list):
+        try:
+            return self._pa.array(values)
+        except (self._pa.ArrowInvalid, self._pa.ArrowTypeError):
+            # mixed Python types in one chunk (SQLite's dynamic typing)
+            return self._pa.array([None if v is None else str(v) for v in values], type=self._pa.string())
+
+    def _conform(self, table, schema):
+        columns = []
+        for field, col in zip(schema, table.columns):
+            try:
+                columns.append(col.cast(field.type, safe=True))
+            except (self._pa.ArrowInvalid, self._pa.ArrowTypeError, self._pa.ArrowNotImplementedError):
+                raise ValueError(
+                    f"Column {field.name!r} was written as {field.type}, but a later chunk has {col.type} "
+                    f"values that don't fit; CAST the column in the SQL or export as CSV"
+                )
+        return self._pa.Table.from_arrays(columns, schema=schema)
+
+    def _open(self):
+        types = {c: self._pa.null() for c in self._columns}
+        for table in self._held:
+            for field in table.schema:
+                types[field.name] = self._widen(types[field.name], field.type)
+        schema = self._pa.schema([
+            (c, self._pa.string() if self._pa.types.is_null(types[c]) else types[c]) for c in self._columns
+        ])
+        self._writer = self._pq.ParquetWriter(self._path, schema)
+        for table in self._held:
+            self._writer.write_table(self._conform(table, schema))
+        self._held = []
+
+    def write(self, rows):
+        arrays = list(zip(*rows)) if rows else [[] for _ in self._columns]
+        table = self._pa.Table.from_arrays([self._array(list(col)) for col in arrays], names=self._columns)
+        if self._writer is not None:
+            self._writer.write_table(self._conform(table, self._writer.schema))
+            return
+        self._held.append(table)
+        typed = {f.name for t in self._held for f in t.schema if not self._pa.types.is_null(f.type)}
+        if len(typed) == len(self._columns) or len(self._held) >= EXPORT_PARQUET_HOLD_CHUNKS:
+            self._open()
+
+    def close(self):
+        if self._writer is None and self._held:
+            self._open()
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            # empty result: still produce a valid file
+            self._pq.write_table(
+                self._pa.table({c: self._pa.array([], type=self._pa.null()) for c in self._columns}),
+                self._path,
+            )
+
+
+def _open_writer(fmt: str, path: str, columns: list[str]):
+    if fmt == "csv":
+        return _CsvWriter(path, columns)
+    return _ParquetWriter(path, columns)
+
+
+# -------- Jobs --------
+
+class ExportJob:
+    def __init__(self, user_id: int, connection_name: str, fmt: str, sink: str, question: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.connection_name = connection_name
+        self.format = fmt
+        self.sink = sink
+        self.question = question
+        self.sql_query: Optional[str] = None
+        self.status = "queued"
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.location: Optional[str] = None
+        self.size_bytes: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self._saved_at = 0.0
+
+    @classmethod
+    def from_record(cls, record: Export) -> "ExportJob":
+        job = cls.__new__(cls)
+        job._saved_at = 0.0
+        for name in _RECORD_FIELDS:
+            setattr(job, name, getattr(record, name))
+        return job
+
+    def save(self, throttle: bool = False) -> None:
+        """Write the job's state to the metadata DB (at most every EXPORT_PROGRESS_INTERVAL s when throttled)."""
+        now = time.monotonic()
+        if throttle and now - self._saved_at < EXPORT_PROGRESS_INTERVAL:
+            return
+        self._saved_at = now
+        with Session(engine) as session:
+            session.merge(Export(**{name: getattr(self, name) for name in _RECORD_FIELDS}))
+            session.commit()
+
+    @property
+    def filename(self) -> str:
+        return f"{self.id}.{self.format}"
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "connection_name": self.connection_name,
+            "format": self.format,
+            "sink": self.sink,
+            "question": self.question,
+            "sql_query": self.sql_query,
+            "rows_written": self.rows_written,
+            "chunks_written": self.chunks_written,
+            "size_bytes": self.size_bytes,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+_RECORD_FIELDS = [
+    "id", "user_id", "connection_name", "format", "sink", "question", "sql_query", "status", "rows_written",
+    "chunks_written", "location", "size_bytes", "error", "created_at", "finished_at",
+]
+
+# jobs running in this worker (live progress); every job is also in the Export table
+_jobs: dict[str, ExportJob] = {}
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+_cleaner: Optional[threading.Thread] = None
+
+
+def stream_query_to_file(db_url: str, sql_query: str, fmt: str, path: str, job: ExportJob) -> None:
+    """
+    Run the SQL with a server-side cursor and write it out chunk by chunk,
+    so memory stays bounded by EXPORT_CHUNK_ROWS regardless of result size.
+    """
+    from core.db import get_engine
+
+    # holds one of the database's slots for the whole export, like a user query
+    with bulkhead_for(db_url).slot(), get_engine(db_url).connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS).execute(text(sql_query))
+        writer = _open_writer(fmt, path, list(result.keys()))
+        try:
+            for chunk in result.partitions(EXPORT_CHUNK_ROWS):
+                writer.write([tuple(r) for r in chunk])
+                job.rows_written += len(chunk)
+                job.chunks_written += 1
+                job.save(throttle=True)
+        finally:
+            writer.close()
+
+
+def _run_export(job: ExportJob, provider: str, model_name: str, sql_query: Optional[str]) -> None:
+    from core.db import get_session
+    from core.llm import generate_sql_for_question, remember_export_sql
+    from db.main import get_connection_string
+
+    job.status = "running"
+    job.save()
+    path = os.path.join(EXPORT_DIR, str(job.user_id), job.filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    session = next(get_session())
+    try:
+        db_url = get_connection_string(job.user_id, job.connection_name, session)
+        generated = sql_query is None
+        if generated:
+            sql_query = generate_sql_for_question(
+                job.question, job.user_id, job.connection_name, model_name, provider, session
+            )
+        job.sql_query = sql_query
+
+        stream_query_to_file(db_url, sql_query, job.format, path, job)
+        if generated:
+            remember_export_sql(db_url, job.question, model_name, provider, sql_query)
+
+        sink = SINKS[job.sink]
+        job.location = sink.store(path, job.user_id, job.filename)
+        job.size_bytes = sink.size(job.location)
+        job.status = "done"
+    except HTTPException as e:
+        job.status = "failed"
+        job.error = str(e.detail)
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.now(timezone.utc)
+        session.close()
+        if job.status == "failed" and os.path.exists(path):
+            os.remove(path)
+        try:
+            job.save()
+        finally:
+            with _jobs_lock:
+                _jobs.pop(job.id, None)
+
+
+def submit_export(
+    user_id: int,
+    connection_name: str,
+    fmt: str = "csv",
+    sink: str = "local",
+    question: Optional[str] = None,
+    sql_query: Optional[str] = None,
+    provider: str = "openai",
+    model_name: str = "gpt-4o",
+) -> ExportJob:
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(400, f"Unsupported export format: {fmt}")
+    if sink not in SINKS:
+        raise HTTPException(400, f"Unsupported export sink: {sink}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(400, "Parquet export requires pyarrow to be installed")
+    if not question and not sql_query:
+        raise HTTPException(400, "Either question or sql_query is required")
+
+    job = ExportJob(user_id, connection_name, fmt, sink, question)
+    job.save()
+    with _jobs_lock:
+        _jobs[job.id] = job
+    _executor.submit(_run_export, job, provider, model_name, sql_query)
+    return job
+
+
+def get_export_job(user_id: int, job_id: str) -> ExportJob:
+    """This worker's live copy while the job runs here, else the stored row (any worker)."""
+    job = _jobs.get(job_id)
+    if job is None:
+        with Session(engine) as session:
+            record = session.get(Export, job_id)
+        job = ExportJob.from_record(record) if record is not None else None
+    if job is None or job.user_id != user_id:
+        raise HTTPException(404, f"Export job {job_id} not found")
+    return job
+
+
+def list_export_jobs(user_id: int) -> list[dict]:
+    with Session(engine) as session:
+        records = session.exec(
+            select(Export).where(Export.user_id == user_id).order_by(Export.created_at.desc())
+        ).all()
+    with _jobs_lock:
+        live = dict(_jobs)
+    return [(live.get(r.id) or ExportJob.from_record(r)).to_dict() for r in records]
+
+
+# -------- Cleanup --------
+
+def cleanup_exports(now: Optional[datetime] = None) -> int:
+    """
+    Delete jobs older than EXPORT_TTL together with their files; unfinished
+    ones too (their worker is gone), unless they are running here.
+    Returns how many were removed.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=EXPORT_TTL)
+    with Session(engine) as session:
+        expired = session.exec(select(Export).where(or_(
+            Export.finished_at < cutoff,
+            and_(Export.finished_at.is_(None), Export.created_at < cutoff),
+        ))).all()
+        removed = 0
+        for record in expired:
+            if record.id in _jobs:
+                continue
+            if record.location:
+                try:
+                    SINKS[record.sink].delete(record.location)
+                except Exception:
+                    continue  # keep the row so the next pass retries the file
+            session.delete(record)
+            removed += 1
+        session.commit()
+    return removed
+
+
+def _cleanup_loop() -> None:
+    while True:
+        time.sleep(EXPORT_CLEANUP_INTERVAL)
+        try:
+            cleanup_exports()
+        except Exception:
+            pass  # retried next interval
+
+
+def start_export_cleanup() -> None:
+    global _cleaner
+    if _cleaner is None:
+        _cleaner = threading.Thread(target=_cleanup_loop, name="export-cleanup", daemon=True)
+        _cleaner.start()
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Single-range `bytes=start-end` / `bytes=start-` / `bytes=-suffix`.
+    Returns None when no (usable) range was requested.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_s, _, end_s = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s == "":
+            length = int(end_s)
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(416, "Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
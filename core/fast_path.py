@@ -0,0 +1,187 @@
+# core/fast_path.py
+
+import difflib
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.85"))
+FAST_PATH_LIST_LIMIT = int(os.getenv("FAST_PATH_LIST_LIMIT", "1000"))
+FAST_PATH_DIALECTS = ("sqlite", "postgresql", "mysql", "mariadb", "duckdb")
+
+_VERB = r"(?:show|list|get|find|fetch|display|select|return|give)"
+_LEAD = rf"(?:(?:can you |please )?{_VERB}(?: me)?(?: all)?(?: of)?(?: the)? |all(?: the)? |every )"
+_OP = r"(?:=|==|is equal to|equals|is|of)"
+
+# (intent, regex); first match wins, so the more specific shapes come first
+_PATTERNS = [
+    ("count_where", re.compile(
+        rf"^(?:how many|count(?: the)?(?: number of)?|number of) (?P<table>.+?) (?:are there |do we have |exist )?"
+        rf"(?:where|with|whose|that have|having) (?:the )?(?P<column>.+?) {_OP} (?P<value>.+?)$")),
+    ("count", re.compile(
+        r"^(?:how many|count(?: all)?(?: the)?(?: number of)?|(?:the |total )?number of) (?P<table>.+?)"
+        r"(?: are there| do we have| exist| are in the (?:database|db)| in total| total)?$")),
+    ("where", re.compile(
+        rf"^{_LEAD}?(?P<table>.+?) (?:where|with|whose|that have|having) (?:the )?(?P<column>.+?) {_OP} (?P<value>.+?)$")),
+    ("first_n", re.compile(
+        rf"^(?:{_VERB}(?: me)? )?(?:the )?(?:first|top) (?P<n>\d+) (?P<table>.+?)$")),
+    ("list", re.compile(rf"^{_LEAD}(?P<table>.+?)$")),
+]
+
+# values that mean the question is not a plain equality filter
+_NOT_EQUALITY = re.compile(
+    r"^(?:not|greater|less|more|fewer|above|below|over|under|between|at least|at most|before|after|like|"
+    r"null|empty|missing|in|any|[<>!])\b|[<>]| (?:and|or|but|order|sorted|by|per|group)\b"
+)
+
+_lock = threading.Lock()
+_stats = defaultdict(int)
+
+
+def _bump(name: str, by: float = 1) -> None:
+    with _lock:
+        _stats[name] += by
+
+
+def fast_path_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats.get("hits", 0) + stats.get("no_pattern", 0) + stats.get("low_confidence", 0)
+    stats["hit_rate"] = round(stats.get("hits", 0) / max(1, lookups), 3)
+    stats["avg_match_us"] = round(stats.pop("match_us_total", 0) / max(1, lookups), 1)
+    return stats
+
+
+# -------- Name index --------
+
+def _words(name: str) -> str:
+    # OrderDetail / order_details / "Order Details" -> "order detail(s)"
+    spaced = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", name)
+    return " ".join(re.split(r"[\s_\-.]+", spaced.lower())).strip()
+
+
+def _variants(name: str) -> set[str]:
+    words = _words(name)
+    out = {name.lower(), words, words.replace(" ", "")}
+    for w in list(out):
+        if w.endswith("ies"):
+            out.add(w[:-3] + "y")
+        elif w.endswith("s"):
+            out.add(w[:-1])
+        if w.endswith("y"):
+            out.add(w[:-1] + "ies")
+        else:
+            out.add(w + "s")
+            out.add(w + "es")
+    return {v for v in out if v}
+
+
+def build_index(schema: dict[str, list[str]]) -> dict:
+    """Lower-cased name variants (spacing, plurals) -> real table/column names."""
+    tables, columns = {}, {}
+    for table, cols in schema.items():
+        for v in _variants(table):
+            tables.setdefault(v, table)
+        columns[table] = {}
+        for col in cols:
+            for v in _variants(col):
+                columns[table].setdefault(v, col)
+    return {"tables": tables, "columns": columns}
+
+
+def _resolve(phrase: str, names: dict[str, str]) -> tuple[str | None, float]:
+    phrase = re.sub(r"^(?:the|a|an) ", "", phrase.strip(" ?.!'\""))
+    if phrase in names:
+        return names[phrase], 1.0
+    best = difflib.get_close_matches(phrase, names.keys(), n=1, cutoff=0.6)
+    if not best:
+        return None, 0.0
+    return names[best[0]], difflib.SequenceMatcher(None, phrase, best[0]).ratio()
+
+
+def _literal(raw: str):
+    value = raw.strip().strip("?.!").strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"`":
+        return value[1:-1]
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    if re.fullmatch(r"-?\d+\.\d+", value):
+        return float(value)
+    return value
+
+
+# -------- Matching --------
+
+def match_question(question: str, index: dict, dialect: str) -> dict | None:
+    """
+    Deterministic SQL for trivial question shapes. Returns
+    {"intent", "sql", "params", "display", "row_limit", "confidence"} or None.
+    Lists are capped at `row_limit` rows; `sql` fetches one more so the
+    caller can tell when the cap cut the result short.
+    """
+    if dialect not in FAST_PATH_DIALECTS:
+        return None
+    q = " ".join(question.strip().rstrip("?.!").split())
+    normalized = q.lower()
+
+    for intent, pattern in _PATTERNS:
+        m = pattern.match(normalized)
+        if not m:
+            continue
+        table, confidence = _resolve(m.group("table"), index["tables"])
+        if table is None:
+            return {"intent": intent, "confidence": 0.0}
+
+        quote = '"{}"'.format if dialect != "mysql" and dialect != "mariadb" else "`{}`".format
+        params, where = {}, ""
+        if "column" in m.groupdict():
+            column, col_conf = _resolve(m.group("column"), index["columns"][table])
+            if column is None:
+                return {"intent": intent, "confidence": 0.0}
+            confidence = min(confidence, col_conf)
+            start, end = m.span("value")
+            if _NOT_EQUALITY.search(q[start:end].lower()):
+                return None
+            params["value"] = _literal(q[start:end])  # original casing
+            if isinstance(params["value"], str):
+                # people rarely type values in the stored case
+                where = f" WHERE LOWER({quote(column)}) = LOWER(:value)"
+            else:
+                where = f" WHERE {quote(column)} = :value"
+
+        row_limit = None
+        if intent.startswith("count"):
+            sql = display = f"SELECT COUNT(*) AS count FROM {quote(table)}{where}"
+        elif intent == "first_n":
+            sql = display = f"SELECT * FROM {quote(table)} LIMIT {int(m.group('n'))}"
+        else:
+            row_limit = FAST_PATH_LIST_LIMIT
+            sql = f"SELECT * FROM {quote(table)}{where} LIMIT {row_limit + 1}"
+            display = f"SELECT * FROM {quote(table)}{where} LIMIT {row_limit}"
+
+        if "value" in params:
+            v = params["value"]
+            display = display.replace(":value", str(v) if isinstance(v, (int, float)) else "'" + v.replace("'", "''") + "'")
+        return {
+            "intent": intent, "sql": sql, "params": params, "display": display, "row_limit": row_limit,
+            "confidence": round(confidence, 3),
+        }
+    return None
+
+
+def try_fast_path(question: str, index: dict, dialect: str, min_confidence: float = FAST_PATH_MIN_CONFIDENCE) -> dict | None:
+    """match_question plus hit-rate accounting; None means ask the LLM."""
+    started = time.perf_counter()
+    match = match_question(question, index, dialect)
+    _bump("match_us_total", (time.perf_counter() - started) * 1e6)
+    if match is None:
+        _bump("no_pattern")
+        return None
+    if match["confidence"] < min_confidence:
+        _bump("low_confidence")
+        return None
+    _bump("hits")
+    _bump(f"hits_{match['intent']}")
+    return match
@@ -0,0 +1,214 @@
+# core/federated.py
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Iterator, TYPE_CHECKING
+
+from fastapi import HTTPException
+
+from core.cancellation import CancelToken
+from core.query_log import record_answer, run_result
+from core.scheduler import SchedulerFull
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+FEDERATED_MAX_WORKERS = int(os.getenv("FEDERATED_MAX_WORKERS", "8"))
+FEDERATED_MAX_CONNECTIONS = int(os.getenv("FEDERATED_MAX_CONNECTIONS", "8"))
+FEDERATED_PREVIEW_ROWS = int(os.getenv("FEDERATED_PREVIEW_ROWS", "50"))
+FEDERATED_MAX_MERGED_ROWS = int(os.getenv("FEDERATED_MAX_MERGED_ROWS", "10000"))
+SOURCE_COLUMN = "_source"
+
+_executor = ThreadPoolExecutor(max_workers=FEDERATED_MAX_WORKERS, thread_name_prefix="federated")
+
+
+def _records(df: pd.DataFrame, limit: int) -> list[dict]:
+    # to_json handles numpy scalars, timestamps and NaN in one vectorized pass
+    return json.loads(df.head(limit).to_json(orient="records", date_format="iso", default_handler=str))
+
+
+def _event(payload: dict) -> bytes:
+    return (json.dumps(payload, default=str) + "\n").encode()
+
+
+def _answer_one(question: str, user_id: int, connection_name: str, provider: str, model_name: str) -> dict:
+    from core.db import get_session
+    from core.llm import run_question
+
+    started = time.perf_counter()
+    session = next(get_session())
+    try:
+        # each leg's LLM call is admitted separately, so federation can't bypass fairness
+        run = run_question(question, user_id, connection_name, model_name, provider, session)
+    except SchedulerFull:
+        raise
+    except Exception as e:
+        record_answer(user_id, connection_name, question, provider, model_name,
+                      duration_ms=(time.perf_counter() - started) * 1000,
+                      error=str(e.detail if isinstance(e, HTTPException) else e))
+        raise
+    finally:
+        session.close()
+    run["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    record_answer(user_id, connection_name, question, provider, run.get("model", model_name),
+                  duration_ms=run["elapsed_ms"], result=run_result(run))
+    return run
+
+
+# -------- merging --------
+
+def _normalized(df: pd.DataFrame) -> pd.DataFrame:
+    return df.rename(columns={c: str(c).lower() for c in df.columns})
+
+
+def merge_results(frames: dict[str, pd.DataFrame], strategy: str = "auto") -> tuple[str, pd.DataFrame | None]:
+    """
+    Combine per-connection results in-process.
+
+    union: same columns everywhere -> stacked, tagged with a _source column
+    join:  otherwise, outer join on the columns all results share, with
+           non-key columns prefixed by connection name
+    auto:  union if possible, else join if there is a shared key, else none
+    """
+    import pandas as pd
+
+    frames = {name: _normalized(df) for name, df in frames.items() if df is not None}
+    if not frames:
+        return "none", None
+
+    column_sets = [frozenset(df.columns) for df in frames.values()]
+    same_columns = all(cols == column_sets[0] for cols in column_sets)
+    shared = frozenset.intersection(*column_sets)
+
+    if strategy == "auto":
+        strategy = "union" if same_columns else ("join" if shared else "none")
+
+    if strategy == "union":
+        if not same_columns:
+            raise HTTPException(400, "Results have different columns; union is not possible")
+        ordered = list(next(iter(frames.values())).columns)
+        merged = pd.concat(
+            [df[ordered].assign(**{SOURCE_COLUMN: name}) for name, df in frames.items()],
+            ignore_index=True,
+        )
+        return "union", merged
+
+    if strategy == "join":
+        if not shared:
+            raise HTTPException(400, "Results share no columns to join on")
+        keys = [c for c in next(iter(frames.values())).columns if c in shared]
+        merged = None
+        for name, df in frames.items():
+            renamed = df.rename(columns={c: f"{name}.{c}" for c in df.columns if c not in shared})
+            merged = renamed if merged is None else merged.merge(renamed, on=keys, how="outer")
+        return "join", merged
+
+    return "none", None
+
+
+# -------- fan-out --------
+
+def federated_answer(
+    question: str,
+    user_id: int,
+    connection_names: list[str],
+    provider: str,
+    model_name: str,
+    timeout: float,
+    merge: str = "auto",
+    token: CancelToken | None = None,
+) -> Iterator[bytes]:
+    """
+    Run the question on every connection in parallel and stream NDJSON events:
+    one `partial` (or `error` / `timeout`) per connection as it finishes, then
+    a final `merged` event. Total latency is that of the slowest connection,
+    capped at `timeout`. A leg answered by a capped fast-path list is marked
+    `truncated` in its `partial` event and listed in the merged event's
+    `truncated_connections`: the merged rows are incomplete for it.
+
+    Each leg runs under its own CancelToken: a leg still running at `timeout`
+    is cancelled (provider stream and statement included), and cancelling
+    `token` (the client went away) cancels every leg.
+    """
+    names = list(dict.fromkeys(connection_names))
+    if not names:
+        raise HTTPException(400, "At least one connection_name is required")
+    if len(names) > FEDERATED_MAX_CONNECTIONS:
+        raise HTTPException(400, f"At most {FEDERATED_MAX_CONNECTIONS} connections per question")
+    if merge not in ("auto", "union", "join", "none"):
+        raise HTTPException(400, f"Unsupported merge strategy: {merge}")
+
+    futures, legs = {}, {}
+    for name in names:
+        leg = CancelToken()
+        future = _executor.submit(leg.run, _answer_one, question, user_id, name, provider, model_name)
+        futures[future], legs[future] = name, leg
+        if token is not None:
+            unregister = token.on_cancel(lambda leg=leg: leg.cancel(token.reason, token.status_code))
+            # a finished leg needs no cancelling: don't keep it alive on the request's token
+            future.add_done_callback(lambda _, unregister=unregister: unregister())
+
+    def _stream():
+        frames, truncated = {}, []
+        pending = set(futures)
+        yield _event({"type": "started", "connections": names, "timeout_s": timeout})
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                pending.discard(future)
+                name = futures[future]
+                try:
+                    run = future.result()
+                except SchedulerFull as e:
+                    yield _event({"type": "error", "connection_name": name, "status_code": 429, "detail": e.detail, "retry_after": e.retry_after})
+                    continue
+                except HTTPException as e:
+                    yield _event({"type": "error", "connection_name": name, "status_code": e.status_code, "detail": e.detail})
+                    continue
+                except Exception as e:
+                    yield _event({"type": "error", "connection_name": name, "status_code": 500, "detail": str(e)})
+                    continue
+                df = run["df"]
+                frames[name] = df
+                if run.get("truncated"):
+                    truncated.append(name)
+                yield _event({
+                    "type": "partial",
+                    "connection_name": name,
+                    "sql": run["sql"],
+                    "elapsed_ms": run["elapsed_ms"],
+                    "total_records": len(df),
+                    "truncated": bool(run.get("truncated")),
+                    "columns": [str(c) for c in df.columns],
+                    "preview": _records(df, FEDERATED_PREVIEW_ROWS),
+                })
+        except FutureTimeout:
+            for future in pending:
+                future.cancel()  # not started yet
+                legs[future].cancel(f"no answer within {timeout:g}s", 504)
+                yield _event({"type": "timeout", "connection_name": futures[future], "timeout_s": timeout})
+
+        try:
+            strategy, merged = merge_results(frames, merge)
+        except HTTPException as e:
+            yield _event({"type": "merged", "strategy": merge, "error": e.detail})
+            return
+        if merged is None:
+            yield _event({"type": "merged", "strategy": strategy, "connections": list(frames),
+                          "truncated_connections": truncated, "total_records": 0, "rows": []})
+            return
+        yield _event({
+            "type": "merged",
+            "strategy": strategy,
+            "connections": list(frames),
+            "truncated_connections": truncated,
+            "columns": [str(c) for c in merged.columns],
+            "total_records": len(merged),
+            "truncated": len(merged) > FEDERATED_MAX_MERGED_ROWS,
+            "rows": _records(merged, FEDERATED_MAX_MERGED_ROWS),
+        })
+
+    return _stream()
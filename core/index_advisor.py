@@ -0,0 +1,389 @@
+# core/index_advisor.py
+
+import json
+import os
+import re
+import statistics
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import inspect
+from sqlmodel import Session, select
+
+from db.model import Connection
+from core.bulkhead import bulkhead_for
+from core.cancellation import CancelToken, check_cancelled, stage, cancellable_statement
+from core.query_log import slow_queries
+
+ADVISOR_MAX_QUERIES = int(os.getenv("ADVISOR_MAX_QUERIES", "200"))
+ADVISOR_REPLAY_TIMEOUT = float(os.getenv("ADVISOR_REPLAY_TIMEOUT", "60"))  # seconds per replayed statement
+ADVISOR_MAX_COLUMNS = 3  # per proposed index
+ADVISOR_DIALECTS = ("sqlite", "postgresql", "mysql", "mariadb")
+
+_IDENT = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|[A-Za-z_][\w$]*)'
+_COLUMN_REF = rf"(?:(?P<q{{n}}>{_IDENT})\s*\.\s*)?(?P<c{{n}}>{_IDENT})"
+_PREDICATE = re.compile(
+    _COLUMN_REF.format(n=1)
+    + r"\s*(?P<op>=|==|<=|>=|<>|!=|<|>|\bnot\s+in\b|\bin\b|\bbetween\b|\blike\b)\s*"
+    + rf"(?:{_COLUMN_REF.format(n=2)}(?![\w$]|\s*[(.]))?",
+    re.IGNORECASE,
+)
+_TABLE_REF = re.compile(rf"\b(?:from|join)\s+(?P<table>{_IDENT}(?:\s*\.\s*{_IDENT})?)(?:\s+(?:as\s+)?(?P<alias>{_IDENT}))?",
+                        re.IGNORECASE)
+_CLAUSE = re.compile(
+    r"\b(where|on|having|group\s+by|order\s+by|limit|join|union|select|from|window|offset|returning)\b",
+    re.IGNORECASE,
+)
+_KEYWORDS = frozenset(
+    "where on join inner left right full outer cross natural group order limit having union select as using "
+    "and or not null is in between like true false case when then else end".split()
+)
+_SELECT = re.compile(r"^\s*(?:select|with)\b", re.IGNORECASE)
+
+
+def _unquote(name: str) -> str:
+    name = name.strip()
+    if name[:1] in "\"`[":
+        return name[1:-1]
+    return name
+
+
+# -------- Reading SQL --------
+
+def _aliases(sql: str, tables: set[str]) -> dict[str, str]:
+    """alias (or bare name), lower-cased -> real table name."""
+    lowered = {t.lower(): t for t in tables}
+    out = {}
+    for m in _TABLE_REF.finditer(sql):
+        name = _unquote(m.group("table").split(".")[-1])
+        table = lowered.get(name.lower())
+        if table is None:
+            continue
+        out[table.lower()] = table
+        alias = m.group("alias")
+        if alias and alias.lower() not in _KEYWORDS:
+            out[_unquote(alias).lower()] = table
+    return out
+
+
+def _predicate_segments(sql: str) -> list[str]:
+    """The text of every WHERE / ON / HAVING clause."""
+    parts = _CLAUSE.split(sql)
+    # re.split with one group alternates text, keyword, text, ...
+    return [parts[i + 1] for i in range(1, len(parts) - 1, 2) if parts[i].lower() in ("where", "on", "having")]
+
+
+def filter_columns(sql: str, columns: dict[str, list[str]]) -> dict[str, dict[str, list[str]]]:
+    """
+    Columns the query filters or joins on, per table:
+    {table: {"eq": [...], "range": [...]}}, in order of appearance.
+    Unqualified names are attributed when exactly one table in the query has them.
+    """
+    aliases = _aliases(sql, set(columns))
+    in_query = set(aliases.values())
+    by_table = {t: {c.lower(): c for c in columns[t]} for t in in_query}
+    out: dict[str, dict[str, list[str]]] = defaultdict(lambda: {"eq": [], "range": []})
+
+    def resolve(qualifier, name):
+        name = _unquote(name).lower()
+        if qualifier:
+            table = aliases.get(_unquote(qualifier).lower())
+            return (table, by_table[table][name]) if table and name in by_table[table] else None
+        owners = [t for t in in_query if name in by_table[t]]
+        return (owners[0], by_table[owners[0]][name]) if len(owners) == 1 else None
+
+    for segment in _predicate_segments(sql):
+        for m in _PREDICATE.finditer(segment):
+            op = " ".join(m.group("op").lower().split())
+            kind = "eq" if op in ("=", "==", "in") else "range"
+            if op in ("<>", "!=", "not in", "like"):
+                kind = "range"  # an index still narrows LIKE 'x%', rarely the others
+            sides = [resolve(m.group("q1"), m.group("c1"))]
+            if m.group("c2") and m.group("c2").lower() not in _KEYWORDS:
+                sides.append(resolve(m.group("q2"), m.group("c2")))  # join: both sides
+            for side in sides:
+                if side is None:
+                    continue
+                table, column = side
+                used = out[table]
+                if column in used["eq"] or (kind == "range" and column in used["range"]):
+                    continue
+                if kind == "eq" and column in used["range"]:
+                    used["range"].remove(column)
+                used[kind].append(column)
+    return {t: v for t, v in out.items() if v["eq"] or v["range"]}
+
+
+# -------- Plans --------
+
+def scanned_tables(conn, sql: str, columns: dict[str, list[str]]) -> set[str]:
+    """Tables the plan reads in full (or, on SQLite, builds a throwaway index for)."""
+    dialect = conn.dialect.name
+    aliases = _aliases(sql, set(columns))
+    out = set()
+    if dialect == "sqlite":
+        for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+            detail = str(row[-1])
+            m = re.match(r"(?:SCAN|SEARCH) (?:TABLE )?(\S+)(?: AS (\S+))?", detail)
+            if not m:
+                continue
+            full_scan = detail.startswith("SCAN") and "USING" not in detail
+            if full_scan or "AUTOMATIC" in detail:
+                table = aliases.get((m.group(2) or m.group(1)).lower())
+                if table:
+                    out.add(table)
+    elif dialect == "postgresql":
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        stack = [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if node.get("Node Type") == "Seq Scan":
+                table = aliases.get(str(node.get("Alias", node.get("Relation Name"))).lower())
+                if table:
+                    out.add(table)
+            stack.extend(node.get("Plans", []))
+    elif dialect in ("mysql", "mariadb"):
+        result = conn.exec_driver_sql(f"EXPLAIN {sql}")
+        keys = list(result.keys())
+        for row in result.fetchall():
+            r = dict(zip(keys, row))
+            if str(r.get("type")).upper() == "ALL" and r.get("table"):
+                table = aliases.get(str(r["table"]).lower())
+                if table:
+                    out.add(table)
+    return out
+
+
+# -------- Advice --------
+
+def _existing_prefixes(insp, table: str, pk: list[str]) -> set[tuple[str, ...]]:
+    """Leading columns already served by an index or the primary key."""
+    out = set()
+    if pk:
+        out.add((pk[0],))
+    for ix in insp.get_indexes(table):
+        cols = [c for c in ix.get("column_names") or [] if c]
+        if cols:
+            out.add((cols[0],))
+    return out
+
+
+def _index_name(table: str, cols: list[str]) -> str:
+    name = re.sub(r"\W+", "_", f"ix_advisor_{table}_{'_'.join(cols)}").lower()
+    return name[:63]
+
+
+def create_statement(engine, table: str, cols: list[str]) -> str:
+    quote = engine.dialect.identifier_preparer.quote
+    if_not_exists = "" if engine.dialect.name in ("mysql", "mariadb") else "IF NOT EXISTS "
+    return (f"CREATE INDEX {if_not_exists}{quote(_index_name(table, cols))} "
+            f"ON {quote(table)} ({', '.join(quote(c) for c in cols)})")
+
+
+def advise_workload(engine, workload: list[dict]) -> dict:
+    """
+    `workload` rows are slow_queries() entries. A proposal is made for each
+    (table, columns) that some query filters or joins on while its plan
+    scans that table. Columns already leading an index are left out;
+    equality columns come first, then at most one range column.
+    Benefit is the workload time of the affected queries (runs x mean ms),
+    an upper bound on what the index can save; benchmark mode measures it.
+    """
+    if engine.dialect.name not in ADVISOR_DIALECTS:
+        raise HTTPException(400, f"Index advice is not supported for {engine.dialect.name}")
+    from core.reflection import reflect_catalog
+
+    insp = inspect(engine)
+    tables = reflect_catalog(engine)
+    columns = {t: [c["name"] for c in info["columns"]] for t, info in tables.items() if info["kind"] == "table"}
+    existing = {}
+    proposals: dict[tuple, dict] = {}
+    analyzed = failed = 0
+
+    with engine.connect() as conn:
+        for q in workload:
+            sql = (q.get("sql") or "").strip().rstrip(";")
+            if not _SELECT.match(sql):
+                continue
+            try:
+                scanned = scanned_tables(conn, sql, columns)
+            except Exception:
+                failed += 1  # schema changed since the query ran, or not explainable
+                conn.rollback()
+                continue
+            analyzed += 1
+            for table, used in filter_columns(sql, columns).items():
+                if table not in scanned:
+                    continue
+                if table not in existing:
+                    existing[table] = _existing_prefixes(insp, table, tables[table]["pk"])
+                eq = [c for c in used["eq"] if (c,) not in existing[table]]
+                rng = [c for c in used["range"] if (c,) not in existing[table]]
+                cols = (eq + rng[:1])[:ADVISOR_MAX_COLUMNS]
+                if not cols:
+                    continue
+                p = proposals.setdefault((table, tuple(cols)), {
+                    "name": _index_name(table, cols),
+                    "table": table,
+                    "columns": cols,
+                    "statement": create_statement(engine, table, cols),
+                    "queries": 0,
+                    "runs": 0,
+                    "benefit_ms": 0.0,
+                    "sql_hashes": [],
+                })
+                p["queries"] += 1
+                p["runs"] += q.get("runs") or 1
+                p["benefit_ms"] += (q.get("runs") or 1) * (q.get("avg_execution_ms") or 0)
+                p["sql_hashes"].append(q.get("sql_hash"))
+
+    ranked = sorted(proposals.values(), key=lambda p: p["benefit_ms"], reverse=True)
+    for p in ranked:
+        p["benefit_ms"] = round(p["benefit_ms"], 1)
+    return {
+        "dialect": engine.dialect.name,
+        "queries_analyzed": analyzed,
+        "queries_failed": failed,
+        "proposals": ranked,
+    }
+
+
+def _create(engine, proposals: list[dict], created: list[str] | None = None) -> list[str]:
+    """Names are appended to `created` as each index lands, so a failure part-way is known."""
+    created = [] if created is None else created
+    # CONCURRENTLY avoids blocking writers on Postgres but needs autocommit
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as conn:
+        for p in proposals:
+            stmt = p["statement"]
+            if engine.dialect.name == "postgresql":
+                stmt = stmt.replace("CREATE INDEX ", "CREATE INDEX CONCURRENTLY ", 1)
+            conn.exec_driver_sql(stmt)
+            created.append(p["name"])
+    return created
+
+
+def _drop(engine, proposals: list[dict]) -> None:
+    quote = engine.dialect.identifier_preparer.quote
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as conn:
+        for p in proposals:
+            if engine.dialect.name in ("mysql", "mariadb"):
+                conn.exec_driver_sql(f"DROP INDEX {quote(p['name'])} ON {quote(p['table'])}")
+            else:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {quote(p['name'])}")
+
+
+def _replay(engine, workload: list[dict], repeat: int) -> dict[str, float]:
+    bulkhead = bulkhead_for(engine.url.render_as_string(hide_password=False))
+    timings = {}
+    with engine.connect() as conn:
+        for q in workload:
+            sql = (q.get("sql") or "").strip().rstrip(";")
+            if not _SELECT.match(sql):
+                continue
+            runs = []
+            for _ in range(repeat):
+                with bulkhead.slot(), stage("sql"), cancellable_statement(conn):
+                    started = time.perf_counter()
+                    try:
+                        conn.exec_driver_sql(sql).fetchall()
+                    except Exception:
+                        check_cancelled()  # an interrupted statement surfaces as a driver error
+                        raise
+                    runs.append((time.perf_counter() - started) * 1000)
+            timings[q["sql_hash"]] = round(statistics.median(runs), 3)
+    return timings
+
+
+def replay(engine, workload: list[dict], repeat: int = 3, timeout: float = ADVISOR_REPLAY_TIMEOUT) -> dict[str, float]:
+    """
+    Median wall time (ms) per query, fetching every row, bypassing the result cache.
+    Each run takes a slot in the database's bulkhead like a user query, and
+    is cancelled server-side after `timeout` seconds (504).
+    """
+    return CancelToken({"sql": timeout}).run(_replay, engine, workload, repeat)
+
+
+def benchmark_workload(engine, workload: list[dict], proposals: list[dict], repeat: int = 3, keep: bool = False) -> dict:
+    """Replay the workload, create the indexes, replay again; drop them unless `keep`."""
+    before = replay(engine, workload, repeat)
+    created = []
+    try:
+        _create(engine, proposals, created)
+        after = replay(engine, workload, repeat)
+    finally:
+        if not keep:
+            # only what was created: a proposal may have failed part-way through
+            _drop(engine, [p for p in proposals if p["name"] in created])
+    queries = [
+        {
+            "sql_hash": h,
+            "before_ms": before[h],
+            "after_ms": after.get(h),
+            "speedup": round(before[h] / after[h], 2) if after.get(h) else None,
+        }
+        for h in before
+    ]
+    total_before, total_after = sum(before.values()), sum(after.values())
+    return {
+        "indexes": [p["name"] for p in proposals],
+        "kept": keep,
+        "repeat": repeat,
+        "total_before_ms": round(total_before, 3),
+        "total_after_ms": round(total_after, 3),
+        "speedup": round(total_before / total_after, 2) if total_after else None,
+        "queries": sorted(queries, key=lambda q: q["before_ms"], reverse=True),
+    }
+
+
+# -------- Per connection (used by the endpoints) --------
+
+def _connection(user_id: int, connection_name: str, session: Session):
+    from core.db import get_engine
+    from db.main import get_connection_string
+
+    row = session.exec(
+        select(Connection).where(Connection.user_id == user_id, Connection.connection_name == connection_name)
+    ).first()
+    if row is None:
+        raise HTTPException(404, f"No connection named {connection_name}")
+    return row, get_engine(get_connection_string(user_id, connection_name, session))
+
+
+def _workload(user_id: int, connection_name: str, since_hours: float | None) -> list[dict]:
+    return slow_queries(user_id, connection_name, since_hours=since_hours, limit=ADVISOR_MAX_QUERIES)
+
+
+def advise(user_id: int, connection_name: str, session: Session, since_hours: float | None = None) -> dict:
+    _, engine = _connection(user_id, connection_name, session)
+    advice = advise_workload(engine, _workload(user_id, connection_name, since_hours))
+    return {"connection_name": connection_name, **advice}
+
+
+def _writable(user_id: int, connection_name: str, session: Session, since_hours, names):
+    row, engine = _connection(user_id, connection_name, session)
+    if not row.writable:
+        raise HTTPException(403, f"Connection {connection_name} is not flagged writable")
+    workload = _workload(user_id, connection_name, since_hours)
+    proposals = advise_workload(engine, workload)["proposals"]
+    if names:
+        proposals = [p for p in proposals if p["name"] in names]
+    return engine, workload, proposals
+
+
+def apply_indexes(user_id: int, connection_name: str, session: Session,
+                  names: list[str] | None = None, since_hours: float | None = None) -> dict:
+    """Create the proposed indexes (all, or those named) on a writable connection."""
+    engine, _, proposals = _writable(user_id, connection_name, session, since_hours, names)
+    return {"connection_name": connection_name, "created": _create(engine, proposals)}
+
+
+def benchmark(user_id: int, connection_name: str, session: Session, names: list[str] | None = None,
+              since_hours: float | None = None, repeat: int = 3, keep: bool = False) -> dict:
+    engine, workload, proposals = _writable(user_id, connection_name, session, since_hours, names)
+    if not proposals:
+        return {"connection_name": connection_name, "indexes": [], "queries": []}
+    return {"connection_name": connection_name, **benchmark_workload(engine, workload, proposals, repeat, keep)}
@@ -1,24 +1,41 @@
+from __future__ import annotations
+
 import os
 from fastapi import HTTPException
-from pathlib import Path
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING
 from typing_extensions import TypedDict
 from sqlmodel import Session, select
 from cryptography.fernet import Fernet
-from langchain_community.utilities import SQLDatabase
-from langchain.chains import create_sql_query_chain
-from langchain_openai import ChatOpenAI
 from sqlalchemy import text
-import pandas as pd
+import httpx
 import re
+import time
 
 from db.model import APIKey, User
 from db.main import get_connection_string
 from core.db import get_session as core_get_session  # to open a session if caller didn't
+from core.scheduler import scheduler, SCHEDULER_COMPLETION_TOKENS
+from core.schema_render import render_compact_table_info, render_ddl_table_info
+from core.prompt_metrics import count_tokens, record_prompt
+from core.startup import load_env
+from core.cache import get_cache, connection_fingerprint, SCHEMA_TTL, SQL_TTL, RESULT_TTL
+from core.warmup import record_hit
+from core.sql_templates import match_template, remember_template
+from core.value_index import value_hints
+from core.model_router import AUTO_MODEL, tier_models
+from core.approximate import plan_sample, estimate_frame, describe_plan
+from core.bulkhead import bulkhead_for
+from core.usage_ledger import metered_call, note_response
+from core.cancellation import current_token, check_cancelled, stage, cancellable_statement
+
+# LangChain / langchain_openai / pandas take >1s to import, so they are
+# imported where used (and preloaded in the background at startup).
+if TYPE_CHECKING:
+    import pandas as pd
+    from langchain_community.utilities import SQLDatabase
 
 # Load .env
-env_path = Path(__file__).resolve().parent.parent / ".env"
-load_dotenv(dotenv_path=env_path)
+load_env()
 
 class State(TypedDict):
     question: str
@@ -26,7 +43,39 @@ class State(TypedDict):
     result: str
     answer: str
 
-def _resolve_api_key(provider: str, session: Session, user_id: int) -> str:
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "900"))
+MODELS_CACHE_TTL = int(os.getenv("MODELS_CACHE_TTL", "3600"))
+
+# Decrypted provider keys stay in this process only (never in the shared
+# cache); changes are broadcast as invalidations of the "apikey:<user_id>" namespace
+_api_keys: dict[tuple[int, str], tuple[str, float]] = {}
+_api_key_listener = False
+
+def _drop_api_keys(namespace: str, _key=None) -> None:
+    user_id = int(namespace.split(":", 1)[1])
+    for k in [k for k in _api_keys if k[0] == user_id]:
+        _api_keys.pop(k, None)
+
+def _listen_for_api_key_changes() -> None:
+    global _api_key_listener
+    if not _api_key_listener:
+        get_cache().subscribe("apikey", _drop_api_keys)
+        _api_key_listener = True
+    get_cache().drain_events()
+
+def forget_api_keys(user_id: int) -> None:
+    """Call when a user's provider keys or Fernet key change; every worker drops its copies."""
+    _listen_for_api_key_changes()
+    get_cache().invalidate(f"apikey:{user_id}")
+
+def _resolve_api_key(provider: str, session: Session, user_id: int, count_hit: bool = True) -> str:
+    _listen_for_api_key_changes()
+    cached = _api_keys.get((user_id, provider))
+    if count_hit:
+        record_hit("api_key", cached is not None and cached[1] > time.monotonic())
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+
     record = session.exec(
         select(APIKey).where(APIKey.user_id == user_id, APIKey.provider == provider)
     ).first()
@@ -37,19 +86,94 @@ def _resolve_api_key(provider: str, session: Session, user_id: int) -> str:
     if not user or not user.fernet_key:
         raise HTTPException(404, "Fernet key missing")
 
-    return Fernet(user.fernet_key.encode()).decrypt(record.encrypted_key.encode()).decode()
+    api_key = Fernet(user.fernet_key.encode()).decrypt(record.encrypted_key.encode()).decode()
+    _api_keys[(user_id, provider)] = (api_key, time.monotonic() + API_KEY_CACHE_TTL)
+    return api_key
+
+def fetch_provider_models(provider: str, api_key: str, count_hit: bool = True) -> list[str]:
+    """
+    Model ids available to this key, cached (by key hash) for MODELS_CACHE_TTL.
+    Raises httpx errors for the caller to map to HTTP responses.
+    """
+    import hashlib
+
+    cache = get_cache()
+    namespace = f"models:{provider}"
+    key = hashlib.sha256(api_key.encode()).hexdigest()
+    models = cache.get(namespace, key)
+    if count_hit:
+        record_hit("models", models is not None)
+    if models is not None:
+        return models
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "application/json",
+    }
+
+    if provider == "openai":
+        url = "https://api.openai.com/v1/models"
+        resp = httpx.get(url, headers=headers, timeout=20)
+        resp.raise_for_status()
+        data = resp.json()
+        raw = data.get("data", []) if isinstance(data, dict) else []
+    elif provider == "together":
+        # ✅ Correct API path; Together sometimes returns a list directly
+        url = "https://api.together.xyz/v1/models"
+        resp = httpx.get(url, headers=headers, timeout=20)
+        resp.raise_for_status()
+        data = resp.json()
+        if isinstance(data, dict):
+            raw = data.get("data") or data.get("models", []) or []
+        elif isinstance(data, list):
+            raw = data
+        else:
+            raw = []
+    else:
+        raise HTTPException(400, f"Unsupported provider: {provider}")
+
+    # Normalize items → model ids
+    models = []
+    for m in raw:
+        if isinstance(m, dict):
+            mid = m.get("id") or m.get("name") or m.get("model") or m.get("slug")
+            if mid:
+                models.append(mid)
+        elif isinstance(m, str):
+            models.append(m)
+
+    # dedupe and sort for nicer UX
+    models = sorted(set(models))
+    cache.set(namespace, key, models, MODELS_CACHE_TTL)
+    return models
+
+# One pooled HTTP client per provider; its response hook feeds the provider's
+# rate-limit headers back into the scheduler's token buckets.
+_http_clients: dict[str, httpx.Client] = {}
+
+def _get_http_client(provider: str) -> httpx.Client:
+    client = _http_clients.get(provider)
+    if client is None:
+        client = httpx.Client(
+            timeout=60,
+            event_hooks={"response": [lambda resp: scheduler.observe_response(provider, resp), note_response]},
+        )
+        _http_clients[provider] = client
+    return client
 
 def _get_llm(provider: str, model_name: str, session: Session, user_id: int):
     api_key = _resolve_api_key(provider, session, user_id)
 
     # Use env vars to satisfy various client libs
     if provider == "openai":
+        from langchain_openai import ChatOpenAI
         os.environ["OPENAI_API_KEY"] = api_key
-        return ChatOpenAI(model=model_name, temperature=0)
+        # stream_usage: streamed completions still end with token usage (for the ledger)
+        return ChatOpenAI(model=model_name, temperature=0, http_client=_get_http_client(provider), stream_usage=True)
     elif provider == "together":
         from langchain_together import ChatTogether
         os.environ["TOGETHER_API_KEY"] = api_key
-        return ChatTogether(model=model_name)
+        return ChatTogether(model=model_name, http_client=_get_http_client(provider), stream_usage=True)
     else:
         raise HTTPException(400, f"Unsupported provider: {provider}")
 
@@ -102,74 +226,464 @@ def _extract_sql(raw) -> str:
 
     return s
 
-def answer_my_question(
+def paginate_result(df: pd.DataFrame, sql_query: str, page: int, page_size: int) -> dict:
+    """
+    Shape a full result DataFrame into the /answer response payload.
+    The answer text is a bounded summary of the whole result, not the rows.
+    """
+    from core.result_summary import summarize_frame
+
+    total = len(df)
+    pages = max(1, (total + page_size - 1) // page_size)
+    if page < 1 or page > pages:
+        raise HTTPException(400, f"Page {page} out of range (1–{pages})")
+    start = (page - 1) * page_size
+    end = start + page_size
+    slice_ = df.iloc[start:end].to_dict(orient="records")
+
+    summary = summarize_frame(df)
+    answer = f"{summary.describe()}\n\nShowing page {page} of {pages}."
+
+    return {
+        "answer": answer,
+        "last_sql_query": sql_query,
+        "page": page,
+        "page_size": page_size,
+        "total_records": total,
+        "total_pages": pages,
+        "preview": slice_,
+        "summary": summary.summary(),
+        "raw_result": df.to_dict(orient="records"),
+    }
+
+CACHE_MAX_RESULT_ROWS = int(os.getenv("CACHE_MAX_RESULT_ROWS", "50000"))
+VALUE_HINTS = os.getenv("VALUE_HINTS", "1") == "1"
+# LangChain's "query for at most {top_k} results using the LIMIT clause" sentence
+_TOP_K_INSTRUCTION = re.compile(r"Unless the user specifies[^{]*\{top_k\}[^.]*\.")
+_ALL_ROWS_INSTRUCTION = "Unless the question asks for a specific number of rows, return every matching row: do not limit the query."
+
+def _db_url(db: SQLDatabase) -> str:
+    return db._engine.url.render_as_string(hide_password=False)
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+def _open_sql_database(db_url: str, sample_rows: int = 3, count_hit: bool = True) -> SQLDatabase:
+    from langchain_community.utilities import SQLDatabase
+    from core.db import get_engine
+
+    # reflect lazily: on a schema-cache hit we never need the full metadata
+    return SQLDatabase(get_engine(db_url, count_hit), sample_rows_in_table_info=sample_rows, lazy_table_reflection=True)
+
+def _table_info(db: SQLDatabase, compact_schema: bool, sample_rows: int, count_hit: bool = True) -> str:
+    cache = get_cache()
+    namespace = f"schema:{connection_fingerprint(_db_url(db))}"
+    key = f"table_info|{'compact' if compact_schema else 'ddl'}|{sample_rows}"
+
+    table_info = cache.get(namespace, key)
+    if count_hit:
+        record_hit("schema", table_info is not None)
+    if table_info is None:
+        if compact_schema:
+            table_info = render_compact_table_info(db, sample_rows=sample_rows)
+        else:
+            table_info = render_ddl_table_info(db, sample_rows=sample_rows)
+        cache.set(namespace, key, table_info, SCHEMA_TTL)
+    return table_info
+
+def _build_prompt(db: SQLDatabase, question: str, compact_schema: bool = False, sample_rows: int = 3,
+                  limit_rows: bool = True) -> str:
+    """
+    Same prompt create_sql_query_chain would build, but with the table info
+    rendered here so it can be swapped for the compact form and measured.
+    Stored values resembling literals in the question are appended so the
+    model uses 'Beverages' rather than guessing 'beverage'.
+    limit_rows=False drops the top-k LIMIT instruction (exports want every row).
+    """
+    from langchain.chains.sql_database.prompt import SQL_PROMPTS, PROMPT
+    from langchain_core.prompts import PromptTemplate
+
+    prompt = SQL_PROMPTS.get(db.dialect, PROMPT)
+    if not limit_rows:
+        prompt = PromptTemplate.from_template(_TOP_K_INSTRUCTION.sub(_ALL_ROWS_INSTRUCTION, prompt.template))
+    table_info = _table_info(db, compact_schema, sample_rows)
+    if VALUE_HINTS:
+        hints = value_hints(_db_url(db), question)
+        if hints:
+            table_info = f"{table_info}\n\n{hints}"
+    values = {"input": question + "\nSQLQuery: ", "table_info": table_info, "top_k": 5, "dialect": db.dialect}
+    return prompt.format(**{k: v for k, v in values.items() if k in prompt.input_variables})
+
+def _invoke_llm(llm, prompt_text: str):
+    """
+    Plain invoke, unless the request can be cancelled: then stream, so a
+    cancel between chunks closes the provider response (and stops generation)
+    instead of waiting for the full completion.
+    """
+    token = current_token()
+    if token is None:
+        return llm.invoke(prompt_text, stop=["\nSQLResult:"])
+
+    message = None
+    stream = llm.stream(prompt_text, stop=["\nSQLResult:"])
+    try:
+        for chunk in stream:
+            token.check()
+            message = chunk if message is None else message + chunk
+    finally:
+        stream.close()
+    token.check()
+    if message is None:
+        raise HTTPException(500, "Provider returned an empty completion")
+    return message
+
+def _generate_sql(
+    llm,
+    db: SQLDatabase,
     question: str,
     user_id: int,
     db_name: str,
     model_name: str,
     provider: str,
-    page: int = 1,
-    page_size: int = 5,
-    session: Session | None = None,
-):
-    # open a session if none provided
-    created_session = False
-    if session is None:
-        session = next(core_get_session())
-        created_session = True
+    compact_schema: bool = False,
+    sample_rows: int = 3,
+    limit_rows: bool = True,
+) -> tuple[str, int]:
+    """
+    NL question -> SQL. Returns the SQL and the prompt's token count.
+    Only the provider call holds a fair-scheduler slot (429 when the queue
+    is full); its token usage goes to the usage ledger.
+    """
+    prompt_text = _build_prompt(db, question, compact_schema, sample_rows, limit_rows)
+    prompt_tokens = count_tokens(prompt_text, model_name)
+
+    with scheduler.slot(user_id, provider, prompt_tokens + SCHEDULER_COMPLETION_TOKENS):
+        started = time.perf_counter()
+        try:
+            with metered_call(user_id, db_name, provider, model_name, "generate", prompt_tokens) as call, \
+                    stage("llm"):
+                message = call.message = _invoke_llm(llm, prompt_text)
+            generated_sql = _extract_sql(message.content)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(500, f"Error generating SQL: {e}")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+    record_prompt(user_id, db_name, "compact" if compact_schema else "ddl", prompt_tokens, elapsed_ms)
+    return generated_sql, prompt_tokens
 
+def _sql_cache_key(question: str, model_name: str, compact_schema: bool, sample_rows: int,
+                   export: bool = False) -> str:
+    # export SQL is written without the top-k LIMIT, so it never shares /answer's entries
+    key = f"{model_name}|{'compact' if compact_schema else 'ddl'}|{sample_rows}|{_normalize_question(question)}"
+    return f"export|{key}" if export else key
+
+def _run_sql(db: SQLDatabase, sql_query: str, params: dict | None = None) -> tuple[pd.DataFrame, bool]:
+    """
+    Execute on the target DB, serving repeat runs (e.g. paging through the
+    same answer) from the shared result cache for RESULT_TTL seconds.
+    Returns the result and whether it came from that cache.
+    `params` are bound by the driver (template hits), never inlined.
+    Misses run inside the target database's bulkhead (503 when it is
+    saturated or its circuit is open).
+    """
+    import json
+    import pandas as pd
+
+    cache = get_cache()
+    namespace = f"result:{connection_fingerprint(_db_url(db))}"
+    key = sql_query if not params else f"{sql_query}|{json.dumps(params, sort_keys=True, default=str)}"
+    cached = cache.get(namespace, key)
+    if cached is not None:
+        columns, rows = cached
+        return pd.DataFrame(rows, columns=columns), True
+
+    with bulkhead_for(_db_url(db)).slot(), db._engine.connect() as conn, stage("sql"), \
+            cancellable_statement(conn):
+        rp = conn.execute(text(sql_query), params or {})
+        columns = list(rp.keys())
+        rows = [tuple(r) for r in rp.fetchall()]
+    if len(rows) <= CACHE_MAX_RESULT_ROWS:
+        cache.set(namespace, key, (columns, rows), RESULT_TTL)
+    return pd.DataFrame(rows, columns=columns), False
+
+def _execute_sql(db: SQLDatabase, db_url: str, sql: str, params: dict | None,
+                 approximate: bool) -> tuple[pd.DataFrame, bool, dict | None]:
+    """_run_sql, over a sample of the largest table when an estimate was asked for."""
+    approx, plan = None, None
+    if approximate:
+        with bulkhead_for(db_url).slot(), db._engine.connect() as conn:
+            plan = plan_sample(conn, sql)
+        if isinstance(plan, tuple):
+            approx, plan = {"applied": False, "reason": plan[1]}, None
+    if plan is not None:
+        try:
+            sampled, result_cache_hit = _run_sql(db, plan.sql, params)
+        except HTTPException:
+            raise
+        except Exception as e:
+            check_cancelled()
+            return (*_run_sql(db, sql, params), {"applied": False, "reason": f"sampled query failed: {e}"})
+        return estimate_frame(sampled, plan), result_cache_hit, {"applied": True, **describe_plan(plan, sampled.columns)}
+    return (*_run_sql(db, sql, params), approx)
+
+def generate_sql_for_question(
+    question: str,
+    user_id: int,
+    db_name: str,
+    model_name: str,
+    provider: str,
+    session: Session,
+    compact_schema: bool = False,
+    sample_rows: int = 3,
+) -> str:
+    """
+    Only the NL -> SQL half of answer_my_question (used by exports); the LLM
+    call is admitted through the fair scheduler like /answer. The prompt has
+    no top-k LIMIT instruction and the SQL is cached under its own key: an
+    export wants the full result, not the preview /answer asks for. For the
+    same reason the fast path (capped lists) and templates (learned from
+    /answer SQL) are skipped.
+    model="auto" uses the strongest tier, since nothing validates the SQL here.
+    """
+    model_name = _export_model(model_name, provider)
     try:
+        db_url = get_connection_string(user_id, db_name, session)
+    except Exception as e:
+        raise HTTPException(400, f"DB connection error: {e}")
+
+    cached_sql = get_cache().get(
+        f"sql:{connection_fingerprint(db_url)}",
+        _sql_cache_key(question, model_name, compact_schema, sample_rows, export=True),
+    )
+    if cached_sql is not None:
+        return cached_sql
+
+    db = _open_sql_database(db_url, sample_rows)
+    bulkhead_for(db_url).check_admission()
+    llm = _get_llm(provider, model_name, session, user_id)
+    generated_sql, _ = _generate_sql(
+        llm, db, question, user_id, db_name, model_name, provider,
+        compact_schema=compact_schema, sample_rows=sample_rows, limit_rows=False,
+    )
+    return generated_sql
+
+def remember_export_sql(db_url: str, question: str, model_name: str, provider: str, sql_query: str,
+                        compact_schema: bool = False, sample_rows: int = 3) -> None:
+    """Cache export SQL once it has run, like /answer caches only SQL that worked."""
+    get_cache().set(
+        f"sql:{connection_fingerprint(db_url)}",
+        _sql_cache_key(question, _export_model(model_name, provider), compact_schema, sample_rows, export=True),
+        sql_query,
+        SQL_TTL,
+    )
+
+def _export_model(model_name: str, provider: str) -> str:
+    return tier_models(provider)[-1] if model_name == AUTO_MODEL else model_name
+
+def _fast_path_index(db_url: str, user_id: int, db_name: str, session: Session) -> dict:
+    from db.main import get_tables_and_schemas
+    from core.fast_path import build_index
+
+    return get_cache().get_or_set(
+        f"schema:{connection_fingerprint(db_url)}",
+        "fast_path_index",
+        lambda: build_index(get_tables_and_schemas(user_id, db_name, session)),
+        SCHEMA_TTL,
+    )
+
+def _local_sql(db: SQLDatabase, db_url: str, question: str, user_id: int, db_name: str,
+               model_name: str, session: Session, fast_path: bool) -> tuple[str, str, dict, str, int | None] | None:
+    """
+    SQL we can produce without the LLM: the rule-based fast path for trivial
+    shapes, then templates learned from literal-only variants.
+    Returns (source, bound SQL, params, display SQL, row cap) or None; when
+    there is a row cap the bound SQL fetches one extra row to detect truncation.
+    """
+    if fast_path:
+        from core.fast_path import try_fast_path
+
+        match = try_fast_path(question, _fast_path_index(db_url, user_id, db_name, session), db.dialect)
+        if match is not None:
+            return "fast_path", match["sql"], match["params"], match["display"], match["row_limit"]
+    template_hit = match_template(db_url, model_name, question)
+    if template_hit is not None:
+        return ("template", *template_hit, None)
+    return None
+
+def run_question(
+    question: str,
+    user_id: int,
+    db_name: str,
+    model_name: str,
+    provider: str,
+    session: Session,
+    compact_schema: bool = False,
+    sample_rows: int = 3,
+    fast_path: bool = True,
+    db: SQLDatabase | None = None,
+    llm=None,
+    approximate: bool = False,
+    remember: bool = True,
+) -> dict:
+    """
+    NL question -> SQL -> full result DataFrame for one connection.
+    Long-lived callers (chat sessions) pass their own `db` and `llm`.
+    Returns {"df", "sql", "sql_source", "prompt_tokens", "sql_cache_hit",
+    "sql_template_hit", "fast_path_hit", "result_cache_hit", "execution_ms",
+    "truncated", "approximate"}. `truncated` means a capped fast-path list
+    returned only its first FAST_PATH_LIST_LIMIT rows.
+
+    SQL comes from, in order: the exact-question cache, the rule-based fast
+    path, a parameterized template learned from a question differing only
+    in literals (both bound locally, no LLM call), or the LLM. Locally
+    built SQL that fails to execute is regenerated by the LLM.
+    model_name="auto" goes through the model router.
+    approximate=True runs eligible aggregates over a sample of the largest
+    table and returns estimates with 95% bounds (see core/approximate.py).
+    remember=False bypasses the exact-question cache and template learning,
+    for synthetic questions no user will ask verbatim.
+    """
+    if model_name == AUTO_MODEL:
+        from core.model_router import run_routed
+
+        return run_routed(
+            question, user_id, db_name, provider, session, db=db,
+            compact_schema=compact_schema, sample_rows=sample_rows, fast_path=fast_path,
+            approximate=approximate, remember=remember,
+        )
+    if db is None:
         # Build DB URL using your saved connection row
         try:
             db_url = get_connection_string(user_id, db_name, session)
         except Exception as e:
             raise HTTPException(400, f"DB connection error: {e}")
+        db = _open_sql_database(db_url, sample_rows)
+    else:
+        db_url = _db_url(db)
+    cache = get_cache()
+    sql_namespace = f"sql:{connection_fingerprint(db_url)}"
+    sql_key = _sql_cache_key(question, model_name, compact_schema, sample_rows)
+
+    # 1) generate SQL from NL question (or reuse a previously working one)
+    generated_sql = cache.get(sql_namespace, sql_key) if remember else None
+    source, bound_sql, params, row_limit = "cache", generated_sql, None, None
+    local = None if generated_sql is not None else _local_sql(
+        db, db_url, question, user_id, db_name, model_name, session, fast_path,
+    )
+    def from_llm():
+        nonlocal llm
+        # fail fast: no provider call for SQL the database would reject anyway
+        bulkhead_for(db_url).check_admission()
+        llm = llm or _get_llm(provider, model_name, session, user_id)
+        return _generate_sql(
+            llm, db, question, user_id, db_name, model_name, provider,
+            compact_schema=compact_schema, sample_rows=sample_rows,
+        )
 
-        db = SQLDatabase.from_uri(db_url)
-        llm = _get_llm(provider, model_name, session, user_id)
-        chain = create_sql_query_chain(llm, db)
+    prompt_tokens = 0
+    if local is not None:
+        source, bound_sql, params, generated_sql, row_limit = local
+    elif generated_sql is None:
+        generated_sql, prompt_tokens = from_llm()
+        source, bound_sql = "llm", generated_sql
 
-        # 1) generate SQL from NL question
+    # 2) run SQL
+    while True:
+        started = time.perf_counter()
         try:
-            raw_out = chain.invoke({"question": question})
-            generated_sql = _extract_sql(raw_out)
+            df, result_cache_hit, approx = _execute_sql(db, db_url, bound_sql, params, approximate)
+            break
         except HTTPException:
             raise
         except Exception as e:
-            raise HTTPException(500, f"Error generating SQL: {e}")
+            check_cancelled()  # an interrupted statement surfaces as a driver error
+            if source not in ("fast_path", "template"):
+                raise HTTPException(500, f"Error executing SQL: {e}\nSQL:\n{generated_sql}")
+        # locally built SQL is a heuristic (e.g. LOWER() on a date column): let the LLM write it
+        generated_sql, prompt_tokens = from_llm()
+        source, bound_sql, params, row_limit = "llm", generated_sql, None, None
+    execution_ms = round((time.perf_counter() - started) * 1000, 1)
+    truncated = row_limit is not None and len(df) > row_limit
+    if truncated:
+        df = df.iloc[:row_limit]
+    if source == "llm" and remember:
+        # only cache SQL that actually ran
+        cache.set(sql_namespace, sql_key, generated_sql, SQL_TTL)
+        remember_template(db_url, model_name, question, generated_sql)
 
-        # 2) run SQL
-        try:
-            with db._engine.connect() as conn:
-                rp = conn.execute(text(generated_sql))
-                df = pd.DataFrame(rp.fetchall(), columns=rp.keys())
-        except Exception as e:
-            raise HTTPException(500, f"Error executing SQL: {e}\nSQL:\n{generated_sql}")
+    return {
+        "df": df,
+        "sql": generated_sql,
+        "sql_source": source,
+        "prompt_tokens": prompt_tokens,
+        "sql_cache_hit": source == "cache",
+        "sql_template_hit": source == "template",
+        "fast_path_hit": source == "fast_path",
+        "result_cache_hit": result_cache_hit,
+        "execution_ms": execution_ms,
+        "truncated": truncated,
+        "approximate": approx,
+    }
 
-        # 3) paginate
-        total = len(df)
-        pages = max(1, (total + page_size - 1) // page_size)
-        if page < 1 or page > pages:
-            raise HTTPException(400, f"Page {page} out of range (1–{pages})")
-        start = (page - 1) * page_size
-        end = start + page_size
-        slice_ = df.iloc[start:end].to_dict(orient="records")
-
-        answer = (
-            f"The SQL query returned {total} record(s). "
-            f"Showing page {page} of {pages}:\n\n{slice_}"
+def answer_my_question(
+    question: str,
+    user_id: int,
+    db_name: str,
+    model_name: str,
+    provider: str,
+    page: int = 1,
+    page_size: int = 5,
+    session: Session | None = None,
+    compact_schema: bool = False,
+    sample_rows: int = 3,
+    fast_path: bool = True,
+    approximate: bool = False,
+):
+    # open a session if none provided
+    created_session = False
+    if session is None:
+        session = next(core_get_session())
+        created_session = True
+
+    try:
+        run = run_question(
+            question, user_id, db_name, model_name, provider, session,
+            compact_schema=compact_schema, sample_rows=sample_rows, fast_path=fast_path,
+            approximate=approximate,
         )
 
-        return {
-            "answer": answer,
-            "last_sql_query": generated_sql,
-            "page": page,
-            "page_size": page_size,
-            "total_records": total,
-            "total_pages": pages,
-            "preview": slice_,
-            "raw_result": df.to_dict(orient="records"),
-        }
+        # 3) paginate
+        result = paginate_result(run["df"], run["sql"], page, page_size)
+        result["prompt_tokens"] = run["prompt_tokens"]
+        result["sql_cache_hit"] = run["sql_cache_hit"]
+        result["sql_template_hit"] = run["sql_template_hit"]
+        result["fast_path_hit"] = run["fast_path_hit"]
+        result["result_cache_hit"] = run["result_cache_hit"]
+        result["sql_source"] = run["sql_source"]
+        result["execution_ms"] = run["execution_ms"]
+        result["model"] = run.get("model", model_name)
+        if "router" in run:
+            result["router"] = run["router"]
+        result["truncated"] = run.get("truncated", False)
+        if result["truncated"]:
+            result["answer"] = (
+                f"Only the first {result['total_records']:,} rows are shown; the full list is longer. "
+                f"Narrow the question, or ask with fast_path=false to have the SQL written without this cap.\n\n"
+                f"{result['answer']}"
+            )
+        if run.get("approximate"):
+            result["approximate"] = approx = run["approximate"]
+            if approx["applied"]:
+                result["answer"] = (
+                    f"Estimated from a {approx['sample_fraction']:.2%} sample of {approx['table']} "
+                    f"(~{approx['table_rows_estimate']:,} rows); 95% bounds are in the *_low/*_high columns. "
+                    + ("Groups with no rows in the sample are missing from the result. "
+                       if approx["groups_may_be_missing"] else "")
+                    + f"Repeat with approximate=false for the exact answer.\n\n{result['answer']}"
+                )
+        return result
 
     finally:
         if created_session:
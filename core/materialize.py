@@ -0,0 +1,302 @@
+# core/materialize.py
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlmodel import Session
+
+from db.main import get_connection_string
+from core.bulkhead import bulkhead_for
+from core.query_log import record_answer
+from core.s3_utils import (
+    get_saved_query_from_s3, put_json_to_s3, get_json_from_s3, head_s3_etag, delete_json_from_s3, list_s3_keys,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+MATERIALIZE_TICK = float(os.getenv("MATERIALIZE_TICK", "5"))
+MATERIALIZE_SCAN_INTERVAL = float(os.getenv("MATERIALIZE_SCAN_INTERVAL", "60"))  # seconds between S3 schedule scans
+MATERIALIZE_MIN_INTERVAL = int(os.getenv("MATERIALIZE_MIN_INTERVAL", "30"))
+MATERIALIZE_MAX_ROWS = int(os.getenv("MATERIALIZE_MAX_ROWS", "100000"))
+MATERIALIZE_WORKERS = int(os.getenv("MATERIALIZE_WORKERS", "2"))
+MATERIALIZE_CLAIM_TTL = float(os.getenv("MATERIALIZE_CLAIM_TTL", "300"))  # a claimed refresh is retried after this
+
+# (user_id, query_key) -> snapshot dict; S3 holds the copy every worker shares
+_snapshots: dict[tuple[int, str], dict] = {}
+_etags: dict[tuple[int, str], str] = {}  # ETag of the S3 object each local copy came from
+_checked: dict[tuple[int, str], float] = {}  # last time the local copy was compared with S3
+# (user_id, query_key) -> {"refresh_interval", "refreshed_ts"}: every scheduled snapshot, from S3
+_schedule: dict[tuple[int, str], dict] = {}
+_refreshing: set[tuple[int, str]] = set()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MATERIALIZE_WORKERS, thread_name_prefix="materialize")
+_refresher: Optional[threading.Thread] = None
+
+
+def _snapshot_key(user_id: int, query_key: str) -> str:
+    return f"materialized/{user_id}/{query_key}.json"
+
+
+_META_PREFIX = "materialized_meta/"
+
+
+def _meta_key(user_id: int, query_key: str) -> str:
+    # small sidecar of the snapshot, so the refresher can scan schedules without fetching rows
+    return f"{_META_PREFIX}{user_id}/{query_key}.json"
+
+
+def _meta(snapshot: dict) -> dict:
+    return {"refresh_interval": snapshot["refresh_interval"], "refreshed_ts": snapshot["refreshed_ts"]}
+
+
+def execute_sql(db_url: str, sql_query: str) -> pd.DataFrame:
+    import pandas as pd
+    from core.db import get_engine
+
+    with bulkhead_for(db_url).slot(), get_engine(db_url).connect() as conn:
+        rp = conn.execute(text(sql_query))
+        return pd.DataFrame(rp.fetchall(), columns=list(rp.keys()))
+
+
+def load_saved_query(user_id: int, query_key: str, connection_name: Optional[str] = None) -> dict:
+    saved = get_saved_query_from_s3(user_id, query_key)
+    if not saved:
+        raise HTTPException(404, f"Saved query {query_key} not found")
+    if connection_name:
+        saved["connection_name"] = connection_name
+    if not saved.get("connection_name"):
+        raise HTTPException(400, "Saved query has no connection_name; pass one explicitly")
+    if not saved.get("sql_query"):
+        raise HTTPException(400, "Saved query has no SQL to run")
+    return saved
+
+
+def run_saved_query(user_id: int, saved: dict, session: Session, query_key: Optional[str] = None) -> pd.DataFrame:
+    """
+    Execute the stored SQL directly against the saved connection (no LLM).
+    Every run, refreshes included, goes to the query log.
+    """
+    started = time.perf_counter()
+
+    def _log(**outcome):
+        record_answer(user_id, saved["connection_name"], saved.get("question"), None, None,
+                      duration_ms=(time.perf_counter() - started) * 1000, query_key=query_key, **outcome)
+
+    try:
+        db_url = get_connection_string(user_id, saved["connection_name"], session)
+    except Exception as e:
+        _log(error=f"DB connection error: {e}")
+        raise HTTPException(400, f"DB connection error: {e}")
+    try:
+        df = execute_sql(db_url, saved["sql_query"])
+    except HTTPException as e:
+        _log(error=str(e.detail))
+        raise  # bulkhead rejection (503) / cancellation
+    except Exception as e:
+        _log(error=str(e))
+        raise HTTPException(500, f"Error executing SQL: {e}\nSQL:\n{saved['sql_query']}")
+    _log(result={"last_sql_query": saved["sql_query"],
+                 "execution_ms": round((time.perf_counter() - started) * 1000, 1), "total_records": len(df)})
+    return df
+
+
+# -------- Snapshots --------
+
+def store_snapshot(user_id: int, query_key: str, saved: dict, df: pd.DataFrame, refresh_interval: Optional[int]) -> dict:
+    truncated = len(df) > MATERIALIZE_MAX_ROWS
+    if truncated:
+        df = df.iloc[:MATERIALIZE_MAX_ROWS]
+    snapshot = {
+        "query_key": query_key,
+        "question": saved.get("question"),
+        "sql_query": saved["sql_query"],
+        "connection_name": saved["connection_name"],
+        # row arrays, not records: records would merge duplicate names (SELECT a.id, b.id)
+        "columns": [str(c) for c in df.columns],
+        "rows": json.loads(df.to_json(orient="values", date_format="iso", default_handler=str)),
+        "truncated": truncated,
+        "refresh_interval": max(MATERIALIZE_MIN_INTERVAL, refresh_interval) if refresh_interval else None,
+        "refreshed_at": datetime.utcnow().isoformat(),
+        "refreshed_ts": time.time(),
+    }
+    etag = put_json_to_s3(_snapshot_key(user_id, query_key), snapshot)
+    if snapshot["refresh_interval"]:
+        put_json_to_s3(_meta_key(user_id, query_key), _meta(snapshot))
+    else:
+        delete_json_from_s3(_meta_key(user_id, query_key))
+    with _lock:
+        _snapshots[(user_id, query_key)] = snapshot
+        _etags[(user_id, query_key)] = etag
+        _checked[(user_id, query_key)] = time.time()
+        if snapshot["refresh_interval"]:
+            _schedule[(user_id, query_key)] = _meta(snapshot)
+        else:
+            _schedule.pop((user_id, query_key), None)
+    return snapshot
+
+
+def _forget(key: tuple[int, str]) -> None:
+    with _lock:
+        _snapshots.pop(key, None)
+        _etags.pop(key, None)
+        _checked.pop(key, None)
+        _schedule.pop(key, None)
+
+
+def _sync(user_id: int, query_key: str, force: bool = False) -> Optional[dict]:
+    """
+    The local copy, reloaded when another worker refreshed (or dropped) it
+    in S3. S3 is asked at most once per MATERIALIZE_TICK per snapshot.
+    """
+    key = (user_id, query_key)
+    with _lock:
+        snapshot = _snapshots.get(key)
+        fresh = snapshot is not None and time.time() - _checked.get(key, 0) < MATERIALIZE_TICK
+    if fresh and not force:
+        return snapshot
+    try:
+        etag = head_s3_etag(_snapshot_key(user_id, query_key))
+    except Exception:
+        return snapshot  # S3 unreachable: keep serving what we have
+    if etag is None:
+        _forget(key)
+        return None
+    if snapshot is None or etag != _etags.get(key):
+        snapshot = get_json_from_s3(_snapshot_key(user_id, query_key))
+        if snapshot is None:
+            _forget(key)
+            return None
+    with _lock:
+        _snapshots[key] = snapshot
+        _etags[key] = etag
+        _checked[key] = time.time()
+    return snapshot
+
+
+def get_snapshot(user_id: int, query_key: str) -> Optional[dict]:
+    snapshot = _sync(user_id, query_key)
+    if snapshot is None:
+        return None
+    return {**snapshot, "age_seconds": round(time.time() - snapshot["refreshed_ts"], 1)}
+
+
+def drop_snapshot(user_id: int, query_key: str) -> None:
+    _forget((user_id, query_key))
+    delete_json_from_s3(_meta_key(user_id, query_key))
+    delete_json_from_s3(_snapshot_key(user_id, query_key))
+
+
+def _due(snapshot: dict, now: float) -> bool:
+    return (
+        bool(snapshot.get("refresh_interval"))
+        and now - snapshot["refreshed_ts"] >= snapshot["refresh_interval"]
+        and snapshot.get("claimed_until", 0) <= now
+    )
+
+
+def _claim(user_id: int, query_key: str, now: float) -> Optional[str]:
+    """
+    Every worker sees the same schedule, so the refresh is claimed with a
+    conditional write on the meta object: only the worker whose write lands
+    runs the query. Returns the claimed meta's ETag, or None. The claim
+    lapses after MATERIALIZE_CLAIM_TTL, so a worker that dies mid-refresh
+    doesn't stop it for good; a completed refresh rewrites the meta.
+    """
+    meta_key = _meta_key(user_id, query_key)
+    etag = head_s3_etag(meta_key)
+    meta = get_json_from_s3(meta_key) if etag else None
+    if meta is None:
+        return None
+    if not _due(meta, now):
+        with _lock:
+            _schedule[(user_id, query_key)] = meta
+        return None
+    claimed = {**meta, "claimed_until": now + MATERIALIZE_CLAIM_TTL}
+    claim_etag = put_json_to_s3(meta_key, claimed, if_match=etag)
+    if claim_etag is None:
+        with _lock:  # lost to another worker: wait out its claim
+            _schedule[(user_id, query_key)] = claimed
+    return claim_etag
+
+
+def _refresh(user_id: int, query_key: str) -> None:
+    from core.db import get_session
+
+    session = next(get_session())
+    try:
+        # another worker may have refreshed (or dropped) it already
+        snapshot = _sync(user_id, query_key, force=True)
+        if snapshot is None:
+            return
+        if not _due(snapshot, time.time()):
+            with _lock:
+                _schedule[(user_id, query_key)] = _meta(snapshot)
+            return
+        if _claim(user_id, query_key, time.time()) is None:
+            return
+        saved = {k: snapshot[k] for k in ("question", "sql_query", "connection_name")}
+        df = run_saved_query(user_id, saved, session, query_key)
+        store_snapshot(user_id, query_key, saved, df, snapshot["refresh_interval"])
+    except Exception:
+        # keep serving the stale snapshot; retried once the claim lapses
+        pass
+    finally:
+        session.close()
+        with _lock:
+            _refreshing.discard((user_id, query_key))
+
+
+def _scan_schedule() -> None:
+    """
+    Reload the schedule from S3, so snapshots this worker never served (or
+    held before a restart) are still refreshed.
+    """
+    schedule = {}
+    for key in list_s3_keys(_META_PREFIX):
+        user_id, _, query_key = key[len(_META_PREFIX):-len(".json")].partition("/")
+        meta = get_json_from_s3(key)
+        if meta and query_key:
+            schedule[(int(user_id), query_key)] = meta
+    with _lock:
+        _schedule.clear()
+        _schedule.update(schedule)
+
+
+def _tick(now: float) -> list[tuple[int, str]]:
+    with _lock:
+        due = [key for key, meta in _schedule.items() if key not in _refreshing and _due(meta, now)]
+        _refreshing.update(due)
+    for user_id, query_key in due:
+        _executor.submit(_refresh, user_id, query_key)
+    return due
+
+
+def _refresh_loop():
+    scanned = 0.0
+    while True:
+        time.sleep(MATERIALIZE_TICK)
+        now = time.time()
+        if now - scanned >= MATERIALIZE_SCAN_INTERVAL:
+            try:
+                _scan_schedule()
+                scanned = now
+            except Exception:
+                pass  # S3 unreachable: keep the schedule we have
+        _tick(now)
+
+
+def start_refresher() -> None:
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name="materialize-refresher", daemon=True)
+        _refresher.start()
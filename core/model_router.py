@@ -0,0 +1,158 @@
+# core/model_router.py
+
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException
+
+from core.bulkhead import BulkheadRejected
+from core.cancellation import RequestCancelled
+
+AUTO_MODEL = "auto"
+# questions scoring below this start on the fast tier
+ROUTER_FAST_MAX_SCORE = float(os.getenv("ROUTER_FAST_MAX_SCORE", "2.5"))
+
+# cheapest first; override with e.g. ROUTER_TIERS_OPENAI="gpt-4o-mini,gpt-4o"
+_DEFAULT_TIERS = {
+    "openai": ["gpt-4o-mini", "gpt-4o"],
+    "together": ["meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo", "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo"],
+}
+
+_AGGREGATION = re.compile(
+    r"\b(?:average|avg|mean|sum|total|how many|number of|max(?:imum)?|min(?:imum)?|most|least|top|highest|"
+    r"lowest|rank(?:ed|ing)?|median|percent(?:age)?|ratio|share|per|each|by|group(?:ed)?)\b"
+)
+_JOIN_HINT = re.compile(
+    r"\b(?:with their|and their|along with|together with|across|for each|whose|"
+    r"who (?:have|has|bought|ordered|placed)|that (?:have|has))\b"
+)
+_HARD = re.compile(
+    r"\b(?:compared?|versus|vs|growth|trend|change|over time|year over year|cumulative|running|rolling|"
+    r"difference|previous|prior|except|but not|never|without any|at least|more than|less than|between)\b"
+)
+
+_lock = threading.Lock()
+_stats = defaultdict(lambda: defaultdict(float))
+
+
+def tier_models(provider: str) -> list[str]:
+    env = os.getenv(f"ROUTER_TIERS_{provider.upper()}")
+    if env:
+        return [m.strip() for m in env.split(",") if m.strip()]
+    if provider not in _DEFAULT_TIERS:
+        raise HTTPException(400, f"model=auto is not configured for provider {provider}")
+    return _DEFAULT_TIERS[provider]
+
+
+def _tier_name(i: int, n: int) -> str:
+    return "fast" if i == 0 else "strong" if i == n - 1 else f"tier{i}"
+
+
+def complexity(question: str, schema: dict[str, list[str]]) -> dict:
+    """
+    Local estimate of how hard the question is to translate: tables it
+    mentions, aggregation / join / comparison phrasing, and length.
+    """
+    from core.fast_path import build_index
+
+    q = " ".join(question.lower().split())
+    words = re.findall(r"[\w']+", q)
+    grams = {" ".join(words[i:i + n]) for n in (1, 2, 3) for i in range(len(words) - n + 1)}
+    tables = {table for variant, table in build_index(schema)["tables"].items() if variant in grams}
+    aggregation = len(_AGGREGATION.findall(q))
+    joins = len(_JOIN_HINT.findall(q))
+    hard = len(_HARD.findall(q))
+    score = (
+        1.5 * max(0, len(tables) - 1)
+        + 0.75 * aggregation
+        + 1.0 * joins
+        + 1.5 * hard
+        + max(0, len(words) - 12) / 12
+    )
+    return {"score": round(score, 2), "tables": sorted(tables), "aggregation": aggregation, "joins": joins, "hard": hard}
+
+
+def _record(provider: str, model: str, tier: str, ok: bool, elapsed_ms: float) -> None:
+    with _lock:
+        s = _stats[(provider, model)]
+        s["tier"] = tier
+        s["requests"] += 1
+        s["succeeded" if ok else "failed"] += 1
+        s["latency_ms_total"] += elapsed_ms
+
+
+def _bump(provider: str, model: str, name: str) -> None:
+    with _lock:
+        _stats[(provider, model)][name] += 1
+
+
+def router_stats() -> list[dict]:
+    """Per provider/model: requests, success rate, mean latency, routing counts."""
+    with _lock:
+        items = [(k, dict(v)) for k, v in _stats.items()]
+    out = []
+    for (provider, model), s in items:
+        n = s.get("requests", 0)
+        out.append({
+            "provider": provider,
+            "model": model,
+            "tier": s.get("tier"),
+            "requests": int(n),
+            "routed_first": int(s.get("routed_first", 0)),
+            "escalated_to": int(s.get("escalated_to", 0)),
+            "success_rate": round(s.get("succeeded", 0) / n, 3) if n else None,
+            "avg_latency_ms": round(s.get("latency_ms_total", 0) / n, 1) if n else None,
+        })
+    return sorted(out, key=lambda r: (r["provider"], r["model"]))
+
+
+def run_routed(question: str, user_id: int, db_name: str, provider: str, session, db=None, **kwargs) -> dict:
+    """
+    run_question for model=auto: start on the fast tier unless the question
+    scores as complex, and move up a tier when generation or execution of
+    the SQL fails (5xx). Client errors, cancellations and bulkhead
+    rejections (the database is saturated; a bigger model won't help) are
+    not retried.
+    """
+    from core.llm import run_question, _open_sql_database, _db_url
+    from core.reflection import table_columns
+    from db.main import get_connection_string
+
+    if db is None:
+        try:
+            db_url = get_connection_string(user_id, db_name, session)
+        except Exception as e:
+            raise HTTPException(400, f"DB connection error: {e}")
+        db = _open_sql_database(db_url, kwargs.get("sample_rows", 3))
+
+    models = tier_models(provider)
+    scored = complexity(question, table_columns(_db_url(db)))
+    start = 0 if scored["score"] < ROUTER_FAST_MAX_SCORE else len(models) - 1
+    _bump(provider, models[start], "routed_first")
+
+    attempts = []
+    for i in range(start, len(models)):
+        model, tier = models[i], _tier_name(i, len(models))
+        if i > start:
+            _bump(provider, model, "escalated_to")
+        started = time.perf_counter()
+        try:
+            run = run_question(question, user_id, db_name, model, provider, session, db=db, **kwargs)
+        except (RequestCancelled, BulkheadRejected):
+            raise
+        except HTTPException as e:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            _record(provider, model, tier, False, elapsed_ms)
+            attempts.append({"model": model, "tier": tier, "ms": round(elapsed_ms, 1), "error": str(e.detail)[:300]})
+            if e.status_code < 500 or i == len(models) - 1:
+                raise
+            continue
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _record(provider, model, tier, True, elapsed_ms)
+        attempts.append({"model": model, "tier": tier, "ms": round(elapsed_ms, 1)})
+        run["model"] = model
+        run["router"] = {**scored, "tier": tier, "escalated": i > start, "attempts": attempts}
+        return run
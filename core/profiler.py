@@ -0,0 +1,178 @@
+# core/profiler.py
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "data", "profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between samples
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(BASE_DIR):
+        path = os.path.relpath(path, BASE_DIR)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack from a side thread via sys._current_frames,
+    so only the profiled request pays for it (and only a little: no tracing
+    hooks run in the target thread). Stacks are kept in folded form:
+    "outer;inner;leaf" -> sample count.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> list[dict]:
+        leaf = Counter()
+        for stack, count in self.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        total = max(1, self.samples)
+        return [
+            {"function": name, "samples": n, "share": round(n / total, 3)}
+            for name, n in leaf.most_common(limit)
+        ]
+
+
+# -------- Per-request profiles --------
+
+def _path(profile_id: str, ext: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{ext}")
+
+
+def _prune():
+    metas = sorted(
+        (f for f in os.listdir(PROFILE_DIR) if f.endswith(".json")),
+        key=lambda f: os.path.getmtime(os.path.join(PROFILE_DIR, f)),
+    )
+    for name in metas[: max(0, len(metas) - PROFILE_MAX_FILES)]:
+        profile_id = name[: -len(".json")]
+        for ext in ("json", "folded"):
+            try:
+                os.remove(_path(profile_id, ext))
+            except FileNotFoundError:
+                pass
+
+
+@contextmanager
+def profile_request(**tags):
+    """
+    Profile the calling thread for the duration of the block and save
+    `<id>.folded` (flamegraph.pl / speedscope input) plus `<id>.json`
+    metadata. Yields the metadata dict; callers may add tags to it (e.g.
+    `sql`, which is stored as a hash) before the block ends.
+    """
+    meta = {
+        "id": uuid.uuid4().hex,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        **tags,
+    }
+    profiler = SamplingProfiler(threading.get_ident())
+    started = time.perf_counter()
+    profiler.start()
+    status = "ok"
+    try:
+        yield meta
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        profiler.stop()
+        sql = meta.pop("sql", None)
+        meta.update({
+            "status": status,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "samples": profiler.samples,
+            "interval_ms": profiler.interval * 1000,
+            "sql_hash": hashlib.sha256(sql.encode()).hexdigest()[:16] if sql else None,
+            "top_functions": profiler.top_functions(),
+        })
+        with _lock:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(_path(meta["id"], "folded"), "w") as f:
+                f.write(profiler.folded())
+            with open(_path(meta["id"], "json"), "w") as f:
+                json.dump(meta, f, indent=2)
+            _prune()
+
+
+def list_profiles(user_id: int | None = None, connection_name: str | None = None) -> list[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if user_id is not None and meta.get("user_id") != user_id:
+            continue
+        if connection_name is not None and meta.get("connection_name") != connection_name:
+            continue
+        meta.pop("top_functions", None)
+        profiles.append(meta)
+    return sorted(profiles, key=lambda m: m["started_at"], reverse=True)
+
+
+def get_profile(profile_id: str) -> dict | None:
+    if not profile_id.isalnum():
+        return None
+    try:
+        with open(_path(profile_id, "json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def get_profile_folded_path(profile_id: str) -> str | None:
+    if not profile_id.isalnum():
+        return None
+    path = _path(profile_id, "folded")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,68 @@
+# core/prompt_metrics.py
+
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character heuristic
+    tiktoken = None
+
+
+@lru_cache(maxsize=32)
+def _encoding_for(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # non-OpenAI models (Together/Llama etc.) – close enough for accounting
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # BPE files not cached locally and not downloadable
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count prompt tokens locally (no provider round trip).
+    """
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {"requests": 0, "prompt_tokens": 0, "generation_ms": 0.0})
+
+
+def record_prompt(user_id: int, connection_name: str, schema_mode: str, prompt_tokens: int, generation_ms: float):
+    with _lock:
+        entry = _stats[(user_id, connection_name, schema_mode)]
+        entry["requests"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["generation_ms"] += generation_ms
+
+
+def prompt_stats(user_id: int) -> list[dict]:
+    """
+    Per connection and schema mode: average prompt size and generation latency,
+    so compact vs. ddl rendering can be compared side by side.
+    """
+    with _lock:
+        rows = [(k, dict(v)) for k, v in _stats.items() if k[0] == user_id]
+
+    out = []
+    for (_, connection_name, schema_mode), v in sorted(rows, key=lambda r: (r[0][1], r[0][2])):
+        n = v["requests"]
+        out.append({
+            "connection_name": connection_name,
+            "schema_mode": schema_mode,
+            "requests": n,
+            "avg_prompt_tokens": round(v["prompt_tokens"] / n, 1),
+            "avg_generation_ms": round(v["generation_ms"] / n, 1),
+        })
+    return out
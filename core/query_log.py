@@ -0,0 +1,233 @@
+# core/query_log.py
+
+import glob
+import hashlib
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, select, func, or_, and_
+
+from core.db import engine
+from core.write_behind import WriteBehindQueue
+from db.model import Connection, Query
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+QUERY_LOG_SINK = os.getenv("QUERY_LOG_SINK", "db")  # db | jsonl
+QUERY_LOG_DIR = os.getenv("QUERY_LOG_DIR", os.path.join(BASE_DIR, "data", "query_log"))
+
+
+def sql_hash(sql: str) -> str:
+    return hashlib.sha256(" ".join(sql.split()).encode()).hexdigest()[:16]
+
+
+# -------- Sinks --------
+
+def _flush_db(batch: list[dict]) -> None:
+    with Session(engine) as session:
+        # one lookup for every connection in the batch
+        pairs = {(r["user_id"], r["connection_name"]) for r in batch}
+        rows = session.exec(
+            select(Connection.id, Connection.user_id, Connection.connection_name).where(
+                or_(*(and_(Connection.user_id == u, Connection.connection_name == c) for u, c in pairs))
+            )
+        ).all()
+        ids = {(u, c): i for i, u, c in rows}
+        for record in batch:
+            connection_id = ids.get((record["user_id"], record["connection_name"]))
+            if connection_id is None:
+                continue  # unknown connection: nothing to attach the row to
+            fields = {k: v for k, v in record.items() if k != "connection_name"}
+            session.add(Query(connection_id=connection_id, **fields))
+        session.commit()
+
+
+def _segment_path(ts: datetime) -> str:
+    # hourly append-only segments
+    return os.path.join(QUERY_LOG_DIR, f"queries-{ts:%Y%m%d%H}.jsonl")
+
+
+def _flush_jsonl(batch: list[dict]) -> None:
+    os.makedirs(QUERY_LOG_DIR, exist_ok=True)
+    by_segment = defaultdict(list)
+    for record in batch:
+        by_segment[_segment_path(record["created_at"])].append(record)
+    for path, records in by_segment.items():
+        with open(path, "a") as f:
+            f.writelines(json.dumps(r, default=str) + "\n" for r in records)
+
+
+_queue = WriteBehindQueue("query_log", _flush_jsonl if QUERY_LOG_SINK == "jsonl" else _flush_db)
+
+
+def query_log_stats() -> dict:
+    return {"sink": QUERY_LOG_SINK, **_queue.stats()}
+
+
+def flush_query_log() -> None:
+    _queue.flush()
+
+
+# -------- Recording (request path) --------
+
+def record_answer(
+    user_id: int,
+    connection_name: str,
+    question: str,
+    provider: str | None,
+    model: str | None,
+    duration_ms: float,
+    result: dict | None = None,
+    error: str | None = None,
+    query_key: str | None = None,
+) -> None:
+    """Enqueue one /answer for the history; never blocks or raises."""
+    sql = (result or {}).get("last_sql_query")
+    _queue.put({
+        "user_id": user_id,
+        "connection_name": connection_name,
+        "query_key": query_key,
+        "question": question,
+        "sql": sql,
+        "sql_hash": sql_hash(sql) if sql else None,
+        "provider": provider,
+        "model": model,
+        "status": "error" if error else "ok",
+        "error": error[:1000] if error else None,
+        "duration_ms": round(duration_ms, 1),
+        "execution_ms": (result or {}).get("execution_ms"),
+        "row_count": (result or {}).get("total_records"),
+        "sql_cache_hit": bool((result or {}).get("sql_cache_hit")),
+        "result_cache_hit": bool((result or {}).get("result_cache_hit")),
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+def run_result(run: dict) -> dict:
+    """record_answer's `result` for a run_question / ChatSession.ask dict."""
+    return {
+        "last_sql_query": run["sql"],
+        "execution_ms": run["execution_ms"],
+        "total_records": len(run["df"]),
+        "sql_cache_hit": run["sql_cache_hit"],
+        "result_cache_hit": run["result_cache_hit"],
+    }
+
+
+# -------- Reading --------
+
+def _jsonl_records(user_id: int, since: datetime | None):
+    for path in sorted(glob.glob(os.path.join(QUERY_LOG_DIR, "queries-*.jsonl"))):
+        with open(path) as f:
+            for line in f:
+                r = json.loads(line)
+                if r["user_id"] != user_id:
+                    continue
+                if since and datetime.fromisoformat(r["created_at"]) < since:
+                    continue
+                yield r
+
+
+def query_history(user_id: int, connection_name: str | None = None, limit: int = 50) -> list[dict]:
+    if QUERY_LOG_SINK == "jsonl":
+        records = [
+            r for r in _jsonl_records(user_id, None)
+            if connection_name is None or r["connection_name"] == connection_name
+        ]
+        return records[::-1][:limit]
+
+    with Session(engine) as session:
+        stmt = (
+            select(Query, Connection.connection_name)
+            .join(Connection, Connection.id == Query.connection_id)
+            .where(Query.user_id == user_id, Query.question.is_not(None))
+            .order_by(Query.created_at.desc())
+            .limit(limit)
+        )
+        if connection_name:
+            stmt = stmt.where(Connection.connection_name == connection_name)
+        return [{**q.model_dump(), "connection_name": name} for q, name in session.exec(stmt).all()]
+
+
+def slow_queries(
+    user_id: int,
+    connection_name: str | None = None,
+    since_hours: float | None = None,
+    limit: int = 20,
+) -> list[dict]:
+    """
+    Distinct generated SQL per connection, slowest first (by mean execution
+    time), with how often it ran and how many rows it returned (drivers
+    don't report rows scanned). Runs served from the result cache executed
+    nothing and are left out.
+    """
+    since = datetime.now(timezone.utc) - timedelta(hours=since_hours) if since_hours else None
+
+    if QUERY_LOG_SINK == "jsonl":
+        groups = defaultdict(list)
+        for r in _jsonl_records(user_id, since):
+            if r["status"] != "ok" or not r["sql_hash"] or r["execution_ms"] is None or r.get("result_cache_hit"):
+                continue
+            if connection_name and r["connection_name"] != connection_name:
+                continue
+            groups[(r["connection_name"], r["sql_hash"])].append(r)
+        rows = []
+        for (conn_name, h), rs in groups.items():
+            times = [r["execution_ms"] for r in rs]
+            counts = [r["row_count"] or 0 for r in rs]
+            rows.append({
+                "connection_name": conn_name,
+                "sql_hash": h,
+                "sql": rs[-1]["sql"],
+                "runs": len(rs),
+                "avg_execution_ms": round(sum(times) / len(times), 1),
+                "max_execution_ms": max(times),
+                "avg_rows": round(sum(counts) / len(counts), 1),
+                "max_rows": max(counts),
+                "last_run": rs[-1]["created_at"],
+            })
+        return sorted(rows, key=lambda r: r["avg_execution_ms"], reverse=True)[:limit]
+
+    avg_ms = func.avg(Query.execution_ms)
+    stmt = (
+        select(
+            Connection.connection_name,
+            Query.sql_hash,
+            func.max(Query.sql),
+            func.count(),
+            avg_ms,
+            func.max(Query.execution_ms),
+            func.avg(Query.row_count),
+            func.max(Query.row_count),
+            func.max(Query.created_at),
+        )
+        .join(Connection, Connection.id == Query.connection_id)
+        .where(
+            Query.user_id == user_id, Query.status == "ok", Query.execution_ms.is_not(None),
+            Query.result_cache_hit.is_(False),
+        )
+        .group_by(Connection.connection_name, Query.sql_hash)
+        .order_by(avg_ms.desc())
+        .limit(limit)
+    )
+    if connection_name:
+        stmt = stmt.where(Connection.connection_name == connection_name)
+    if since:
+        stmt = stmt.where(Query.created_at >= since)
+
+    with Session(engine) as session:
+        return [
+            {
+                "connection_name": conn_name,
+                "sql_hash": h,
+                "sql": sql,
+                "runs": runs,
+                "avg_execution_ms": round(avg or 0, 1),
+                "max_execution_ms": max_ms,
+                "avg_rows": round(avg_rows or 0, 1),
+                "max_rows": max_rows,
+                "last_run": last_run,
+            }
+            for conn_name, h, sql, runs, avg, max_ms, avg_rows, max_rows, last_run in session.exec(stmt).all()
+        ]
@@ -0,0 +1,180 @@
+# core/reflection.py
+
+from collections import defaultdict
+
+from sqlalchemy import inspect, text
+
+from core.cache import get_cache, connection_fingerprint, SCHEMA_TTL
+
+# Whole-catalog reflection in a fixed number of round trips, instead of the
+# inspector's get_columns / get_pk_constraint / get_foreign_keys per table.
+#
+# Result shape, per table (or view):
+#   {"kind": "table" | "view",
+#    "columns": [{"name", "type", "nullable"}],      # type is the SQL type string
+#    "pk": [column, ...],
+#    "fks": [{"column", "referred_table", "referred_column"}]}
+
+
+def _table(kind: str = "table") -> dict:
+    return {"kind": kind, "columns": [], "pk": [], "fks": []}
+
+
+def _sqlite(conn) -> dict:
+    out = {}
+    pk_order = defaultdict(list)
+    # table-valued pragmas (SQLite 3.16+) join against sqlite_master: one query for every table
+    for table, kind, name, type_, notnull, pk in conn.execute(text(
+        "SELECT m.name, m.type, p.name, p.type, p.\"notnull\", p.pk "
+        "FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p "
+        "WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%' "
+        "ORDER BY m.name, p.cid"
+    )):
+        entry = out.setdefault(table, _table(kind))
+        entry["columns"].append({"name": name, "type": type_ or "", "nullable": not notnull and not pk})
+        if pk:
+            pk_order[table].append((pk, name))
+    for table, cols in pk_order.items():
+        out[table]["pk"] = [name for _, name in sorted(cols)]
+
+    for table, column, referred_table, referred_column in conn.execute(text(
+        "SELECT m.name, f.\"from\", f.\"table\", f.\"to\" "
+        "FROM sqlite_master AS m JOIN pragma_foreign_key_list(m.name) AS f "
+        "WHERE m.type = 'table' ORDER BY m.name, f.id, f.seq"
+    )):
+        if referred_column is None:
+            # REFERENCES t without a column list means t's primary key
+            target = out.get(referred_table, {}).get("pk") or [None]
+            referred_column = target[0]
+        out[table]["fks"].append(
+            {"column": column, "referred_table": referred_table, "referred_column": referred_column}
+        )
+    return out
+
+
+def _postgres(conn, schema: str | None) -> dict:
+    out = {}
+    params = {"schema": schema}
+    for table, relkind, name, type_, nullable in conn.execute(text(
+        "SELECT c.relname, c.relkind, a.attname, format_type(a.atttypid, a.atttypmod), NOT a.attnotnull "
+        "FROM pg_catalog.pg_attribute AS a "
+        "JOIN pg_catalog.pg_class AS c ON c.oid = a.attrelid "
+        "JOIN pg_catalog.pg_namespace AS n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = COALESCE(:schema, current_schema()) "
+        "AND c.relkind IN ('r', 'p', 'v', 'm', 'f') AND a.attnum > 0 AND NOT a.attisdropped "
+        "ORDER BY c.relname, a.attnum"
+    ), params):
+        entry = out.setdefault(table, _table("view" if relkind in ("v", "m") else "table"))
+        entry["columns"].append({"name": name, "type": type_, "nullable": nullable})
+
+    for table, contype, column, referred_table, referred_column in conn.execute(text(
+        "SELECT c.relname, con.contype, a.attname, rc.relname, ra.attname "
+        "FROM pg_catalog.pg_constraint AS con "
+        "JOIN pg_catalog.pg_class AS c ON c.oid = con.conrelid "
+        "JOIN pg_catalog.pg_namespace AS n ON n.oid = c.relnamespace "
+        "CROSS JOIN LATERAL unnest(con.conkey, COALESCE(con.confkey, con.conkey)) "
+        "  WITH ORDINALITY AS k(attnum, fattnum, ord) "
+        "JOIN pg_catalog.pg_attribute AS a ON a.attrelid = con.conrelid AND a.attnum = k.attnum "
+        "LEFT JOIN pg_catalog.pg_class AS rc ON rc.oid = con.confrelid "
+        "LEFT JOIN pg_catalog.pg_attribute AS ra ON ra.attrelid = con.confrelid AND ra.attnum = k.fattnum "
+        "WHERE n.nspname = COALESCE(:schema, current_schema()) AND con.contype IN ('p', 'f') "
+        "ORDER BY c.relname, con.conname, k.ord"
+    ), params):
+        entry = out.get(table)
+        if entry is None:
+            continue
+        if contype == "p":
+            entry["pk"].append(column)
+        else:
+            entry["fks"].append({"column": column, "referred_table": referred_table, "referred_column": referred_column})
+    return out
+
+
+def _mysql(conn, schema: str | None) -> dict:
+    out = {}
+    params = {"schema": schema}
+    for table, table_type, name, type_, nullable in conn.execute(text(
+        "SELECT c.TABLE_NAME, t.TABLE_TYPE, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE "
+        "FROM information_schema.COLUMNS AS c "
+        "JOIN information_schema.TABLES AS t ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME "
+        "WHERE c.TABLE_SCHEMA = COALESCE(:schema, DATABASE()) "
+        "ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION"
+    ), params):
+        entry = out.setdefault(table, _table("view" if table_type == "VIEW" else "table"))
+        entry["columns"].append({"name": name, "type": str(type_), "nullable": nullable == "YES"})
+
+    for table, constraint, column, referred_table, referred_column in conn.execute(text(
+        "SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+        "FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) "
+        "AND (CONSTRAINT_NAME = 'PRIMARY' OR REFERENCED_TABLE_NAME IS NOT NULL) "
+        "ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION"
+    ), params):
+        entry = out.get(table)
+        if entry is None:
+            continue
+        if constraint == "PRIMARY":
+            entry["pk"].append(column)
+        else:
+            entry["fks"].append({"column": column, "referred_table": referred_table, "referred_column": referred_column})
+    return out
+
+
+def _inspector(engine, schema: str | None) -> dict:
+    """Other dialects: SQLAlchemy's get_multi_* (bulk where the dialect supports it)."""
+    insp = inspect(engine)
+    out = {}
+    for (_, table), cols in insp.get_multi_columns(schema=schema).items():
+        entry = out.setdefault(table, _table())
+        for c in cols:
+            try:
+                type_ = str(c["type"].compile(dialect=engine.dialect))
+            except Exception:
+                type_ = type(c["type"]).__name__
+            entry["columns"].append({"name": c["name"], "type": type_, "nullable": c.get("nullable", True)})
+    for (_, table), pk in insp.get_multi_pk_constraint(schema=schema).items():
+        if table in out:
+            out[table]["pk"] = list(pk.get("constrained_columns") or [])
+    for (_, table), fks in insp.get_multi_foreign_keys(schema=schema).items():
+        if table not in out:
+            continue
+        for fk in fks:
+            for column, referred in zip(fk["constrained_columns"], fk["referred_columns"]):
+                out[table]["fks"].append(
+                    {"column": column, "referred_table": fk["referred_table"], "referred_column": referred}
+                )
+    return out
+
+
+def reflect_catalog(engine, schema: str | None = None) -> dict[str, dict]:
+    """Columns, primary keys and foreign keys of every table, in O(1) round trips."""
+    dialect = engine.dialect.name
+    if dialect not in ("sqlite", "postgresql", "mysql", "mariadb"):
+        return _inspector(engine, schema)
+    with engine.connect() as conn:
+        if dialect == "sqlite":
+            return _sqlite(conn)
+        if dialect == "postgresql":
+            return _postgres(conn, schema)
+        return _mysql(conn, schema)
+
+
+def catalog(db_url: str, schema: str | None = None) -> dict[str, dict]:
+    """reflect_catalog, shared through the schema cache for SCHEMA_TTL."""
+    from core.db import get_engine
+
+    return get_cache().get_or_set(
+        f"schema:{connection_fingerprint(db_url)}",
+        f"catalog|{schema or ''}",
+        lambda: reflect_catalog(get_engine(db_url, count_hit=False), schema),
+        SCHEMA_TTL,
+    )
+
+
+def table_columns(db_url: str, include_views: bool = False) -> dict[str, list[str]]:
+    """{table: [column names]} from the cached catalog."""
+    return {
+        table: [c["name"] for c in info["columns"]]
+        for table, info in catalog(db_url).items()
+        if include_views or info["kind"] == "table"
+    }
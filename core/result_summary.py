@@ -0,0 +1,271 @@
+# core/result_summary.py
+
+from __future__ import annotations
+
+import heapq
+import os
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SUMMARY_CHUNK_ROWS = int(os.getenv("SUMMARY_CHUNK_ROWS", "50000"))
+SUMMARY_TOP_K = int(os.getenv("SUMMARY_TOP_K", "3"))
+SUMMARY_MAX_COLUMNS = int(os.getenv("SUMMARY_MAX_COLUMNS", "12"))
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "1500"))
+SUMMARY_HISTOGRAM_BINS = 5
+_RESERVOIR_SIZE = 2048
+_MAX_TRACKED_VALUES = 1024  # bounded counter for top-k (Misra-Gries style)
+_MAX_VALUE_LEN = 40
+
+
+def _short(value) -> str:
+    s = str(value)
+    return s if len(s) <= _MAX_VALUE_LEN else s[: _MAX_VALUE_LEN - 1] + "…"
+
+
+def _day_or_second(ts: np.datetime64) -> str:
+    s = str(ts.astype("datetime64[s]")).replace("T", " ")
+    return s[:10] if s.endswith("00:00:00") else s
+
+
+def _utc_naive(values: np.ndarray) -> np.ndarray:
+    """Object array of datetimes -> naive UTC, so NumPy needn't drop tz-awareness (and warn)."""
+    return np.array([
+        v.astimezone(timezone.utc).replace(tzinfo=None) if isinstance(v, datetime) and v.tzinfo else v
+        for v in values.tolist()
+    ], dtype=object)
+
+
+def _fmt(x: float) -> str:
+    if float(x).is_integer() and abs(x) < 1e15:
+        return str(int(x))
+    return f"{x:.4g}" if abs(x) >= 1e6 or abs(x) < 1e-3 else f"{x:,.2f}"
+
+
+class ColumnStats:
+    """
+    Incremental stats for one column. Every update is a handful of
+    vectorized NumPy passes over the chunk, so memory stays bounded and
+    total work is linear in the rows seen.
+    """
+
+    def __init__(self, name: str, rng: np.random.Generator):
+        self.name = name
+        self.kind: str | None = None  # numeric | datetime | text
+        self.count = 0
+        self.nulls = 0
+        self._rng = rng
+        # numeric / datetime
+        self.min = None
+        self.max = None
+        self._sum = 0.0
+        self._reservoir = np.empty(0)
+        self._seen = 0
+        # text
+        self._counts: dict = {}
+        self._pruned = False
+        self._distinct_at_least = 0
+
+    @staticmethod
+    def _detect(values: np.ndarray) -> str:
+        if values.dtype.kind in "iuf":
+            return "numeric"
+        if values.dtype.kind == "M":
+            return "datetime"
+        if values.dtype.kind == "b":
+            return "text"
+        first = values[0]
+        if isinstance(first, (int, float, Decimal, np.number)) and not isinstance(first, bool):
+            return "numeric"
+        if isinstance(first, date):
+            return "datetime"
+        return "text"
+
+    def update(self, values: np.ndarray) -> None:
+        if values.dtype.kind == "f":
+            mask = np.isnan(values)
+        elif values.dtype.kind == "M":
+            mask = np.isnat(values)
+        elif values.dtype.kind == "O":
+            mask = (values == None) | (values != values)  # noqa: E711 (elementwise None/NaN test)
+        else:
+            mask = np.zeros(len(values), bool)
+        self.nulls += int(mask.sum())
+        present = values[~mask]
+        self.count += len(present)
+        if not len(present):
+            return
+        if self.kind is None:
+            self.kind = self._detect(present)
+
+        if self.kind == "numeric":
+            try:
+                nums = present.astype(float)
+            except (TypeError, ValueError):
+                self.kind = "text"  # mixed column: fall back to value counts
+                self._update_text(present)
+                return
+            self._update_numeric(nums)
+        elif self.kind == "datetime":
+            if present.dtype.kind != "M":
+                present = _utc_naive(present).astype("datetime64[us]")
+            lo, hi = present.min(), present.max()
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+        else:
+            self._update_text(present)
+
+    def _update_numeric(self, nums: np.ndarray) -> None:
+        lo, hi = float(nums.min()), float(nums.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        self._sum += float(nums.sum())
+
+        # reservoir sample (for the histogram), merged chunk-wise
+        n = len(nums)
+        if len(self._reservoir) < _RESERVOIR_SIZE:
+            take = min(n, _RESERVOIR_SIZE - len(self._reservoir))
+            self._reservoir = np.concatenate([self._reservoir, nums[:take]])
+            nums, self._seen = nums[take:], self._seen + take
+            n = len(nums)
+        if n:
+            # item i of this chunk replaces a random slot with prob R/(seen+i+1)
+            positions = self._seen + np.arange(1, n + 1)
+            slots = (self._rng.random(n) * positions).astype(np.int64)
+            keep = slots < _RESERVOIR_SIZE
+            self._reservoir[slots[keep]] = nums[keep]
+            self._seen += n
+
+    def _update_text(self, present: np.ndarray) -> None:
+        # str() per cell: astype(str) would broadcast sequence cells (array columns)
+        text = np.array([str(v) for v in present]) if present.dtype.kind == "O" else present.astype(str)
+        uniq, counts = np.unique(text, return_counts=True)
+        for value, c in zip(uniq.tolist(), counts.tolist()):
+            self._counts[value] = self._counts.get(value, 0) + c
+        self._distinct_at_least = max(self._distinct_at_least, len(self._counts))
+        if len(self._counts) > _MAX_TRACKED_VALUES:
+            # keep the heaviest half by rank (ties included up to the limit);
+            # counts become lower bounds for the rest
+            self._counts = dict(heapq.nlargest(_MAX_TRACKED_VALUES // 2, self._counts.items(), key=lambda kv: kv[1]))
+            self._pruned = True
+
+    def top(self, k: int = SUMMARY_TOP_K) -> list[tuple[str, int]]:
+        return sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def histogram(self, bins: int = SUMMARY_HISTOGRAM_BINS) -> list[dict]:
+        if self.kind != "numeric" or not len(self._reservoir) or self.min == self.max:
+            return []
+        counts, edges = np.histogram(self._reservoir, bins=bins, range=(self.min, self.max))
+        scale = self.count / max(1, len(self._reservoir))
+        return [
+            {"from": float(edges[i]), "to": float(edges[i + 1]), "approx_count": int(round(c * scale))}
+            for i, c in enumerate(counts)
+        ]
+
+    def as_dict(self) -> dict:
+        out = {"name": self.name, "kind": self.kind or "empty", "count": self.count, "nulls": self.nulls}
+        if self.kind == "numeric":
+            out.update(min=self.min, max=self.max, mean=self._sum / self.count if self.count else None,
+                       histogram=self.histogram())
+        elif self.kind == "datetime":
+            out.update(min=_day_or_second(self.min), max=_day_or_second(self.max))
+        elif self.kind == "text":
+            out.update(distinct_at_least=self._distinct_at_least, top=self.top())
+        return out
+
+    def describe(self) -> str:
+        head = f"- {self.name}: {self.count} value(s)"
+        if self.nulls:
+            head += f", {self.nulls} missing"
+        if self.kind == "numeric":
+            mean = self._sum / self.count
+            text = f"{head}; min {_fmt(self.min)}, max {_fmt(self.max)}, mean {_fmt(mean)}"
+            hist = self.histogram()
+            if hist:
+                busiest = max(hist, key=lambda b: b["approx_count"])
+                share = busiest["approx_count"] / max(1, self.count)
+                text += f"; ~{share:.0%} between {_fmt(busiest['from'])} and {_fmt(busiest['to'])}"
+            return text
+        if self.kind == "datetime":
+            return f"{head}; from {_day_or_second(self.min)} to {_day_or_second(self.max)}"
+        if self.kind == "text":
+            distinct = self._distinct_at_least
+            if distinct == self.count:
+                return f"{head}; all distinct, e.g. {', '.join(_short(v) for v, _ in self.top())}"
+            top = ", ".join(f"{_short(v)} ({c})" for v, c in self.top())
+            return f"{head}; {distinct}{'+' if self._pruned else ''} distinct; most common: {top}"
+        return f"{head}; all missing"
+
+
+class ResultSummarizer:
+    """Feed result chunks in; get bounded stats and a short text out."""
+
+    def __init__(self, columns: Sequence[str], seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.columns = [str(c) for c in columns]
+        self.rows = 0
+        self._stats = [ColumnStats(c, rng) for c in self.columns]
+
+    def update_rows(self, rows: Sequence[Sequence]) -> None:
+        """A chunk of DB-API rows (e.g. from fetchmany)."""
+        if not rows:
+            return
+        self.rows += len(rows)
+        for i, stats in enumerate(self._stats):
+            # cell by cell: a slice assignment would broadcast sequence cells (array columns)
+            col = np.fromiter((row[i] for row in rows), dtype=object, count=len(rows))
+            try:
+                # let NumPy pick a native dtype when the column allows it
+                native = np.array(col.tolist())
+                if native.ndim == 1 and native.dtype.kind in "iufbM":
+                    col = native
+            except (TypeError, ValueError):
+                pass
+            stats.update(col)
+
+    def update_frame(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        for stats, name in zip(self._stats, df.columns):
+            col = df[name]
+            if getattr(col.dtype, "tz", None) is not None:
+                col = col.dt.tz_convert("UTC").dt.tz_localize(None)
+            stats.update(col.to_numpy())
+
+    def summary(self) -> dict:
+        return {"rows": self.rows, "columns": [s.as_dict() for s in self._stats]}
+
+    def describe(self, max_chars: int = SUMMARY_MAX_CHARS, max_columns: int = SUMMARY_MAX_COLUMNS) -> str:
+        if not self.rows:
+            return "The query returned no rows."
+        lines = [f"The query returned {self.rows} row(s) with {len(self.columns)} column(s)."]
+        used = len(lines[0])
+        for i, stats in enumerate(self._stats[:max_columns]):
+            line = stats.describe()
+            if used + len(line) + 1 > max_chars:
+                lines.append(f"… {len(self._stats) - i} more column(s) not described.")
+                break
+            lines.append(line)
+            used += len(line) + 1
+        else:
+            if len(self._stats) > max_columns:
+                lines.append(f"… {len(self._stats) - max_columns} more column(s) not described.")
+        return "\n".join(lines)
+
+
+def summarize_frame(df: pd.DataFrame, chunk_rows: int = SUMMARY_CHUNK_ROWS) -> ResultSummarizer:
+    summarizer = ResultSummarizer(df.columns)
+    for start in range(0, len(df), chunk_rows):
+        summarizer.update_frame(df.iloc[start:start + chunk_rows])
+    return summarizer
+
+
+def summarize_rows(columns: Sequence[str], chunks: Iterable[Sequence[Sequence]]) -> ResultSummarizer:
+    summarizer = ResultSummarizer(columns)
+    for rows in chunks:
+        summarizer.update_rows(rows)
+    return summarizer
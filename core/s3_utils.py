@@ -1,37 +1,46 @@
 # core/s3_utils.py
 
-import boto3
 import json
 import os
-from dotenv import load_dotenv
-from botocore.exceptions import ClientError
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 from datetime import datetime
 
+from core.startup import load_env
+
 # Load environment variables
-load_dotenv()
+load_env()
 
-# Set up static S3 client and bucket name
+# Bucket name + credentials; the client itself is built on first use
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
 BUCKET_NAME = "db-llm-1"  # Replace this with your actual S3 bucket name
 
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    # boto3 costs ~0.5s to import; keep it off the app import path
+    import boto3
+
+    return boto3.client(
+        "s3",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION
+    )
 
 
-def save_query_to_s3(user_id: int, query_key: str, question: str, sql_query: str, answer: str):
+def save_query_to_s3(user_id: int, query_key: str, question: str, sql_query: str, answer: str,
+                     connection_name: Optional[str] = None):
+    s3 = get_s3_client()
     file_path = f"saved_queries/{user_id}/{query_key}.json"
 
     payload = {
         "question": question,
         "sql_query": sql_query,
         "answer": answer,
+        "connection_name": connection_name,
         "timestamp": datetime.utcnow().isoformat()
     }
 
@@ -41,9 +50,37 @@ def save_query_to_s3(user_id: int, query_key: str, question: str, sql_query: str
         Body=json.dumps(payload),
         ContentType="application/json"
     )
+    _update_search_index(index=(user_id, query_key, question, sql_query, answer, connection_name, payload["timestamp"]))
+
+
+def _update_search_index(index: tuple | None = None, remove: tuple | None = None):
+    from core.saved_query_index import index_saved_query, remove_saved_query
+
+    try:
+        if index:
+            index_saved_query(*index)
+        if remove:
+            remove_saved_query(*remove)
+    except Exception:
+        pass  # S3 is the source of truth; search only lags until the next save
+
+
+def iter_saved_queries_from_s3(user_id: int):
+    """(query_key, parsed object) for every saved query of the user, paginated."""
+    s3 = get_s3_client()
+    prefix = f"saved_queries/{user_id}/"
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if not key.endswith(".json"):
+                continue
+            body = s3.get_object(Bucket=BUCKET_NAME, Key=key)["Body"].read().decode("utf-8")
+            yield key[len(prefix):-len(".json")], json.loads(body)
 
 
 def list_saved_queries_from_s3(user_id: int) -> List[str]:
+    from botocore.exceptions import ClientError
+    s3 = get_s3_client()
     prefix = f"saved_queries/{user_id}/"
     results = []
 
@@ -77,10 +114,89 @@ def list_saved_queries_from_s3(user_id: int) -> List[str]:
     return results
 
 
+def get_saved_query_from_s3(user_id: int, query_key: str) -> Optional[dict]:
+    from botocore.exceptions import ClientError
+    s3 = get_s3_client()
+    file_path = f"saved_queries/{user_id}/{query_key}.json"
+    try:
+        body = s3.get_object(Bucket=BUCKET_NAME, Key=file_path)["Body"].read().decode("utf-8")
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise RuntimeError(f"Error reading query from S3: {e}")
+    return json.loads(body)
+
+
+def put_json_to_s3(key: str, payload: dict, if_match: Optional[str] = None) -> Optional[str]:
+    """
+    Returns the object's ETag. With `if_match`, the write only lands if the
+    object still has that ETag; otherwise (another writer got there first)
+    nothing is written and None is returned.
+    """
+    from botocore.exceptions import ClientError
+    s3 = get_s3_client()
+    conditions = {"IfMatch": if_match} if if_match else {}
+    try:
+        response = s3.put_object(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            Body=json.dumps(payload, default=str),
+            ContentType="application/json",
+            **conditions,
+        )
+    except ClientError as e:
+        if if_match and e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return None
+        raise
+    return response.get("ETag")
+
+
+def head_s3_etag(key: str) -> Optional[str]:
+    """ETag of an object, or None if it doesn't exist."""
+    from botocore.exceptions import ClientError
+    s3 = get_s3_client()
+    try:
+        return s3.head_object(Bucket=BUCKET_NAME, Key=key)["ETag"]
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise RuntimeError(f"Error reading {key} from S3: {e}")
+
+
+def list_s3_keys(prefix: str):
+    """Every object key under `prefix`, paginated."""
+    s3 = get_s3_client()
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"]
+
+
+def get_json_from_s3(key: str) -> Optional[dict]:
+    from botocore.exceptions import ClientError
+    s3 = get_s3_client()
+    try:
+        body = s3.get_object(Bucket=BUCKET_NAME, Key=key)["Body"].read().decode("utf-8")
+    except ClientError:
+        return None
+    return json.loads(body)
+
+
+def delete_json_from_s3(key: str):
+    from botocore.exceptions import ClientError
+    s3 = get_s3_client()
+    try:
+        s3.delete_object(Bucket=BUCKET_NAME, Key=key)
+    except ClientError as e:
+        raise RuntimeError(f"Error deleting {key} from S3: {e}")
+
+
 def delete_query_from_s3(user_id: int, query_key: str):
+    from botocore.exceptions import ClientError
+    s3 = get_s3_client()
     file_path = f"saved_queries/{user_id}/{query_key}.json"
     try:
         s3.delete_object(Bucket=BUCKET_NAME, Key=file_path)
+        _update_search_index(remove=(user_id, query_key))
         return f"Query {query_key} deleted from S3 for user {user_id}"
     except ClientError as e:
         raise RuntimeError(f"Error deleting query from S3: {e}")
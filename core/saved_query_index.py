@@ -0,0 +1,179 @@
+# core/saved_query_index.py
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAVED_QUERY_INDEX_PATH = os.getenv(
+    "SAVED_QUERY_INDEX_PATH", os.path.join(BASE_DIR, "data", "saved_queries_fts.sqlite3")
+)
+SAVED_QUERY_MAX_ANSWER_CHARS = int(os.getenv("SAVED_QUERY_MAX_ANSWER_CHARS", "2000"))
+
+# Local full-text index over saved queries (the objects themselves live in S3).
+# `owner` ("u<user_id>") is an indexed FTS column, so a user's matches are an
+# intersection of posting lists rather than a filter over every user's hits.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_query (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    query_key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    connection_name TEXT,
+    saved_at TEXT,
+    question TEXT,
+    sql_query TEXT,
+    answer TEXT,
+    UNIQUE (user_id, query_key)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS saved_query_fts USING fts5(
+    owner, question, sql_query, answer,
+    content='saved_query', content_rowid='id', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS saved_query_ai AFTER INSERT ON saved_query BEGIN
+    INSERT INTO saved_query_fts (rowid, owner, question, sql_query, answer)
+    VALUES (new.id, new.owner, new.question, new.sql_query, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS saved_query_ad AFTER DELETE ON saved_query BEGIN
+    INSERT INTO saved_query_fts (saved_query_fts, rowid, owner, question, sql_query, answer)
+    VALUES ('delete', old.id, old.owner, old.question, old.sql_query, old.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS saved_query_au AFTER UPDATE ON saved_query BEGIN
+    INSERT INTO saved_query_fts (saved_query_fts, rowid, owner, question, sql_query, answer)
+    VALUES ('delete', old.id, old.owner, old.question, old.sql_query, old.answer);
+    INSERT INTO saved_query_fts (rowid, owner, question, sql_query, answer)
+    VALUES (new.id, new.owner, new.question, new.sql_query, new.answer);
+END;
+CREATE TABLE IF NOT EXISTS synced_user (user_id INTEGER PRIMARY KEY, synced_at REAL NOT NULL);
+"""
+
+# bm25 weights per column: owner (filter only), question, sql_query, answer
+_WEIGHTS = (0.0, 10.0, 4.0, 1.0)
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized: set[str] = set()
+_syncing: set[int] = set()
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != SAVED_QUERY_INDEX_PATH:
+        os.makedirs(os.path.dirname(SAVED_QUERY_INDEX_PATH), exist_ok=True)
+        conn = sqlite3.connect(SAVED_QUERY_INDEX_PATH, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _init_lock:
+            if SAVED_QUERY_INDEX_PATH not in _initialized:
+                conn.executescript(_SCHEMA)
+                _initialized.add(SAVED_QUERY_INDEX_PATH)
+        _local.conn, _local.path = conn, SAVED_QUERY_INDEX_PATH
+    return conn
+
+
+# -------- Updates (on save / delete) --------
+
+def index_saved_query(user_id: int, query_key: str, question: str, sql_query: str, answer,
+                      connection_name: str | None = None, saved_at: str | None = None) -> None:
+    answer = answer if isinstance(answer, str) else str(answer)
+    _conn().execute(
+        "INSERT INTO saved_query (user_id, query_key, owner, connection_name, saved_at, question, sql_query, answer) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (user_id, query_key) DO UPDATE SET connection_name = excluded.connection_name, "
+        "saved_at = excluded.saved_at, question = excluded.question, sql_query = excluded.sql_query, "
+        "answer = excluded.answer",
+        (user_id, query_key, f"u{user_id}", connection_name,
+         saved_at or time.strftime("%Y-%m-%dT%H:%M:%S"), question, sql_query,
+         answer[:SAVED_QUERY_MAX_ANSWER_CHARS]),
+    )
+
+
+def remove_saved_query(user_id: int, query_key: str) -> None:
+    _conn().execute("DELETE FROM saved_query WHERE user_id = ? AND query_key = ?", (user_id, query_key))
+
+
+# -------- Backfill from S3 (once per user) --------
+
+def _backfill(user_id: int) -> None:
+    from core.s3_utils import iter_saved_queries_from_s3
+
+    try:
+        conn = _conn()
+        for query_key, saved in iter_saved_queries_from_s3(user_id):
+            index_saved_query(
+                user_id, query_key, saved.get("question") or "", saved.get("sql_query") or "",
+                saved.get("answer") or "", saved.get("connection_name"), saved.get("timestamp"),
+            )
+        conn.execute("INSERT OR REPLACE INTO synced_user (user_id, synced_at) VALUES (?, ?)", (user_id, time.time()))
+    finally:
+        with _init_lock:
+            _syncing.discard(user_id)
+
+
+def ensure_synced(user_id: int) -> bool:
+    """True once the user's S3 objects are indexed; otherwise starts the backfill."""
+    if _conn().execute("SELECT 1 FROM synced_user WHERE user_id = ?", (user_id,)).fetchone():
+        return True
+    with _init_lock:
+        if user_id in _syncing:
+            return False
+        _syncing.add(user_id)
+    threading.Thread(target=_backfill, args=(user_id,), name="saved-query-backfill", daemon=True).start()
+    return False
+
+
+# -------- Search --------
+
+def _match_expression(text: str) -> str | None:
+    # every term is a quoted prefix ("rev"* matches revenue); FTS operators in
+    # the input are treated as plain words
+    terms = re.findall(r"\w+", text.lower())
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def search_saved_queries(user_id: int, text: str, page: int = 1, page_size: int = 20,
+                         connection_name: str | None = None) -> dict:
+    """Ranked (bm25) prefix search over the user's saved questions, SQL and answers."""
+    expression = _match_expression(text)
+    if expression is None:
+        return {"total": 0, "page": page, "page_size": page_size, "results": []}
+    match = f'owner:"u{user_id}" AND ({expression})'
+    where = "saved_query_fts MATCH ?"
+    params: list = [match]
+    if connection_name:
+        where += " AND q.connection_name = ?"
+        params.append(connection_name)
+
+    conn = _conn()
+    # the join is only needed to filter on the connection
+    count_from = "saved_query_fts" + (" JOIN saved_query AS q ON q.id = saved_query_fts.rowid" if connection_name else "")
+    total = conn.execute(f"SELECT COUNT(*) FROM {count_from} WHERE {where}", params).fetchone()[0]
+    rows = conn.execute(
+        "SELECT q.query_key, q.question, q.sql_query, q.connection_name, q.saved_at, "
+        "snippet(saved_query_fts, 1, '[', ']', '…', 12), "
+        f"bm25(saved_query_fts, {', '.join(map(str, _WEIGHTS))}) AS rank "
+        "FROM saved_query_fts JOIN saved_query AS q ON q.id = saved_query_fts.rowid "
+        f"WHERE {where} ORDER BY rank LIMIT ? OFFSET ?",
+        params + [page_size, (page - 1) * page_size],
+    ).fetchall()
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "results": [
+            {
+                "query_key": key,
+                "question": question,
+                "sql_query": sql,
+                "connection_name": connection,
+                "saved_at": saved_at,
+                "highlight": snippet,
+                "score": round(-rank, 3),
+            }
+            for key, question, sql, connection, saved_at, snippet, rank in rows
+        ],
+    }
@@ -0,0 +1,374 @@
+# core/scheduler.py
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from core.cancellation import current_token
+
+# Global limits (overridable via env)
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "8"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "64"))
+SCHEDULER_MAX_PER_USER = int(os.getenv("SCHEDULER_MAX_PER_USER", "8"))
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", "30"))
+SCHEDULER_DEFAULT_TOKENS = int(os.getenv("SCHEDULER_DEFAULT_TOKENS", "2000"))
+# added to the counted prompt tokens: what a SQL answer typically costs
+SCHEDULER_COMPLETION_TOKENS = int(os.getenv("SCHEDULER_COMPLETION_TOKENS", "300"))
+
+# Starting per-minute budgets until the provider tells us the real ones
+DEFAULT_PROVIDER_LIMITS = {
+    "openai": (
+        float(os.getenv("OPENAI_RPM", "500")),
+        float(os.getenv("OPENAI_TPM", "200000")),
+    ),
+    "together": (
+        float(os.getenv("TOGETHER_RPM", "600")),
+        float(os.getenv("TOGETHER_TPM", "180000")),
+    ),
+}
+
+
+def _parse_weights(raw: str) -> Dict[int, float]:
+    """
+    SCHEDULER_USER_WEIGHTS="1:2,7:0.5" → {1: 2.0, 7: 0.5}
+    """
+    weights = {}
+    for part in (raw or "").split(","):
+        if ":" not in part:
+            continue
+        uid, w = part.split(":", 1)
+        try:
+            weights[int(uid)] = max(0.01, float(w))
+        except ValueError:
+            continue
+    return weights
+
+
+class SchedulerFull(HTTPException):
+    """429: the queue is full or the wait for a slot timed out."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(status_code=429, detail=message, headers={"Retry-After": str(int(retry_after))})
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Continuous-refill bucket for a per-minute budget (RPM or TPM).
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.capacity
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Align the bucket with what the provider reported in its headers."""
+        if limit and limit > 0:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.tokens = min(self.capacity, max(0.0, float(remaining)))
+            self.updated = now
+
+
+class ProviderLimits:
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def wait_time(self, estimated_tokens: int, now: float) -> float:
+        return max(
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+
+    def take(self, estimated_tokens: int, now: float):
+        self.requests.take(1, now)
+        self.tokens.take(estimated_tokens, now)
+
+
+class _Ticket:
+    __slots__ = ("user_id", "provider", "tokens", "start_tag", "finish_tag", "seq", "enqueued", "admitted")
+
+    def __init__(self, user_id, provider, tokens, start_tag, finish_tag, seq):
+        self.user_id = user_id
+        self.provider = provider
+        self.tokens = tokens
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.admitted = False
+
+
+class FairScheduler:
+    """
+    Admission control in front of LLM generation.
+
+    Each user has their own FIFO queue; across users, requests are admitted in
+    start-time fair queueing order (smallest virtual finish tag first, scaled by
+    the user's weight), so one user's burst cannot starve everyone else. A
+    request is only admitted while a worker slot is free and its provider's
+    RPM/TPM buckets have room.
+
+    Waiters block their thread (`slot` wraps only the LLM call inside the
+    threaded pipeline); cancelling the request's CancelToken dequeues them
+    at once. Callers pass the prompt's counted tokens plus
+    SCHEDULER_COMPLETION_TOKENS, so the TPM bucket sees the real size.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = SCHEDULER_MAX_CONCURRENCY,
+        max_queue: int = SCHEDULER_MAX_QUEUE,
+        max_per_user: int = SCHEDULER_MAX_PER_USER,
+        max_wait: float = SCHEDULER_MAX_WAIT,
+        weights: Optional[Dict[int, float]] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.max_wait = max_wait
+        self.weights = dict(weights or {})
+
+        self._cond = threading.Condition()
+        self._queues: Dict[int, deque] = {}
+        self._last_finish: Dict[int, float] = {}
+        self._providers: Dict[str, ProviderLimits] = {}
+        self._vtime = 0.0
+        self._seq = 0
+        self._active = 0
+        self._queued = 0
+
+        # metrics
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._avg_service = 1.0
+        self._avg_wait = 0.0
+
+    # -------- provider limits --------
+
+    def _limits(self, provider: str) -> ProviderLimits:
+        limits = self._providers.get(provider)
+        if limits is None:
+            rpm, tpm = DEFAULT_PROVIDER_LIMITS.get(provider, (500.0, 200000.0))
+            limits = self._providers[provider] = ProviderLimits(rpm, tpm)
+        return limits
+
+    def observe_response(self, provider: str, response) -> None:
+        """
+        httpx response hook: sync the provider's buckets with its rate-limit
+        headers (OpenAI / Together `x-ratelimit-*`) and back off on 429.
+        """
+        headers = response.headers
+
+        def _num(*names):
+            for name in names:
+                value = headers.get(name)
+                if value is None:
+                    continue
+                try:
+                    return float(value)
+                except ValueError:
+                    continue
+            return None
+
+        now = time.monotonic()
+        with self._cond:
+            limits = self._limits(provider)
+            limits.requests.sync(
+                _num("x-ratelimit-limit-requests", "x-ratelimit-limit"),
+                _num("x-ratelimit-remaining-requests", "x-ratelimit-remaining"),
+                now,
+            )
+            limits.tokens.sync(
+                _num("x-ratelimit-limit-tokens"),
+                _num("x-ratelimit-remaining-tokens"),
+                now,
+            )
+            if response.status_code == 429:
+                # Provider says we're over: drain until Retry-After has elapsed
+                retry_after = _num("retry-after") or 1.0
+                limits.requests.tokens = -retry_after * limits.requests.capacity / 60.0
+                limits.requests.updated = now
+            self._kick_locked(now)
+
+    # -------- queueing --------
+
+    def _weight(self, user_id: int) -> float:
+        return self.weights.get(user_id, 1.0)
+
+    def _retry_after(self) -> float:
+        backlog = self._queued + self._active
+        return max(1.0, math.ceil(backlog * self._avg_service / max(1, self.max_concurrency)))
+
+    def _enqueue(self, user_id: int, provider: str, tokens: int) -> _Ticket:
+        queue = self._queues.get(user_id)
+        if self._queued >= self.max_queue:
+            self._rejected += 1
+            raise SchedulerFull("Server is busy, please retry later", self._retry_after())
+        if queue is not None and len(queue) >= self.max_per_user:
+            self._rejected += 1
+            raise SchedulerFull("Too many pending questions for this user", self._retry_after())
+
+        start = max(self._vtime, self._last_finish.get(user_id, 0.0))
+        finish = start + 1.0 / self._weight(user_id)
+        self._last_finish[user_id] = finish
+        self._seq += 1
+        ticket = _Ticket(user_id, provider, tokens, start, finish, self._seq)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+        queue.append(ticket)
+        self._queued += 1
+        return ticket
+
+    def _remove(self, ticket: _Ticket):
+        queue = self._queues.get(ticket.user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not queue:
+            del self._queues[ticket.user_id]
+
+    def _dispatch(self, now: float) -> float:
+        """
+        Admit as many queue heads as slots and provider budgets allow.
+        Returns how long to sleep before a rate-limited head could go.
+        """
+        min_wait = self.max_wait
+        while self._active < self.max_concurrency and self._queued:
+            best, best_wait = None, None
+            for queue in self._queues.values():
+                head = queue[0]
+                wait = self._limits(head.provider).wait_time(head.tokens, now)
+                if wait > 0:
+                    best_wait = wait if best_wait is None else min(best_wait, wait)
+                    continue
+                if best is None or (head.finish_tag, head.seq) < (best.finish_tag, best.seq):
+                    best = head
+            if best is None:
+                return best_wait if best_wait is not None else min_wait
+
+            self._limits(best.provider).take(best.tokens, now)
+            self._remove(best)
+            self._vtime = max(self._vtime, best.start_tag)
+            best.admitted = True
+            self._active += 1
+            self._admitted += 1
+            self._avg_wait = 0.9 * self._avg_wait + 0.1 * (now - best.enqueued)
+        return min_wait
+
+    def _kick_locked(self, now: float) -> None:
+        """Dispatch on behalf of every waiter and wake them to see the result."""
+        self._dispatch(now)
+        self._cond.notify_all()
+
+    def _abandon_locked(self, ticket: _Ticket) -> None:
+        """A waiter gave up (timeout / cancel): leave the queue, or hand back a slot won meanwhile."""
+        if ticket.admitted:
+            self._active -= 1
+        else:
+            self._remove(ticket)
+        self._kick_locked(time.monotonic())
+
+    def acquire(self, user_id: int, provider: str, estimated_tokens: int = SCHEDULER_DEFAULT_TOKENS) -> _Ticket:
+        token = current_token()
+        unregister = token.on_cancel(self._notify) if token is not None else (lambda: None)
+        try:
+            with self._cond:
+                ticket = self._enqueue(user_id, provider, estimated_tokens)
+                deadline = ticket.enqueued + self.max_wait
+                while True:
+                    now = time.monotonic()
+                    sleep_for = self._dispatch(now)
+                    if ticket.admitted:
+                        self._cond.notify_all()
+                        return ticket
+                    if token is not None and token.cancelled:
+                        self._abandon_locked(ticket)
+                        token.check()
+                    if now >= deadline:
+                        self._timed_out += 1
+                        self._abandon_locked(ticket)
+                        raise SchedulerFull("Timed out waiting for a worker slot", self._retry_after())
+                    self._cond.wait(timeout=max(0.005, min(sleep_for, deadline - now)))
+        finally:
+            unregister()
+
+    def _notify(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self, ticket: _Ticket, service_time: float) -> None:
+        with self._cond:
+            self._active -= 1
+            self._avg_service = 0.9 * self._avg_service + 0.1 * service_time
+            self._kick_locked(time.monotonic())
+
+    @contextmanager
+    def slot(self, user_id: int, provider: str, estimated_tokens: int = SCHEDULER_DEFAULT_TOKENS):
+        ticket = self.acquire(user_id, provider, estimated_tokens)
+        started = time.monotonic()
+        try:
+            yield ticket
+        finally:
+            self.release(ticket, time.monotonic() - started)
+
+    # -------- metrics --------
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            providers = {}
+            for name, limits in self._providers.items():
+                limits.requests._refill(now)
+                limits.tokens._refill(now)
+                providers[name] = {
+                    "rpm_limit": limits.requests.capacity,
+                    "rpm_available": round(limits.requests.tokens, 2),
+                    "tpm_limit": limits.tokens.capacity,
+                    "tpm_available": round(limits.tokens.tokens, 2),
+                }
+            return {
+                "active": self._active,
+                "queued": self._queued,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "queue_depth_by_user": {uid: len(q) for uid, q in self._queues.items()},
+                "admitted_total": self._admitted,
+                "rejected_total": self._rejected,
+                "timed_out_total": self._timed_out,
+                "avg_wait_ms": round(self._avg_wait * 1000, 2),
+                "avg_service_ms": round(self._avg_service * 1000, 2),
+                "providers": providers,
+            }
+
+
+scheduler = FairScheduler(weights=_parse_weights(os.getenv("SCHEDULER_USER_WEIGHTS", "")))
@@ -0,0 +1,174 @@
+# core/schema_render.py
+
+from __future__ import annotations
+
+import os
+from contextlib import ExitStack
+from decimal import Decimal
+from typing import Iterable, Optional, TYPE_CHECKING
+
+from sqlalchemy import column, select, table
+
+if TYPE_CHECKING:
+    from langchain_community.utilities import SQLDatabase
+
+SCHEMA_MAX_VALUE_LEN = int(os.getenv("SCHEMA_MAX_VALUE_LEN", "24"))
+
+# First-prefix-wins map (longer prefixes listed first) from SQLAlchemy type names to terse prompt types
+_TYPE_ABBREVIATIONS = (
+    ("BIGINT", "int"),
+    ("SMALLINT", "int"),
+    ("TINYINT", "int"),
+    ("INTEGER", "int"),
+    ("INTERVAL", "interval"),
+    ("INT", "int"),
+    ("BIGSERIAL", "int"),
+    ("SMALLSERIAL", "int"),
+    ("SERIAL", "int"),
+    ("DOUBLE", "num"),
+    ("DECIMAL", "num"),
+    ("NUMERIC", "num"),
+    ("FLOAT", "num"),
+    ("REAL", "num"),
+    ("MONEY", "num"),
+    ("BOOL", "bool"),
+    ("TIMESTAMP", "ts"),
+    ("DATETIME", "ts"),
+    ("DATE", "date"),
+    ("TIME", "time"),
+    ("NVARCHAR", "str"),
+    ("VARCHAR", "str"),
+    ("CHAR", "str"),
+    ("TEXT", "str"),
+    ("CLOB", "str"),
+    ("STRING", "str"),
+    ("UUID", "uuid"),
+    ("JSON", "json"),
+    ("BLOB", "blob"),
+    ("BYTEA", "blob"),
+    ("BINARY", "blob"),
+)
+
+
+def abbreviate_type(col_type) -> str:
+    """Accepts a SQLAlchemy type or a catalog type string ("varchar(40)")."""
+    if isinstance(col_type, str):
+        name = col_type.upper()
+    else:
+        try:
+            name = str(col_type.compile()).upper()
+        except Exception:
+            name = type(col_type).__name__.upper()
+    for prefix, short in _TYPE_ABBREVIATIONS:
+        if name.startswith(prefix):
+            return short
+    return name.split("(", 1)[0].lower() or "?"
+
+
+def _truncate(value, max_len: int) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (Decimal, float)):
+        return f"{float(value):g}"
+    text = str(value).replace("\n", " ")
+    if len(text) > max_len:
+        text = text[: max_len - 1] + "…"
+    return repr(text) if isinstance(value, str) else text
+
+
+def _render_column(col: dict, pk: list[str], fks: dict[str, str]) -> str:
+    parts = [col["name"], abbreviate_type(col["type"])]
+    if col["name"] in pk:
+        parts.append("PK")
+    if col["name"] in fks:
+        parts[-1] += f"→{fks[col['name']]}"
+    return " ".join(parts)
+
+
+def _sample_rows(conn, name: str, info: dict, schema: Optional[str], limit: int) -> list:
+    t = table(name, *(column(c["name"]) for c in info["columns"]), schema=schema)
+    try:
+        return conn.execute(select(t).limit(limit)).fetchall()
+    except Exception:
+        conn.rollback()
+        return []
+
+
+def _wanted_tables(db: SQLDatabase, table_names: Optional[Iterable[str]]) -> tuple[list[str], dict]:
+    from core.reflection import catalog
+
+    usable = set(db.get_usable_table_names())
+    wanted = set(table_names) & usable if table_names else usable
+    tables = catalog(db._engine.url.render_as_string(hide_password=False), db._schema)
+    return [name for name in sorted(wanted) if name in tables], tables
+
+
+def render_compact_table_info(
+    db: SQLDatabase,
+    table_names: Optional[Iterable[str]] = None,
+    sample_rows: int = 0,
+    max_value_len: int = SCHEMA_MAX_VALUE_LEN,
+) -> str:
+    """
+    Terse alternative to SQLDatabase.get_table_info():
+
+        Order(Id int PK, CustomerId str→Customer.Id, Freight num)
+          e.g. (10248, 'VINET', 32.38)
+
+    One line per table, abbreviated types, FK arrows, and at most
+    `sample_rows` example rows with long values truncated. Built from the
+    bulk catalog, so no per-table reflection.
+    """
+    names, tables = _wanted_tables(db, table_names)
+    lines = []
+    with ExitStack() as stack:
+        conn = stack.enter_context(db._engine.connect()) if sample_rows > 0 else None
+        for name in names:
+            info = tables[name]
+            fks = {fk["column"]: f"{fk['referred_table']}.{fk['referred_column']}" for fk in info["fks"]}
+            cols = ", ".join(_render_column(c, info["pk"], fks) for c in info["columns"])
+            lines.append(f"{name}({cols})")
+
+            if conn is not None:
+                for row in _sample_rows(conn, name, info, db._schema, sample_rows):
+                    lines.append("  e.g. (" + ", ".join(_truncate(v, max_value_len) for v in row) + ")")
+
+    return "\n".join(lines)
+
+
+def render_ddl_table_info(
+    db: SQLDatabase,
+    table_names: Optional[Iterable[str]] = None,
+    sample_rows: int = 3,
+) -> str:
+    """
+    Same shape as SQLDatabase.get_table_info() (CREATE TABLE, then sample
+    rows in a comment), but built from the bulk catalog instead of
+    reflecting each table's MetaData.
+    """
+    quote = db._engine.dialect.identifier_preparer.quote
+    names, tables = _wanted_tables(db, table_names)
+    blocks = []
+    with ExitStack() as stack:
+        conn = stack.enter_context(db._engine.connect()) if sample_rows > 0 else None
+        for name in names:
+            info = tables[name]
+            body = [
+                f"\t{quote(c['name'])} {c['type'] or 'NULL'}{'' if c['nullable'] else ' NOT NULL'}"
+                for c in info["columns"]
+            ]
+            if info["pk"]:
+                body.append(f"\tPRIMARY KEY ({', '.join(quote(c) for c in info['pk'])})")
+            for fk in info["fks"]:
+                body.append(
+                    f"\tFOREIGN KEY({quote(fk['column'])}) "
+                    f"REFERENCES {quote(fk['referred_table'])} ({quote(fk['referred_column'])})"
+                )
+            block = f"\nCREATE TABLE {quote(name)} (\n" + ", \n".join(body) + "\n)\n"
+            if conn is not None:
+                rows = _sample_rows(conn, name, info, db._schema, sample_rows)
+                header = "\t".join(c["name"] for c in info["columns"])
+                values = "\n".join("\t".join(str(v)[:100] for v in row) for row in rows)
+                block += f"\n/*\n{sample_rows} rows from {name} table:\n{header}\n{values}\n*/"
+            blocks.append(block)
+    return "\n\n".join(blocks)
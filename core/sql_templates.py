@@ -0,0 +1,261 @@
+# core/sql_templates.py
+
+import os
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from core.cache import get_cache, connection_fingerprint, SQL_TTL
+
+TEMPLATE_MAX_PER_CONNECTION = int(os.getenv("TEMPLATE_MAX_PER_CONNECTION", "200"))
+
+# '...' string literals (with '' escapes) and bare numbers not glued to identifiers
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|(?<![\w.:$])-?\d+(?:\.\d+)?(?![\w.])")
+_NUMBER_RE = r"-?\d+(?:\.\d+)?"
+# the column a string literal is compared with: col = '…', "t"."col" LIKE '…', LOWER(col) = LOWER('…')
+_COMPARED_RE = re.compile(
+    r"([\w$]+)[\"`\]]?\s*\)?\s*(=|<>|!=|(?:NOT\s+)?I?LIKE)\s*(?:(?:LOWER|UPPER)\s*\(\s*)?$", re.I
+)
+_TEMPLATABLE = ("SELECT", "WITH")
+
+_lock = threading.Lock()
+_stats = defaultdict(int)
+
+
+def _bump(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def template_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    stats["hit_rate"] = round(stats.get("hits", 0) / max(1, lookups), 3)
+    return stats
+
+
+def _case_of(sql_value: str, question_value: str) -> str:
+    if sql_value == question_value:
+        return "asis"
+    if sql_value == question_value.upper():
+        return "upper"
+    if sql_value == question_value.lower():
+        return "lower"
+    if sql_value == question_value.title():
+        return "title"
+    return ""
+
+
+def _apply_case(value: str, case: str) -> str:
+    return {"upper": value.upper(), "lower": value.lower(), "title": value.title()}.get(case, value)
+
+
+def _to_number(value: str):
+    return float(value) if "." in value else int(value)
+
+
+def build_template(question: str, sql: str) -> dict | None:
+    """
+    Turn a (question, working SQL) pair into a reusable template: every SQL
+    literal whose value appears exactly once in the question becomes a slot,
+    and the SQL gets a :pN bind parameter in its place. Literals the question
+    doesn't mention stay inline. Returns None when nothing can be slotted.
+    """
+    if not sql.lstrip().upper().startswith(_TEMPLATABLE):
+        return None
+
+    original = " ".join(question.split())
+    normalized = original.lower()
+    slots: list[dict] = []      # question spans, in order of appearance
+    params: list[dict] = []     # one per bind parameter in the SQL
+    expected: dict = {}         # what each bind parameter held in the source SQL
+    pieces: list[str] = []
+    pos = 0
+
+    for m in _LITERAL_RE.finditer(sql):
+        token = m.group(0)
+        is_string = token.startswith("'")
+        value = token[1:-1].replace("''", "'") if is_string else token
+        # the question value may be wrapped in a LIKE pattern, e.g. '%ALFKI%'
+        core = value.strip("%_ ") if is_string else value
+        prefix, suffix = ("", "")
+        if is_string and core:
+            i = value.find(core)
+            prefix, suffix = value[:i], value[i + len(core):]
+
+        slot = None
+        found = list(re.finditer(rf"(?<!\w){re.escape(core.lower())}(?!\w)", normalized)) if core else []
+        if len(found) == 1:
+            span = found[0].span()
+            case = _case_of(core, original[span[0]:span[1]]) if is_string else "asis"
+            if case:
+                slot = next((i for i, s in enumerate(slots) if s["span"] == span), None)
+                if slot is None:
+                    slots.append({
+                        "span": span,
+                        "kind": "string" if is_string else "number",
+                        "words": len(core.split()),
+                    })
+                    slot = len(slots) - 1
+                expected[f"p{len(params)}"] = value if is_string else _to_number(value)
+                param = {"slot": slot, "case": case, "prefix": prefix, "suffix": suffix}
+                compared = _COMPARED_RE.search(sql, 0, m.start()) if is_string else None
+                if compared:
+                    param["column"] = compared.group(1).lower()
+                    param["like"] = "LIKE" in compared.group(2).upper()
+                params.append(param)
+
+        pieces.append(sql[pos:m.start()])
+        if slot is None:
+            # a constant literal: escape ':' so text() doesn't read a bind param in it
+            pieces.append(token.replace(":", r"\:"))
+        else:
+            pieces.append(f":p{len(params) - 1}")
+        pos = m.end()
+    pieces.append(sql[pos:])
+
+    if not slots:
+        return None
+
+    # question pattern: fixed text escaped, slots as capture groups. A string
+    # slot matches the same number of words as the original value, so
+    # "customer alfki and bonap" can't bind to a one-value template.
+    pattern, last = [], 0
+    for i in sorted(range(len(slots)), key=lambda i: slots[i]["span"][0]):
+        start, end = slots[i]["span"]
+        if slots[i]["kind"] == "number":
+            group = _NUMBER_RE
+        else:
+            group = r"[^\s']+" + r"(?: [^\s']+)" * (slots[i]["words"] - 1)
+        pattern.append(re.escape(normalized[last:start]))
+        pattern.append(f"(?P<s{i}>{group})")
+        last = end
+    pattern.append(re.escape(normalized[last:]))
+
+    template = {
+        "pattern": "".join(pattern),
+        "sql": "".join(pieces),
+        "slots": [s["kind"] for s in slots],
+        "params": params,
+    }
+    # round-trip check: the source question must bind back to the source values
+    if bind_template(template, question) != expected:
+        return None
+    return template
+
+
+@lru_cache(maxsize=2048)
+def _compiled(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def bind_template(template: dict, question: str) -> dict | None:
+    """Bind parameters for `question`, or None if it doesn't fit the template."""
+    original = " ".join(question.split())
+    m = _compiled(template["pattern"]).fullmatch(original.lower())
+    if m is None:
+        return None
+
+    values = []
+    for i, kind in enumerate(template["slots"]):
+        start, end = m.span(f"s{i}")
+        values.append(original[start:end])
+
+    bound = {}
+    for n, p in enumerate(template["params"]):
+        raw = values[p["slot"]]
+        if template["slots"][p["slot"]] == "number":
+            bound[f"p{n}"] = _to_number(raw)
+        else:
+            bound[f"p{n}"] = p["prefix"] + _apply_case(raw, p["case"]) + p["suffix"]
+    return bound
+
+
+def render_sql(template: dict, params: dict) -> str:
+    """Literal SQL for display and saving; execution always uses the bound form."""
+    def _literal(value):
+        if isinstance(value, (int, float)):
+            return str(value)
+        return "'" + str(value).replace("'", "''") + "'"
+
+    sql = re.sub(r"(?<![:\w\\]):(p\d+)\b", lambda m: _literal(params[m.group(1)]), template["sql"])
+    return sql.replace(r"\:", ":")
+
+
+# -------- Per-connection template store (shared cache) --------
+
+def _namespace(db_url: str) -> str:
+    return f"sqltpl:{connection_fingerprint(db_url)}"
+
+
+def _key(model_name: str) -> str:
+    return f"templates|{model_name}"
+
+
+def _plausible(db_url: str, template: dict, params: dict) -> bool:
+    """
+    A string slot matches any word, so "customers in total" fits a template
+    learned from "customers in germany". Reject filler words, and values the
+    value index knows the compared column doesn't hold.
+    """
+    from core.value_index import ensure_value_index, STOPWORDS
+
+    index = None
+    for n, p in enumerate(template["params"]):
+        if template["slots"][p["slot"]] != "string":
+            continue
+        value = params[f"p{n}"]
+        value = value[len(p["prefix"]):len(value) - len(p["suffix"])].lower()
+        if value in STOPWORDS:
+            return False
+        column = p.get("column")
+        if column is None:
+            continue
+        if index is None:
+            index = ensure_value_index(db_url) or False
+        if not index:
+            continue
+        indexed = [vals for (_, c), vals in index.columns.items() if c.lower() == column]
+        if not indexed:
+            continue  # not indexed (too many distinct values): nothing to check against
+        known = [v.lower() for vals in indexed for v in vals]
+        if not any(value in v if p.get("like") else value == v for v in known):
+            return False
+    return True
+
+
+def match_template(db_url: str, model_name: str, question: str) -> tuple[str, dict, str] | None:
+    """
+    Look for a stored template this question fits. Returns
+    (bound SQL text, params, display SQL) or None.
+    """
+    templates = get_cache().get(_namespace(db_url), _key(model_name)) or []
+    for template in templates:
+        params = bind_template(template, question)
+        if params is None:
+            continue
+        if not _plausible(db_url, template, params):
+            _bump("implausible_values")
+            continue
+        _bump("hits")
+        return template["sql"], params, render_sql(template, params)
+    _bump("misses")
+    return None
+
+
+def remember_template(db_url: str, model_name: str, question: str, sql: str) -> bool:
+    """Store a template for SQL that has executed successfully."""
+    template = build_template(question, sql)
+    if template is None:
+        _bump("not_templatable")
+        return False
+
+    cache = get_cache()
+    namespace, key = _namespace(db_url), _key(model_name)
+    templates = [t for t in cache.get(namespace, key) or [] if t["pattern"] != template["pattern"]]
+    templates.insert(0, template)
+    cache.set(namespace, key, templates[:TEMPLATE_MAX_PER_CONNECTION], SQL_TTL)
+    _bump("registered")
+    return True
@@ -1,25 +1,28 @@
 # core/sql_utils.py
 
-from sqlalchemy import create_engine, text
+import os
 
-def execute_sql_and_format_naturally(db_url: str, sql_query: str) -> str:
-    try:
-        engine = create_engine(db_url)
-        with engine.connect() as conn:
-            result = conn.execute(text(sql_query))
-            rows = result.fetchall()
-
-            if not rows:
-                return "No data found."
+from sqlalchemy import text
 
-            # Format as natural language
-            columns = result.keys()
-            response_lines = []
-            for row in rows:
-                row_str = ", ".join(f"{col}: {val}" for col, val in zip(columns, row))
-                response_lines.append(row_str)
+from core.db import get_engine
+from core.result_summary import summarize_rows
 
-            return "\n".join(response_lines)
+SQL_FETCH_CHUNK = int(os.getenv("SQL_FETCH_CHUNK", "10000"))
 
+def execute_sql_and_format_naturally(db_url: str, sql_query: str) -> str:
+    """
+    Run the query and describe its result in a few bounded lines. Rows are
+    streamed in chunks into the summarizer, never formatted one by one.
+    """
+    try:
+        with get_engine(db_url).connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(sql_query))
+            columns = list(result.keys())
+            chunks = iter(lambda: result.fetchmany(SQL_FETCH_CHUNK), [])
+            summarizer = summarize_rows(columns, chunks)
     except Exception as e:
         raise Exception(f"Error executing SQL: {e}")
+
+    if not summarizer.rows:
+        return "No data found."
+    return summarizer.describe()
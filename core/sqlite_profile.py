@@ -0,0 +1,61 @@
+# core/sqlite_profile.py
+
+import os
+import urllib.parse
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", str(min(8, os.cpu_count() or 4))))  # pooled connections per file
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(1 << 30)))  # SQLite caps this at its compile-time max
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "65536"))  # page cache per connection
+
+
+def sqlite_path(connection_name: str) -> str:
+    """Connection files live in <repo>/data/."""
+    return os.path.normpath(os.path.join(BASE_DIR, "data", connection_name))
+
+
+def sqlite_url(path: str, writable: bool = False, immutable: bool = False) -> str:
+    """
+    Analytics connections open the file read-only (`mode=ro`); `immutable=1`
+    also skips locking and change detection, so only use it for files that
+    never change while served. Writable connections get a plain URL.
+    """
+    if writable:
+        return f"sqlite:///{path}"
+    query = "mode=ro&immutable=1&uri=true" if immutable else "mode=ro&uri=true"
+    return f"sqlite:///file:{urllib.parse.quote(path)}?{query}"
+
+
+def is_read_only_sqlite(db_url: str) -> bool:
+    return db_url.startswith("sqlite") and "mode=ro" in db_url.partition("?")[2]
+
+
+def _read_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_BYTES}")  # reads are page-cache hits, not read() calls
+        cur.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KIB}")
+        cur.execute("PRAGMA query_only = ON")  # generated SQL can't write, even through ATTACH
+    finally:
+        cur.close()
+
+
+def create_reader_engine(db_url: str):
+    """
+    One engine per file, shared by every user of it: a fixed pool of
+    read-only connections that threads use concurrently (sqlite3 releases
+    the GIL while a statement steps).
+    """
+    engine = create_engine(
+        db_url,
+        poolclass=QueuePool,
+        pool_size=SQLITE_READERS,
+        max_overflow=0,
+        pool_timeout=30,
+        connect_args={"check_same_thread": False},
+    )
+    event.listen(engine, "connect", _read_pragmas)
+    return engine
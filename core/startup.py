@@ -0,0 +1,58 @@
+# core/startup.py
+
+import importlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
+
+# Imported in the background once the server is up, so the first /answer
+# doesn't pay for them. Nothing on the import path of app.py needs them.
+HEAVY_MODULES = (
+    "pandas",
+    "langchain_community.utilities",
+    "langchain.chains.sql_database.prompt",
+    "langchain_openai",
+    "boto3",
+)
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """
+    Load the repo-root .env exactly once per process.
+    """
+    load_dotenv(dotenv_path=ENV_PATH)
+
+
+def _preload():
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+    try:
+        from core.s3_utils import get_s3_client
+        get_s3_client()
+    except Exception:
+        pass
+
+
+def preload_in_background() -> threading.Thread | None:
+    """
+    Warm heavy imports and clients on a daemon thread after startup.
+    Disable with PRELOAD_ON_STARTUP=0 (e.g. for short-lived CLI use).
+    """
+    if os.getenv("PRELOAD_ON_STARTUP", "1") == "0":
+        return None
+    thread = threading.Thread(target=_preload, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+# importing this module is enough to have .env applied
+load_env()
@@ -0,0 +1,249 @@
+# core/usage_ledger.py
+
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, select, delete, func
+
+from core.cancellation import RequestCancelled
+from core.db import engine
+from core.prompt_metrics import count_tokens
+from core.write_behind import WriteBehindQueue
+from db.model import UsageEvent, UsageHourly
+
+USAGE_ROLLUP_INTERVAL = float(os.getenv("USAGE_ROLLUP_INTERVAL", "300"))
+
+# USD per 1M (prompt, completion) tokens; override/extend with
+# USAGE_PRICES="gpt-4o=2.5:10,my-model=0.2:0.2"
+_DEFAULT_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": (0.18, 0.18),
+    "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo": (0.88, 0.88),
+}
+
+_GROUP_BY = ("hour", "user_id", "connection_name", "provider", "model")
+
+
+def _parse_prices(raw: str) -> dict[str, tuple[float, float]]:
+    prices = dict(_DEFAULT_PRICES)
+    for part in (raw or "").split(","):
+        model, _, rates = part.strip().rpartition("=")
+        try:
+            prompt, completion = (float(x) for x in rates.split(":"))
+        except ValueError:
+            continue
+        if model:
+            prices[model] = (prompt, completion)
+    return prices
+
+
+PRICES = _parse_prices(os.getenv("USAGE_PRICES", ""))
+
+
+def _flush(batch: list[dict]) -> None:
+    with Session(engine) as session:
+        session.add_all(UsageEvent(**r) for r in batch)
+        session.commit()
+
+
+_queue = WriteBehindQueue("usage_ledger", _flush)
+
+
+def flush_usage() -> None:
+    _queue.flush()
+
+
+# -------- Recording (LLM path) --------
+
+# HTTP responses seen by the provider client during the current call
+_responses: contextvars.ContextVar[list | None] = contextvars.ContextVar("usage_responses", default=None)
+
+
+def note_response(response) -> None:
+    """httpx response hook: counts attempts, so client-side retries are visible."""
+    counter = _responses.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class MeteredCall:
+    __slots__ = ("message",)
+
+    def __init__(self):
+        self.message = None
+
+
+@contextmanager
+def metered_call(user_id: int, connection_name: str | None, provider: str, model: str, purpose: str,
+                 prompt_tokens: int):
+    """
+    Wrap one provider call; set `.message` to the returned AIMessage. Token
+    counts come from its usage_metadata, or are counted locally when the
+    provider sent none. Enqueued on exit, failed and cancelled calls included.
+    """
+    call, counter = MeteredCall(), [0]
+    reset = _responses.set(counter)
+    started = time.perf_counter()
+    status = "error"
+    try:
+        yield call
+        status = "ok"
+    except RequestCancelled:
+        status = "cancelled"
+        raise
+    finally:
+        _responses.reset(reset)
+        usage = getattr(call.message, "usage_metadata", None) or {}
+        if usage:
+            prompt_tokens, completion_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        else:
+            content = getattr(call.message, "content", None)
+            completion_tokens = count_tokens(content, model) if isinstance(content, str) and content else 0
+        _queue.put({
+            "user_id": user_id,
+            "connection_name": connection_name,
+            "provider": provider,
+            "model": model,
+            "purpose": purpose,
+            "status": status,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated": not usage,
+            "attempts": max(1, counter[0]),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "created_at": datetime.now(timezone.utc),
+        })
+
+
+# -------- Rollups --------
+
+def _hour(ts: datetime) -> datetime:
+    # SQLite hands timestamps back naive; they were written as UTC
+    return ts.replace(minute=0, second=0, microsecond=0, tzinfo=timezone.utc)
+
+
+def rollup() -> int:
+    """
+    Rebuild the hourly aggregates from the last rolled-up hour onward (one
+    hour of overlap for late flushes); idempotent. Returns rows written.
+    """
+    with Session(engine) as session:
+        latest = session.exec(select(func.max(UsageHourly.hour))).one()
+        since = _hour(latest) - timedelta(hours=1) if latest else None
+        stmt = select(
+            UsageEvent.created_at, UsageEvent.user_id, UsageEvent.connection_name, UsageEvent.provider,
+            UsageEvent.model, UsageEvent.status, UsageEvent.attempts, UsageEvent.prompt_tokens,
+            UsageEvent.completion_tokens, UsageEvent.estimated, UsageEvent.latency_ms,
+        )
+        if since is not None:
+            stmt = stmt.where(UsageEvent.created_at >= since)
+
+        buckets = defaultdict(lambda: defaultdict(float))
+        for created_at, user_id, connection, provider, model, status, attempts, prompt, completion, \
+                estimated, latency in session.exec(stmt):
+            b = buckets[(_hour(created_at), user_id, connection or "", provider, model)]
+            b["calls"] += 1
+            b["errors"] += status == "error"
+            b["retries"] += max(0, attempts - 1)
+            b["prompt_tokens"] += prompt
+            b["completion_tokens"] += completion
+            b["estimated_calls"] += bool(estimated)
+            b["latency_ms_total"] += latency
+
+        if since is not None:
+            session.exec(delete(UsageHourly).where(UsageHourly.hour >= since))
+        for (hour, user_id, connection, provider, model), b in buckets.items():
+            session.add(UsageHourly(
+                hour=hour, user_id=user_id, connection_name=connection, provider=provider, model=model,
+                latency_ms_total=b.pop("latency_ms_total"), **{k: int(v) for k, v in b.items()},
+            ))
+        session.commit()
+    return len(buckets)
+
+
+def _rollup_loop() -> None:
+    while True:
+        time.sleep(USAGE_ROLLUP_INTERVAL)
+        try:
+            rollup()
+        except Exception:
+            pass  # retried next interval; the events are still there
+
+
+_roller: threading.Thread | None = None
+
+
+def start_usage_rollups() -> None:
+    global _roller
+    if _roller is None:
+        _roller = threading.Thread(target=_rollup_loop, name="usage-rollup", daemon=True)
+        _roller.start()
+
+
+# -------- Reading --------
+
+def _cost(model: str, prompt_tokens: int, completion_tokens: int) -> float | None:
+    price = PRICES.get(model)
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def usage_report(user_id: int | None, since_hours: float = 24, group_by: list[str] | None = None) -> dict:
+    """
+    Hourly rollups summed over `group_by` dimensions, heaviest first.
+    `user_id=None` covers every user (admins).
+    """
+    group_by = [g for g in (group_by or ["connection_name", "model"]) if g in _GROUP_BY]
+    since = _hour(datetime.now(timezone.utc) - timedelta(hours=since_hours))
+    columns = [getattr(UsageHourly, g) for g in group_by]
+    # cost needs the model even when it is not a grouping dimension
+    inner = columns if "model" in group_by else columns + [UsageHourly.model]
+    stmt = select(
+        *inner,
+        func.sum(UsageHourly.calls), func.sum(UsageHourly.errors), func.sum(UsageHourly.retries),
+        func.sum(UsageHourly.prompt_tokens), func.sum(UsageHourly.completion_tokens),
+        func.sum(UsageHourly.estimated_calls), func.sum(UsageHourly.latency_ms_total),
+    ).where(UsageHourly.hour >= since).group_by(*inner)
+    if user_id is not None:
+        stmt = stmt.where(UsageHourly.user_id == user_id)
+
+    rows = {}
+    with Session(engine) as session:
+        rolled_through = session.exec(select(func.max(UsageHourly.hour))).one()
+        for row in session.exec(stmt):
+            key = tuple(row[:len(group_by)])
+            model = row[len(inner) - 1] if "model" not in group_by else row[group_by.index("model")]
+            calls, errors, retries, prompt, completion, estimated, latency = row[len(inner):]
+            r = rows.setdefault(key, {
+                **dict(zip(group_by, key)), "calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "estimated_calls": 0, "latency_ms_total": 0.0, "cost_usd": 0.0,
+            })
+            for name, value in (("calls", calls), ("errors", errors), ("retries", retries),
+                                ("prompt_tokens", prompt), ("completion_tokens", completion),
+                                ("estimated_calls", estimated), ("latency_ms_total", latency)):
+                r[name] += value or 0
+            cost = _cost(model, prompt or 0, completion or 0)
+            r["cost_usd"] = None if cost is None or r["cost_usd"] is None else round(r["cost_usd"] + cost, 4)
+
+    out = []
+    for r in rows.values():
+        n = r["calls"]
+        r["total_tokens"] = r["prompt_tokens"] + r["completion_tokens"]
+        r["avg_prompt_tokens"] = round(r["prompt_tokens"] / n, 1) if n else None
+        r["avg_latency_ms"] = round(r.pop("latency_ms_total") / n, 1) if n else None
+        out.append(r)
+    out.sort(key=lambda r: r["total_tokens"], reverse=True)
+    return {
+        "since": since,
+        "rolled_up_through": rolled_through,
+        "group_by": group_by,
+        "rows": out,
+        "ledger": _queue.stats(),
+    }
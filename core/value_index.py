@@ -0,0 +1,257 @@
+# core/value_index.py
+
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.bulkhead import bulkhead_for, BulkheadRejected
+from core.cache import get_cache, connection_fingerprint
+
+VALUE_INDEX_MAX_DISTINCT = int(os.getenv("VALUE_INDEX_MAX_DISTINCT", "200"))
+VALUE_INDEX_MAX_COLUMNS = int(os.getenv("VALUE_INDEX_MAX_COLUMNS", "300"))
+VALUE_INDEX_MAX_VALUE_LEN = int(os.getenv("VALUE_INDEX_MAX_VALUE_LEN", "64"))
+VALUE_INDEX_REFRESH = float(os.getenv("VALUE_INDEX_REFRESH", "900"))  # seconds between refresh passes
+VALUE_INDEX_REFRESH_COLUMNS = int(os.getenv("VALUE_INDEX_REFRESH_COLUMNS", "20"))  # columns per pass
+VALUE_HINTS_MAX = int(os.getenv("VALUE_HINTS_MAX", "8"))
+VALUE_HINT_MIN_SCORE = float(os.getenv("VALUE_HINT_MIN_SCORE", "0.55"))
+VALUES_TTL = int(os.getenv("VALUES_TTL", "86400"))
+
+# filler words never treated as literals (also used to vet template slot values)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it many me of on or show list the to what which who "
+    "with where all any each every give get find number count total".split()
+)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="value-index")
+_lock = threading.Lock()
+_indexes: dict[str, "ValueIndex"] = {}
+_building: set[str] = set()
+
+
+def _indexable(values) -> tuple[str, ...]:
+    return tuple(sorted({v for v in values if v and len(v) <= VALUE_INDEX_MAX_VALUE_LEN}))
+
+
+def _trigrams(text: str) -> frozenset:
+    padded = f"  {text.lower()} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ValueIndex:
+    """
+    Distinct values of low-cardinality text columns with a trigram inverted
+    index, so a question phrase like "beverage" finds 'Beverages' without
+    scanning every value.
+    """
+
+    def __init__(self):
+        self.columns: dict[tuple[str, str], tuple[str, ...]] = {}
+        self.pending: list[tuple[str, str]] = []  # columns still to (re)scan
+        self.refreshed_at = 0.0
+        # (values, trigram sets, postings), swapped in one assignment so
+        # lookups never see a half-rebuilt index
+        self._data: tuple[list, list, dict] = ([], [], {})
+
+    def set_column(self, table: str, column: str, values) -> bool:
+        values = _indexable(values)
+        if self.columns.get((table, column)) == values:
+            return False
+        self.columns[(table, column)] = values
+        return True
+
+    def drop_column(self, table: str, column: str) -> None:
+        self.columns.pop((table, column), None)
+
+    def rebuild(self) -> None:
+        # postings are cheap to rebuild (at most columns x max_distinct values)
+        values, grams, postings = [], [], defaultdict(list)
+        for (table, column), vals in self.columns.items():
+            for v in vals:
+                g = _trigrams(v)
+                for t in g:
+                    postings[t].append(len(values))
+                values.append((table, column, v))
+                grams.append(g)
+        self._data = (values, grams, dict(postings))
+
+    @staticmethod
+    def _phrases(question: str) -> list[str]:
+        words = re.findall(r"[\w'&.-]+", question.lower())
+        out = []
+        for n in (1, 2, 3):
+            for i in range(len(words) - n + 1):
+                gram = words[i:i + n]
+                if n == 1 and (gram[0] in STOPWORDS or len(gram[0]) < 3):
+                    continue
+                if gram[0] in STOPWORDS or gram[-1] in STOPWORDS:
+                    continue
+                out.append(" ".join(gram))
+        return out
+
+    def lookup(self, question: str, limit: int = VALUE_HINTS_MAX, min_score: float = VALUE_HINT_MIN_SCORE) -> list[dict]:
+        values, grams, postings = self._data
+        best: dict[int, float] = {}
+        for phrase in self._phrases(question):
+            q = _trigrams(phrase)
+            shared = defaultdict(int)
+            for t in q:
+                for vid in postings.get(t, ()):
+                    shared[vid] += 1
+            for vid, n in shared.items():
+                score = n / (len(q) + len(grams[vid]) - n)  # Jaccard
+                if score >= min_score and score > best.get(vid, 0):
+                    best[vid] = score
+        ranked = sorted(best.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return [
+            {"table": values[vid][0], "column": values[vid][1], "value": values[vid][2], "score": round(score, 3)}
+            for vid, score in ranked
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "columns": len(self.columns),
+            "values": len(self._data[0]),
+            "pending_columns": len(self.pending),
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+# -------- Building / refreshing (background) --------
+
+def _text_columns(db_url: str) -> list[tuple[str, str]]:
+    from core.reflection import catalog
+    from core.schema_render import abbreviate_type
+
+    out = []
+    for table, info in catalog(db_url).items():
+        if info["kind"] != "table":
+            continue
+        for col in info["columns"]:
+            if abbreviate_type(col["type"]) == "str":
+                out.append((table, col["name"]))
+    return out[:VALUE_INDEX_MAX_COLUMNS]
+
+
+def _scan_column(engine, db_url: str, table: str, column: str) -> list[str] | None:
+    """
+    Distinct values, or None when the column has too many to be useful.
+    Runs in the database's bulkhead, like user queries.
+    """
+    from sqlalchemy import column as sql_column, table as sql_table, select
+
+    c = sql_table(table, sql_column(column)).c[column]  # no reflection round trip
+    stmt = select(c).where(c.is_not(None)).distinct().limit(VALUE_INDEX_MAX_DISTINCT + 1)
+    with bulkhead_for(db_url).slot(), engine.connect() as conn:
+        values = [str(v) for v in conn.execute(stmt).scalars()]
+    return None if len(values) > VALUE_INDEX_MAX_DISTINCT else values
+
+
+def _refresh(db_url: str, full: bool) -> None:
+    from core.db import get_engine
+
+    try:
+        engine = get_engine(db_url, count_hit=False)
+        with _lock:
+            index = _indexes.get(db_url) or ValueIndex()
+        # lookups (template vetting) iterate index.columns on request threads:
+        # edit a copy and swap it in with one assignment, like _data
+        columns = dict(index.columns)
+        if full or not index.pending:
+            # start a new pass over every text column (picks up new columns too)
+            index.pending = _text_columns(db_url)
+            current = set(index.pending)
+            columns = {k: v for k, v in columns.items() if k in current}
+
+        batch = index.pending if full else index.pending[:VALUE_INDEX_REFRESH_COLUMNS]
+        changed, scanned = len(columns) != len(index.columns), 0
+        for table, column in batch:
+            try:
+                values = _scan_column(engine, db_url, table, column)
+            except BulkheadRejected:
+                break  # the database is busy with user queries; resume on the next refresh
+            except Exception:
+                scanned += 1
+                continue
+            scanned += 1
+            if values is None:
+                changed |= columns.pop((table, column), None) is not None
+            else:
+                values = _indexable(values)
+                changed |= columns.get((table, column)) != values
+                columns[(table, column)] = values
+        index.pending = index.pending[scanned:]
+        index.columns = columns
+        if changed or not index._data[0]:
+            index.rebuild()
+        index.refreshed_at = time.time()
+
+        with _lock:
+            _indexes[db_url] = index
+        # share the scanned values so other workers skip the scan
+        get_cache().set(f"values:{connection_fingerprint(db_url)}", "columns", index.columns, VALUES_TTL)
+    finally:
+        with _lock:
+            _building.discard(db_url)
+
+
+def _load_shared(db_url: str) -> "ValueIndex | None":
+    columns = get_cache().get(f"values:{connection_fingerprint(db_url)}", "columns")
+    if not columns:
+        return None
+    index = ValueIndex()
+    index.columns = dict(columns)
+    index.rebuild()
+    index.refreshed_at = time.time()
+    return index
+
+
+def ensure_value_index(db_url: str) -> "ValueIndex | None":
+    """
+    The connection's index if ready. Never blocks on a scan: a missing index
+    is built, and a stale one refreshed a few columns at a time, in the
+    background.
+    """
+    with _lock:
+        index = _indexes.get(db_url)
+        busy = db_url in _building
+    if index is None and not busy:
+        index = _load_shared(db_url)
+        if index is not None:
+            with _lock:
+                _indexes[db_url] = index
+    stale = index is None or time.time() - index.refreshed_at > VALUE_INDEX_REFRESH or index.pending
+    if stale and not busy:
+        with _lock:
+            if db_url in _building:
+                return index
+            _building.add(db_url)
+        _executor.submit(_refresh, db_url, index is None)
+    return index
+
+
+def value_hints(db_url: str, question: str) -> str:
+    """Prompt lines listing stored values that look like literals in the question."""
+    index = ensure_value_index(db_url)
+    if index is None:
+        return ""
+    matches = index.lookup(question)
+    if not matches:
+        return ""
+    lines = [f"{m['table']}.{m['column']} = '{m['value'].replace(chr(39), chr(39) * 2)}'" for m in matches]
+    return "Stored values that may match the question (use these exact literals):\n" + "\n".join(lines)
+
+
+def value_index_stats() -> dict:
+    with _lock:
+        return {
+            "building": len(_building),
+            "connections": {connection_fingerprint(url): idx.stats() for url, idx in _indexes.items()},
+        }
+
+
+def forget_value_index(db_url: str) -> None:
+    with _lock:
+        _indexes.pop(db_url, None)
@@ -0,0 +1,135 @@
+# core/warmup.py
+
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+WARMUP_MAX_CONCURRENT = int(os.getenv("WARMUP_MAX_CONCURRENT", "2"))
+WARMUP_MAX_PENDING = int(os.getenv("WARMUP_MAX_PENDING", "32"))
+WARMUP_COOLDOWN = float(os.getenv("WARMUP_COOLDOWN", "300"))
+
+_executor = ThreadPoolExecutor(max_workers=WARMUP_MAX_CONCURRENT, thread_name_prefix="warmup")
+_lock = threading.Lock()
+_last_warmed: dict[int, float] = {}
+_pending = 0
+_counters = defaultdict(int)
+_hits = defaultdict(lambda: {"warm": 0, "cold": 0})
+
+
+def _bump(name: str, by: int = 1) -> None:
+    with _lock:
+        _counters[name] += by
+
+
+# -------- warm/cold accounting --------
+
+def record_hit(kind: str, warm: bool) -> None:
+    """
+    Called on the request path: was this resource already prepared
+    (engine pool, schema snapshot, decrypted key, model list)?
+    """
+    with _lock:
+        _hits[kind]["warm" if warm else "cold"] += 1
+
+
+def warmup_metrics() -> dict:
+    with _lock:
+        hit_rates = {
+            kind: {
+                **counts,
+                "warm_rate": round(counts["warm"] / max(1, counts["warm"] + counts["cold"]), 3),
+            }
+            for kind, counts in _hits.items()
+        }
+        return {
+            "max_concurrent": WARMUP_MAX_CONCURRENT,
+            "pending": _pending,
+            **dict(_counters),
+            "hit_rates": hit_rates,
+        }
+
+
+# -------- warm-up tasks --------
+
+def _warm_connection(user_id: int, connection_name: str, session) -> None:
+    from db.main import get_connection_string
+    from core.db import get_engine
+    from core.llm import _open_sql_database, _table_info
+    from core.value_index import ensure_value_index
+
+    db_url = get_connection_string(user_id, connection_name, session)
+    with get_engine(db_url, count_hit=False).connect():
+        pass  # opens the pool's first connection
+    db = _open_sql_database(db_url, count_hit=False)
+    _table_info(db, compact_schema=False, sample_rows=3, count_hit=False)
+    ensure_value_index(db_url)  # queued on its own background worker
+
+
+def _warm_providers(user_id: int, session) -> None:
+    from sqlmodel import select
+    from db.model import APIKey
+    from core.llm import _resolve_api_key, fetch_provider_models
+
+    providers = session.exec(select(APIKey.provider).where(APIKey.user_id == user_id)).all()
+    for provider in providers:
+        api_key = _resolve_api_key(provider, session, user_id, count_hit=False)
+        try:
+            fetch_provider_models(provider, api_key, count_hit=False)
+        except Exception:
+            _bump("model_prefetch_failed")
+
+
+def _warm_user(user_id: int, connection_names: list[str] | None) -> None:
+    global _pending
+    from sqlmodel import select
+    from core.db import get_session
+    from db.model import Connection
+
+    started = time.perf_counter()
+    session = next(get_session())
+    try:
+        if connection_names is None:
+            connection_names = session.exec(
+                select(Connection.connection_name).where(Connection.user_id == user_id)
+            ).all()
+        try:
+            _warm_providers(user_id, session)
+        except Exception:
+            _bump("provider_warmups_failed")
+        for name in connection_names:
+            try:
+                _warm_connection(user_id, name, session)
+                _bump("connections_warmed")
+            except Exception:
+                _bump("connection_warmups_failed")
+    finally:
+        session.close()
+        with _lock:
+            _pending -= 1
+            _counters["warmups_completed"] += 1
+            _counters["last_warmup_ms"] = int((time.perf_counter() - started) * 1000)
+
+
+def schedule_user_warmup(user_id: int, connection_names: list[str] | None = None) -> bool:
+    """
+    Queue a low-priority warm-up of a user's connections and provider keys.
+    Skipped when the user was warmed recently or the warm-up queue is full,
+    so it never competes with real requests for long.
+    """
+    global _pending
+    now = time.monotonic()
+    with _lock:
+        if now - _last_warmed.get(user_id, -WARMUP_COOLDOWN) < WARMUP_COOLDOWN:
+            _counters["warmups_skipped_recent"] += 1
+            return False
+        if _pending >= WARMUP_MAX_PENDING:
+            _counters["warmups_skipped_busy"] += 1
+            return False
+        _last_warmed[user_id] = now
+        _pending += 1
+        _counters["warmups_scheduled"] += 1
+
+    _executor.submit(_warm_user, user_id, connection_names)
+    return True
@@ -0,0 +1,123 @@
+# core/write_behind.py
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable
+
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0"))
+
+
+class WriteBehindQueue:
+    """
+    Non-blocking, batched writes off the request path. `put` only appends to
+    a bounded in-memory queue (dropping, and counting, when it is full); a
+    daemon thread hands batches of up to `max_batch` items to `flush_fn`
+    at least every `flush_interval` seconds. Pending items are flushed at
+    interpreter exit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[list[Any]], None],
+        max_batch: int = WRITE_BEHIND_MAX_BATCH,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+    ):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()  # cuts the worker's batching wait short for flush()
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stats = defaultdict(int)
+        self._stats_lock = threading.Lock()  # put() runs on request threads
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def put(self, item: Any) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+        self._count(enqueued=1)
+        return True
+
+    def _count(self, **deltas) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def _drain(self, first=None) -> list:
+        batch = [] if first is None else [first]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> None:
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            self.flush_fn(batch)
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["failed"] += len(batch)
+                self._stats["last_error"] = str(e)[:200]
+        else:
+            with self._stats_lock:
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        finally:
+            for _ in batch:
+                self._queue.task_done()  # flush() joins on these
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # let a batch build up instead of writing one row per request
+            if self._queue.qsize() < self.max_batch:
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._flush_lock:
+                self._write(self._drain(first))
+
+    def flush(self) -> None:
+        """
+        Write everything queued so far (tests, shutdown), including a batch
+        the worker has already taken off the queue and not yet written.
+        """
+        self._wake.set()
+        with self._flush_lock:
+            while not self._queue.empty():
+                self._write(self._drain())
+        self._queue.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {"name": self.name, "pending": self._queue.qsize(), **counters}
@@ -1,12 +1,10 @@
-from collections import defaultdict
 from urllib.parse import quote_plus
 import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import Session
 from db.model import Connection
+from core.startup import load_env
 
-load_dotenv()
+load_env()
 
 
 def get_connection_string(user_id: int, db_name: str, session: Session) -> str:
@@ -23,8 +21,9 @@ def get_connection_string(user_id: int, db_name: str, session: Session) -> str:
 
     db_type = conn.db_type.lower()
     if db_type == "sqlite":
-        # expect your files in ./data/
-        return f"sqlite:///./data/{db_name}"
+        # expect your files in ./data/; read-only unless flagged writable
+        from core.sqlite_profile import sqlite_path, sqlite_url
+        return sqlite_url(sqlite_path(db_name), conn.writable, conn.immutable)
 
     if not all([conn.db_user, conn.db_password, conn.db_host, conn.db_port]):
         raise ValueError("Incomplete DB params")
@@ -34,14 +33,11 @@ def get_connection_string(user_id: int, db_name: str, session: Session) -> str:
 
 
 def get_tables_and_schemas(user_id: int, db_name: str, session: Session):
-    out = defaultdict(list)
+    # bulk catalog queries (cached), not get_columns() per table
+    from core.reflection import table_columns
+
     conn_str = get_connection_string(user_id, db_name, session)
-    eng = create_engine(conn_str)
-    insp = inspect(eng)
-    for tbl in insp.get_table_names():
-        for col in insp.get_columns(tbl):
-            out[tbl].append(col["name"])
-    return dict(out)
+    return table_columns(conn_str)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+# db/migrate.py
+
+# `SQLModel.metadata.create_all` only creates missing tables and never
+# touches existing ones. `migrate_schema` also adds the columns (and their
+# indexes) newer models define, and relaxes NOT NULL constraints the models
+# dropped. Every step is idempotent, so it runs on each startup.
+
+from sqlalchemy import DateTime, inspect, text
+from sqlmodel import SQLModel
+
+
+def _literal(column):
+    """SQL literal for a column's scalar Python default, or None."""
+    default = column.default
+    if default is None or not getattr(default, "is_scalar", False):
+        return None
+    value = default.arg
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return None
+
+
+def _add_column(conn, table, column) -> None:
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+    default = _literal(column)
+    if default is not None:
+        ddl += f" DEFAULT {default}"
+        # SQLite only accepts NOT NULL on an added column when it has a default
+        if not column.nullable:
+            ddl += " NOT NULL"
+    conn.execute(text(ddl))
+
+
+def _rebuild_sqlite_table(conn, table) -> None:
+    """SQLite can't ALTER a column's constraints: recreate the table and copy the rows."""
+    old = f"_old_{table.name}"
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{old}"'))
+    table.create(conn)
+    targets, sources = [], []
+    for c in table.columns:
+        if c.name in existing:
+            value = f'"{c.name}"'
+        else:
+            # columns the old table lacks: their default, or now() for required timestamps
+            value = _literal(c) or ("CURRENT_TIMESTAMP" if isinstance(getattr(c.type, "impl", c.type), DateTime) else None)
+            if value is None:
+                continue
+        targets.append(f'"{c.name}"')
+        sources.append(value)
+    conn.execute(text(
+        f'INSERT INTO "{table.name}" ({", ".join(targets)}) SELECT {", ".join(sources)} FROM "{old}"'
+    ))
+    conn.execute(text(f'DROP TABLE "{old}"'))
+
+
+def migrate_schema(engine) -> list[str]:
+    """create_all, then add missing columns and drop obsolete NOT NULLs. Returns what changed."""
+    SQLModel.metadata.create_all(engine)
+    changes = []
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        for table in SQLModel.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"]: c for c in insp.get_columns(table.name)}
+            relaxed = [
+                c.name for c in table.columns
+                if c.name in existing and c.nullable and not c.primary_key and not existing[c.name]["nullable"]
+            ]
+            if relaxed and conn.dialect.name == "sqlite":
+                _rebuild_sqlite_table(conn, table)
+                changes.append(f"rebuilt {table.name} (nullable: {', '.join(relaxed)})")
+                continue
+            for name in relaxed:
+                conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL"))
+                changes.append(f"{table.name}.{name} nullable")
+
+            added = [c for c in table.columns if c.name not in existing]
+            for column in added:
+                _add_column(conn, table, column)
+                changes.append(f"added {table.name}.{column.name}")
+            for index in table.indexes:
+                if any(c.name in {a.name for a in added} for c in index.columns):
+                    index.create(conn, checkfirst=True)
+    return changes
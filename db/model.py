@@ -24,6 +24,10 @@ class Connection(SQLModel, table=True):
     db_port: Optional[int]
     db_type: str
     connection_name: str
+    # lets the index advisor create indexes on the target DB
+    writable: bool = Field(default=False)
+    # SQLite only: the file never changes while served (opened with immutable=1)
+    immutable: bool = Field(default=False)
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
 
@@ -31,7 +35,76 @@ class Query(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", nullable=False)
     connection_id: int = Field(foreign_key="connection.id", nullable=False)
-    query_key: str
+    query_key: Optional[str] = None
+    # one row per /answer, written by core/query_log.py
+    question: Optional[str] = None
+    sql: Optional[str] = None
+    sql_hash: Optional[str] = Field(default=None, index=True)
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    status: str = Field(default="ok")
+    error: Optional[str] = None
+    duration_ms: Optional[float] = None
+    execution_ms: Optional[float] = None
+    row_count: Optional[int] = None
+    sql_cache_hit: bool = Field(default=False)
+    # served from the result cache: execution_ms says nothing about the SQL
+    result_cache_hit: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+
+class UsageEvent(SQLModel, table=True):
+    # append-only, one row per provider call; written by core/usage_ledger.py
+    id: int = Field(default=None, primary_key=True)
+    user_id: int = Field(nullable=False, index=True)
+    connection_name: Optional[str] = None
+    provider: str
+    model: str
+    purpose: str  # generate | edit
+    status: str = Field(default="ok")  # ok | error | cancelled
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    estimated: bool = Field(default=False)  # counted locally; the provider reported no usage
+    attempts: int = Field(default=1)  # HTTP attempts, including the client's retries
+    latency_ms: float = Field(default=0.0)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+
+class UsageHourly(SQLModel, table=True):
+    # per-hour rollup of UsageEvent, rebuilt for recent hours in the background
+    hour: datetime = Field(primary_key=True)
+    user_id: int = Field(primary_key=True)
+    connection_name: str = Field(primary_key=True)
+    provider: str = Field(primary_key=True)
+    model: str = Field(primary_key=True)
+    calls: int = Field(default=0)
+    errors: int = Field(default=0)
+    retries: int = Field(default=0)
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    estimated_calls: int = Field(default=0)
+    latency_ms_total: float = Field(default=0.0)
+
+class Export(SQLModel, table=True):
+    # one row per export job, written by core/export.py so any worker can serve it
+    id: str = Field(primary_key=True)
+    user_id: int = Field(nullable=False, index=True)
+    connection_name: str
+    format: str
+    sink: str
+    question: Optional[str] = None
+    sql_query: Optional[str] = None
+    status: str = Field(default="queued")  # queued | running | done | failed
+    rows_written: int = Field(default=0)
+    chunks_written: int = Field(default=0)
+    location: Optional[str] = None
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+    finished_at: Optional[datetime] = None
+
+class RevokedUser(SQLModel, table=True):
+    # tokens issued to the user before revoked_at are rejected
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    revoked_at: float = Field(nullable=False)
 
 class APIKey(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True)
@@ -73,3 +146,5 @@ class ConnectionInput(BaseModel):
     db_port: Optional[int] = None
     db_type: str
     connection_name: str
+    writable: bool = False
+    immutable: bool = False
@@ -53,6 +53,43 @@ export const listModels = (provider) =>
 export const answerQuery = (params) =>
   API.get("/answer", { params });
 
+// Persistent chat: follow-ups reuse the server-side session. Events arrive
+// as {type: "ready" | "status" | "sql" | "rows" | "done" | "error", ...}.
+export function openChatSocket(token, params, onEvent) {
+  const base = (API.defaults.baseURL || window.location.origin).replace(/^http/, "ws");
+  const query = new URLSearchParams({ ...params, token });
+  const ws = new WebSocket(`${base}/ws/chat?${query}`);
+  ws.onmessage = (e) => onEvent(JSON.parse(e.data));
+  return {
+    ask: (question, followUp = null) => ws.send(JSON.stringify({ question, follow_up: followUp })),
+    cancel: () => ws.send(JSON.stringify({ type: "cancel" })),
+    reset: () => ws.send(JSON.stringify({ type: "reset" })),
+    close: () => ws.close(),
+    socket: ws,
+  };
+}
+
+// — Exports —
+export const createExport = (params) =>
+  API.post("/exports", {}, { params });
+
+export const getExport = (jobId) =>
+  API.get(`/exports/${jobId}`);
+
+// The download needs the Bearer header, so a plain link would get a 401:
+// fetch it as a blob and save that.
+export async function downloadExport(jobId, filename) {
+  const res = await API.get(`/exports/${jobId}/download`, { responseType: "blob" });
+  const url = URL.createObjectURL(res.data);
+  const a = document.createElement("a");
+  a.href = url;
+  a.download = filename || `export-${jobId}`;
+  document.body.appendChild(a);
+  a.click();
+  a.remove();
+  URL.revokeObjectURL(url);
+}
+
 // — Saved Queries —
 export const saveQuery = (key, question, sql, answer) =>
   API.post(
@@ -0,0 +1,4 @@
+import os
+
+# tests sign tokens with a throwaway per-process key
+os.environ.setdefault("AUTH_DEV_MODE", "1")
@@ -0,0 +1,78 @@
+import os
+import random
+import sqlite3
+import sys
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.approximate import plan_sample, estimate_frame, describe_plan, _sampled_source
+
+
+def _engine(tmp_path):
+    path = tmp_path / "big.sqlite"
+    rng = random.Random(7)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE region (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO region VALUES (?, ?)", [(i, f"R{i}") for i in range(4)])
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, region_id INT, total REAL)")
+        conn.executemany("INSERT INTO orders (region_id, total) VALUES (?, ?)",
+                         ((rng.randrange(4), rng.expovariate(1 / 50)) for _ in range(200_000)))
+    return create_engine(f"sqlite:///{path}")
+
+
+def _frame(conn, sql):
+    rp = conn.exec_driver_sql(sql)
+    return pd.DataFrame(rp.fetchall(), columns=list(rp.keys()))
+
+
+def test_grouped_estimates_fall_within_their_bounds(tmp_path):
+    sql = ("SELECT r.name, COUNT(*) AS n, ROUND(AVG(o.total), 2) AS avg_total, SUM(o.total) AS revenue "
+           "FROM orders o JOIN region r ON r.id = o.region_id WHERE o.total > 1 GROUP BY r.name ORDER BY r.name")
+    with _engine(tmp_path).connect() as conn:
+        plan = plan_sample(conn, sql, sample_rows=20_000)
+        assert plan.table == "orders" and plan.fraction == 0.1
+        exact = _frame(conn, sql)
+        estimated = estimate_frame(_frame(conn, plan.sql), plan)
+
+    assert list(estimated.columns) == ["name", "n", "n_low", "n_high", "avg_total", "avg_total_low",
+                                       "avg_total_high", "revenue", "revenue_low", "revenue_high"]
+    merged = exact.merge(estimated, on="name", suffixes=("", "_est"))
+    assert len(merged) == 4
+    for col in ("n", "avg_total", "revenue"):
+        # SQLite's random() is unseeded: check against twice the 95% half-width (~4 sigma)
+        half = merged[f"{col}_high"] - merged[f"{col}_est"]
+        assert ((merged[col] - merged[f"{col}_est"]).abs() <= 2 * half).all(), col
+        assert (half < 0.05 * merged[col]).all(), col
+
+
+def test_ineligible_queries_report_a_reason(tmp_path):
+    with _engine(tmp_path).connect() as conn:
+        for sql in ("SELECT MAX(total) FROM orders",
+                    "SELECT COUNT(DISTINCT region_id) FROM orders",
+                    "SELECT * FROM orders WHERE total > 10",
+                    "SELECT region_id, COUNT(*) FROM orders GROUP BY region_id HAVING COUNT(*) > 5"):
+            plan, reason = plan_sample(conn, sql, sample_rows=20_000)
+            assert plan is None and reason, sql
+        # ranking on estimates can return the wrong top groups
+        for sql in ("SELECT region_id, SUM(total) FROM orders GROUP BY region_id ORDER BY SUM(total) DESC LIMIT 2",
+                    "SELECT region_id, SUM(total) AS s FROM orders GROUP BY region_id ORDER BY s DESC LIMIT 2",
+                    "SELECT region_id, COUNT(*) FROM orders GROUP BY region_id ORDER BY 2 DESC LIMIT 2"):
+            plan, reason = plan_sample(conn, sql, sample_rows=20_000)
+            assert plan is None and "top-k" in reason, sql
+        assert plan_sample(conn, "SELECT region_id, SUM(total) AS s FROM orders GROUP BY region_id "
+                                 "ORDER BY region_id LIMIT 2", sample_rows=20_000).fraction == 0.1
+        # small enough to just run exactly
+        plan, reason = plan_sample(conn, "SELECT COUNT(*) FROM region", sample_rows=20_000)
+        assert plan is None and "rows" in reason
+
+
+def test_sampling_is_row_level_and_grouped_plans_flag_missing_groups(tmp_path):
+    # page-level TABLESAMPLE SYSTEM would break the row-sampling bounds on clustered data
+    assert "TABLESAMPLE BERNOULLI" in _sampled_source("postgresql", "orders", "o", 0.01)
+    with _engine(tmp_path).connect() as conn:
+        grouped = plan_sample(conn, "SELECT region_id, COUNT(*) FROM orders GROUP BY region_id", sample_rows=20_000)
+        total = plan_sample(conn, "SELECT COUNT(*) FROM orders WHERE total > 1", sample_rows=20_000)
+        assert describe_plan(grouped, ["region_id", "n"])["groups_may_be_missing"] is True
+        assert describe_plan(total, ["n"])["groups_may_be_missing"] is False
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.auth_utils as auth
+
+
+@pytest.fixture(autouse=True)
+def _no_db_revocations(monkeypatch):
+    monkeypatch.setattr(auth._revocations, "_loaded_at", time.monotonic())
+    monkeypatch.setattr(auth._revocations, "_revoked", {})
+
+
+USER = SimpleNamespace(id=5, name="ana", email="ana@example.com")
+
+
+def test_token_round_trip_carries_claims():
+    claims = auth.decode_access_token(auth.create_access_token(USER))
+    assert claims["sub"] == "5" and claims["email"] == "ana@example.com"
+    assert auth.get_current_user_id(claims) == 5
+
+
+def test_tampered_expired_and_raw_tokens_are_rejected():
+    token = auth.create_access_token(USER)
+    header, payload, sig = token.split(".")
+    forged = auth.create_access_token(SimpleNamespace(id=1, name="x", email="x")).split(".")[1]
+    for bad in (f"{header}.{forged}.{sig}", auth.create_access_token(USER, ttl=-1), "5"):
+        with pytest.raises(HTTPException) as exc:
+            auth.decode_access_token(bad)
+        assert exc.value.status_code == 401
+
+
+def test_revocation_applies_to_older_tokens_only():
+    old = auth.create_access_token(USER)
+    auth._revocations._revoked[USER.id] = time.time()
+    with pytest.raises(HTTPException):
+        auth.decode_access_token(old)
+    time.sleep(0.01)
+    assert auth.decode_access_token(auth.create_access_token(USER))["sub"] == "5"
+
+
+def test_refuses_to_start_without_a_secret_outside_dev_mode():
+    import subprocess
+
+    env = {k: v for k, v in os.environ.items() if k not in ("AUTH_SECRET_KEY", "AUTH_DEV_MODE")}
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    proc = subprocess.run([sys.executable, "-c", "import core.auth_utils"], cwd=root, env=env,
+                          capture_output=True, text=True)
+    assert proc.returncode != 0 and "AUTH_SECRET_KEY is not set" in proc.stderr
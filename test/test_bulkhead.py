@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.bulkhead import Bulkhead, BulkheadRejected, _outcome
+from core.cancellation import RequestCancelled
+
+
+def _hold(bulkhead, release: threading.Event, started: threading.Barrier):
+    with bulkhead.slot():
+        started.wait()
+        release.wait(5)
+
+
+def test_queue_bound_rejects_with_503_and_others_are_unaffected():
+    slow = Bulkhead("slow", max_concurrency=2, max_queue=0, max_wait=1)
+    healthy = Bulkhead("healthy", max_concurrency=2, max_queue=0, max_wait=1)
+    release, started = threading.Event(), threading.Barrier(3)
+    workers = [threading.Thread(target=_hold, args=(slow, release, started)) for _ in range(2)]
+    for w in workers:
+        w.start()
+    started.wait()
+
+    with pytest.raises(BulkheadRejected) as err:
+        with slow.slot():
+            pass
+    assert err.value.status_code == 503 and "Retry-After" in err.value.headers
+    with healthy.slot():
+        pass
+
+    release.set()
+    for w in workers:
+        w.join()
+    m = slow.metrics()
+    assert (m["active"], m["ok_total"], m["rejected_total"], m["state"]) == (0, 2, 1, "closed")
+
+
+def _time_out(bulkhead):
+    with pytest.raises(RequestCancelled):
+        with bulkhead.slot():
+            raise RequestCancelled("sql stage exceeded 1s", 504)
+
+
+def test_breaker_opens_after_consecutive_timeouts_and_probe_closes_it():
+    bulkhead = Bulkhead("db", failure_threshold=2, cooldown=0.2)
+    _time_out(bulkhead)
+    with bulkhead.slot():
+        pass  # a success resets the streak
+    _time_out(bulkhead)
+    with pytest.raises(RequestCancelled):
+        with bulkhead.slot():
+            raise RequestCancelled("client disconnected", 499)  # says nothing about the database
+    assert bulkhead.metrics()["state"] == "closed"
+    _time_out(bulkhead)
+    assert bulkhead.metrics()["state"] == "open"
+
+    with pytest.raises(BulkheadRejected):
+        with bulkhead.slot():
+            pass
+    time.sleep(0.25)
+    _time_out(bulkhead)  # a failed probe re-opens
+    assert bulkhead.metrics()["state"] == "open"
+    time.sleep(0.25)
+    with bulkhead.slot():
+        pass
+    m = bulkhead.metrics()
+    assert (m["state"], m["opened_total"], m["timeout_total"], m["cancelled_total"], m["rejected_total"]) == \
+        ("closed", 2, 4, 1, 1)
+
+
+def test_timeouts_are_classified_by_driver_code_not_message():
+    class PgError(Exception):
+        pgcode = "57014"
+
+    def wrapped(orig):
+        return OperationalError("SELECT 1", {}, orig)
+
+    assert _outcome(wrapped(PgError("canceling statement due to statement timeout"))) == "timeout"
+    assert _outcome(wrapped(Exception(3024, "Query execution was interrupted"))) == "timeout"
+    assert _outcome(PoolTimeout("QueuePool limit reached")) == "timeout"
+    # a query that merely mentions timeouts is the SQL's fault, not the database's
+    assert _outcome(wrapped(Exception(1054, "Unknown column 'timeout_ms'"))) == "error"
+
+
+def test_last_failure_never_carries_the_sql():
+    class PgError(Exception):
+        pgcode = "57014"
+
+    bulkhead = Bulkhead("db")
+    with pytest.raises(OperationalError):
+        with bulkhead.slot():
+            raise OperationalError("SELECT ssn FROM patients", {}, PgError("statement timeout"))
+    assert bulkhead.metrics()["last_failure"] == "OperationalError"
+
+
+def test_all_bulkheads_share_a_thread_budget(monkeypatch):
+    import core.bulkhead as bulkhead_mod
+
+    monkeypatch.setattr(bulkhead_mod, "_threads", bulkhead_mod._ThreadBudget(max_held=2, max_queued=0))
+    a, b, c = (Bulkhead(name, max_concurrency=4, max_wait=1) for name in "abc")
+    release, started = threading.Event(), threading.Barrier(3)
+    workers = [threading.Thread(target=_hold, args=(db, release, started)) for db in (a, b)]
+    for w in workers:
+        w.start()
+    started.wait()
+
+    with pytest.raises(BulkheadRejected):
+        with c.slot():
+            pass  # c is idle, but the degraded a and b hold every thread we allow
+    release.set()
+    for w in workers:
+        w.join()
+    with c.slot():
+        pass
+    assert bulkhead_mod._threads.held == 0
+
+
+def test_open_circuit_rejects_before_the_llm_is_called(tmp_path, monkeypatch):
+    import core.llm as llm
+    from core.bulkhead import bulkhead_for
+
+    db = llm._open_sql_database(f"sqlite:///{tmp_path / 't.sqlite'}")
+    bulkhead = bulkhead_for(llm._db_url(db))
+    monkeypatch.setattr(bulkhead, "_state", "open")
+    monkeypatch.setattr(bulkhead, "_opened_at", time.monotonic())
+    monkeypatch.setattr(llm, "_get_llm", lambda *a: pytest.fail("the provider must not be called"))
+
+    with pytest.raises(BulkheadRejected):
+        llm.run_question("how many orders?", 1, "t", "gpt-4o", "openai", session=None, db=db, fast_path=False)
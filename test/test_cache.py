@@ -0,0 +1,84 @@
+import json
+import os
+import pickle
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.cache as cache_mod
+from core.cache import Cache, SQLiteBackend
+
+
+def _worker(path, **kwargs):
+    return Cache(SQLiteBackend(path, **kwargs))
+
+
+def test_value_written_by_one_worker_is_served_to_another(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    a, b = _worker(path), _worker(path)
+
+    a.set("sql:abc", "how many orders", "SELECT COUNT(*) FROM orders", ttl=60)
+    assert b.get("sql:abc", "how many orders") == "SELECT COUNT(*) FROM orders"
+    assert b.stats()["by_kind"]["sql"]["shared_hits"] == 1
+
+
+def test_invalidation_reaches_other_workers_local_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_mod, "CACHE_EVENT_POLL", 0)
+    path = str(tmp_path / "cache.sqlite3")
+    a, b = _worker(path), _worker(path)
+
+    a.set("schema:abc", "table_info", "Order(Id int PK)", ttl=600)
+    assert b.get("schema:abc", "table_info") == "Order(Id int PK)"  # now in b's local LRU
+
+    a.invalidate("schema:abc")
+    assert b.get("schema:abc", "table_info") is None
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_bytes=10_000)
+    c = Cache(backend, local_max_entries=1)
+    for i in range(64):
+        c.set("result:abc", f"q{i}", "x" * 1000, ttl=60)
+    assert backend.stats()["bytes"] <= 10_000 + 32 * 1100
+    assert backend.stats()["evicted"] > 0
+    assert backend.get("result:abc", cache_mod._hash_key("q0")) is None
+
+
+def test_shared_values_round_trip_as_json(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    a, b = _worker(path), _worker(path)
+    columns = {("orders", "status"): ("open", "shipped")}
+    result = (["id", "at", "total"], [(1, datetime(2024, 5, 1, 12, 30), Decimal("9.50"))])
+    a.set("values:abc", "columns", columns, ttl=60)
+    a.set("result:abc", "q", result, ttl=60)
+
+    assert b.get("values:abc", "columns") == columns
+    assert b.get("result:abc", "q") == result
+    raw = b.backend.get("result:abc", cache_mod._hash_key("q"))
+    assert json.loads(raw)["__t"] == "tuple"
+
+
+def test_pickled_entries_are_never_loaded(tmp_path):
+    c = _worker(str(tmp_path / "cache.sqlite3"))
+    c.backend.set("sql:abc", cache_mod._hash_key("q"), pickle.dumps("SELECT 1"), 60)
+    assert c.get("sql:abc", "q") is None
+
+
+def test_reads_record_last_access_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_mod, "CACHE_TOUCH_FLUSH", 3600)
+    monkeypatch.setattr(cache_mod, "CACHE_TOUCH_BATCH", 2)
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    for key in ("a", "b"):
+        backend.set("sql:abc", key, b'"x"', 60)
+
+    def last_access(key):
+        return backend._conn().execute("SELECT last_access FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+    before = last_access("a")
+    time.sleep(0.01)
+    backend.get("sql:abc", "a")
+    assert last_access("a") == before  # held in memory
+    backend.get("sql:abc", "b")
+    assert last_access("a") > before  # batch of 2 written back
@@ -0,0 +1,61 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.cancellation import CancelToken, RequestCancelled, cancellable_statement, stage
+
+SLOW_SQL = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) "
+    "SELECT count(*) FROM n"
+)
+
+
+def _run_slow_query():
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn, stage("sql"), cancellable_statement(conn):
+        conn.execute(text(SLOW_SQL)).scalar()
+
+
+def test_cancel_interrupts_running_sqlite_statement():
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel, args=("client disconnected",)).start()
+    started = time.perf_counter()
+    with pytest.raises(Exception):
+        token.run(_run_slow_query)
+    assert time.perf_counter() - started < 5
+    with pytest.raises(RequestCancelled) as e:
+        token.check()
+    assert e.value.status_code == 499
+
+
+def test_stage_deadline_cancels_with_504():
+    token = CancelToken({"sql": 0.2})
+    with pytest.raises(Exception):
+        token.run(_run_slow_query)
+    assert token.cancelled and token.status_code == 504
+
+
+def test_cancel_returns_at_once_and_runs_callbacks_off_thread():
+    token = CancelToken()
+    ran, release = [], threading.Event()
+
+    def slow_canceller():  # e.g. connecting to run pg_cancel_backend
+        release.wait(5)
+        ran.append(threading.current_thread().name)
+
+    token.on_cancel(slow_canceller)
+    unregister = token.on_cancel(lambda: ran.append("finished stage"))
+    unregister()
+    started = time.perf_counter()
+    token.cancel("client disconnected")
+    assert token.cancelled and time.perf_counter() - started < 0.5
+    release.set()
+    deadline = time.monotonic() + 5
+    while not ran and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ran == ["cancel-callbacks"]
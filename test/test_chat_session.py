@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.chat_session import ChatSession, is_follow_up, result_messages
+from core.llm import _open_sql_database
+
+
+class FakeLLM:
+    def __init__(self, sql):
+        self.sql, self.prompts = sql, []
+
+    def invoke(self, prompt, stop=None):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=self.sql)
+
+
+def test_follow_up_detection():
+    assert is_follow_up("now only for 1997", True)
+    assert is_follow_up("sort those by price", True)
+    assert not is_follow_up("now only for 1997", False)
+    assert not is_follow_up("how many customers are in Germany?", True)
+
+
+def test_follow_up_is_an_edit_of_the_previous_sql(tmp_path):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER, year INTEGER, total REAL)")
+        conn.execute("CREATE TABLE customers (id INTEGER, name TEXT)")
+        conn.executemany("INSERT INTO orders VALUES (?, ?, ?)", [(i, 1996 + i % 3, i * 1.5) for i in range(1200)])
+
+    chat = ChatSession(1, "t", "openai", "gpt-4o")
+    chat.db = _open_sql_database(f"sqlite:///{path}")
+    chat.schema = {"orders": ["id", "year", "total"], "customers": ["id", "name"]}
+    chat.history.append(("all orders", "SELECT * FROM orders"))
+    chat.llm = FakeLLM("SELECT * FROM orders WHERE year = 1997")
+
+    run = chat.ask("now only for 1997")
+    assert run["sql_source"] == "edit" and len(run["df"]) == 400
+    prompt = chat.llm.prompts[0]
+    assert "orders(id, year, total)" in prompt and "customers" not in prompt
+    assert chat.history[-1] == ("now only for 1997", "SELECT * FROM orders WHERE year = 1997")
+
+    events = list(result_messages(run, chunk_rows=150))
+    assert [e["type"] for e in events] == ["sql", "rows", "rows", "rows", "done"]
+    assert events[-1]["total_records"] == 400
+
+
+def test_failed_edit_is_retried_with_context_but_history_keeps_the_question(tmp_path, monkeypatch):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER, year INTEGER)")
+
+    asked = []
+
+    def run_question(question, *args, **kwargs):
+        asked.append((question, kwargs["remember"]))
+        return {"df": None, "sql": "SELECT id FROM orders WHERE year = 1997", "sql_source": "llm"}
+
+    monkeypatch.setattr("core.llm.run_question", run_question)
+    chat = ChatSession(1, "t", "openai", "gpt-4o")
+    chat.db = _open_sql_database(f"sqlite:///{path}")
+    chat.schema = {"orders": ["id", "year"]}
+    chat.history.append(("all orders", "SELECT * FROM orders"))
+    chat.llm = FakeLLM("SELECT * FROM no_such_table")
+
+    chat.ask("now only for 1997")
+    chat.ask("sort those by id", follow_up=True)
+    assert asked == [("all orders Follow-up: now only for 1997", False),
+                     ("now only for 1997 Follow-up: sort those by id", False)]
+    assert [q for q, _ in chat.history] == ["all orders", "now only for 1997", "sort those by id"]
+
+
+def test_synthetic_questions_are_neither_cached_nor_learned(tmp_path, monkeypatch):
+    import core.llm as llm
+    from core.cache import Cache, MemoryBackend
+
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER, year INTEGER)")
+    db = _open_sql_database(f"sqlite:///{path}")
+    cache, learned = Cache(MemoryBackend()), []
+    monkeypatch.setattr(llm, "get_cache", lambda: cache)
+    monkeypatch.setattr(llm, "_local_sql", lambda *a: None)
+    monkeypatch.setattr(llm, "_generate_sql", lambda *a, **k: ("SELECT id FROM orders WHERE year = 1997", 10))
+    monkeypatch.setattr(llm, "remember_template", lambda *a: learned.append(a))
+
+    question = "all orders Follow-up: now only for 1997"
+    for remember in (False, True):
+        llm.run_question(question, 1, "t", "gpt-4o", "openai", None, db=db, llm=object(), remember=remember)
+        key = llm._sql_cache_key(question, "gpt-4o", False, 3)
+        cached = cache.get(f"sql:{llm.connection_fingerprint(llm._db_url(db))}", key)
+        assert (cached is not None, len(learned)) == ((True, 1) if remember else (False, 0))
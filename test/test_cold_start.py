@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_importing_app_does_not_load_heavy_modules():
+    code = (
+        "import sys, app; "
+        "print(','.join(m for m in ('pandas', 'langchain_openai', 'langchain_community', 'boto3') "
+        "if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == ""
@@ -0,0 +1,124 @@
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import SQLModel, create_engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.export as export
+from core.sqlite_profile import sqlite_url
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    meta = create_engine(f"sqlite:///{tmp_path / 'meta.sqlite3'}")
+    SQLModel.metadata.create_all(meta)
+    monkeypatch.setattr(export, "engine", meta)
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path / "exports"))
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 100)
+
+    path = str(tmp_path / "sales.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (id INT, note TEXT)")
+        conn.executemany("INSERT INTO orders VALUES (?, ?)", [(i, None if i < 250 else f"n{i}") for i in range(1000)])
+    monkeypatch.setattr("db.main.get_connection_string", lambda user_id, name, session: sqlite_url(path))
+    return path
+
+
+def test_jobs_are_stored_so_any_worker_can_serve_them(source):
+    job = export.submit_export(1, "sales.sqlite", sql_query="SELECT * FROM orders")
+    deadline = time.monotonic() + 5
+    while job.id in export._jobs and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    export._jobs.clear()  # another worker has no live copy
+    stored = export.get_export_job(1, job.id)
+    assert (stored.status, stored.rows_written, stored.chunks_written) == ("done", 1000, 10)
+    with open(stored.location, newline="") as f:
+        assert sum(1 for _ in csv.reader(f)) == 1001
+    assert [j["job_id"] for j in export.list_export_jobs(1)] == [job.id]
+    with pytest.raises(HTTPException):
+        export.get_export_job(2, job.id)
+
+    assert export.cleanup_exports() == 0
+    assert export.cleanup_exports(now=datetime.now(timezone.utc) + timedelta(seconds=export.EXPORT_TTL + 1)) == 1
+    assert not os.path.exists(stored.location) and export.list_export_jobs(1) == []
+
+
+def test_parquet_columns_null_in_the_first_chunk_take_their_later_type(source, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "out.parquet")
+    export.stream_query_to_file(sqlite_url(source), "SELECT * FROM orders", "parquet", path, export.ExportJob(
+        1, "sales.sqlite", "parquet", "local", None,
+    ))
+    table = pq.read_table(path)
+    assert table.num_rows == 1000 and str(table.schema.field("note").type) == "string"
+    assert table.column("note").null_count == 250
+
+
+def test_parquet_never_truncates_a_value_that_changes_type(source, tmp_path):
+    pytest.importorskip("pyarrow.parquet")
+    with sqlite3.connect(source) as conn:
+        conn.execute("CREATE TABLE prices (p)")  # no declared type: SQLite stores what it gets
+        conn.executemany("INSERT INTO prices VALUES (?)", [(i,) for i in range(150)] + [(1.5,)])
+    with pytest.raises(ValueError, match="'p' was written as int64"):
+        export.stream_query_to_file(sqlite_url(source), "SELECT p FROM prices", "parquet", str(tmp_path / "out.parquet"),
+                                    export.ExportJob(1, "sales.sqlite", "parquet", "local", None))
+
+
+def test_exports_run_inside_the_database_bulkhead(source, tmp_path, monkeypatch):
+    import core.bulkhead as bulkhead_mod
+
+    bulkhead = bulkhead_mod.bulkhead_for(sqlite_url(source))
+    monkeypatch.setattr(bulkhead, "_state", "open")
+    monkeypatch.setattr(bulkhead, "_opened_at", time.monotonic())
+    with pytest.raises(bulkhead_mod.BulkheadRejected):
+        export.stream_query_to_file(sqlite_url(source), "SELECT * FROM orders", "csv", str(tmp_path / "out.csv"),
+                                    export.ExportJob(1, "sales.sqlite", "csv", "local", None))
+
+
+def test_question_exports_are_not_capped_at_the_answer_preview(source, monkeypatch):
+    from types import SimpleNamespace
+    import core.llm as llm
+    from core.cache import connection_fingerprint, get_cache
+
+    url = sqlite_url(source)
+    # /answer already cached its top-k SQL for the same question
+    get_cache().set(f"sql:{connection_fingerprint(url)}", llm._sql_cache_key("all orders", "gpt-4o", False, 3),
+                    "SELECT id FROM orders LIMIT 5", 60)
+    prompts = []
+
+    def invoke(model, prompt):
+        prompts.append(prompt)
+        return SimpleNamespace(content="SELECT id FROM orders LIMIT 5" if "LIMIT clause" in prompt else "SELECT id FROM orders")
+
+    monkeypatch.setattr(llm, "get_connection_string", lambda user_id, name, session: url)
+    monkeypatch.setattr(llm, "_get_llm", lambda *a: None)
+    monkeypatch.setattr(llm, "_invoke_llm", invoke)
+    monkeypatch.setattr(llm, "metered_call", lambda *a: _Call())
+    monkeypatch.setattr(llm, "record_prompt", lambda *a: None)
+    monkeypatch.setattr(llm, "VALUE_HINTS", False)
+
+    job = export.submit_export(1, "sales.sqlite", question="all orders", model_name="gpt-4o")
+    deadline = time.monotonic() + 5
+    while job.id in export._jobs and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    stored = export.get_export_job(1, job.id)
+    assert (stored.status, stored.rows_written, stored.sql_query) == ("done", 1000, "SELECT id FROM orders")
+    assert len(prompts) == 1 and "return every matching row" in prompts[0]
+
+
+class _Call:
+    message = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.fast_path import FAST_PATH_LIST_LIMIT, build_index, match_question, try_fast_path
+
+SCHEMA = {
+    "Customer": ["Id", "CompanyName", "City", "Country"],
+    "OrderDetail": ["Id", "OrderId", "ProductId", "Quantity"],
+    "Product": ["Id", "ProductName", "UnitPrice", "CategoryId"],
+}
+INDEX = build_index(SCHEMA)
+
+
+def test_trivial_shapes_resolve_fuzzy_names():
+    assert match_question("How many customers are there?", INDEX, "sqlite")["sql"] == \
+        'SELECT COUNT(*) AS count FROM "Customer"'
+    assert match_question("show me the first 10 order details", INDEX, "sqlite")["sql"] == \
+        'SELECT * FROM "OrderDetail" LIMIT 10'
+    m = match_question("list products where category id = 3", INDEX, "sqlite")
+    assert m["sql"].startswith('SELECT * FROM "Product" WHERE "CategoryId" = :value')
+    assert m["params"] == {"value": 3}
+    m = match_question("customers whose city is London", INDEX, "mysql")
+    assert m["sql"].startswith("SELECT * FROM `Customer` WHERE LOWER(`City`) = LOWER(:value)")
+    assert m["params"] == {"value": "London"}
+    assert try_fast_path("list all custmers", INDEX, "sqlite")["sql"].startswith('SELECT * FROM "Customer"')
+
+
+def test_anything_beyond_plain_equality_goes_to_the_llm():
+    for q in [
+        "products where unit price is greater than 20",
+        "customers where city is London and country is UK",
+        "what is the average unit price of products",
+        "show customers and their orders",
+    ]:
+        assert try_fast_path(q, INDEX, "sqlite") is None, q
+
+
+def test_capped_lists_fetch_one_extra_row_to_detect_truncation():
+    m = match_question("list all customers", INDEX, "sqlite")
+    assert m["row_limit"] == FAST_PATH_LIST_LIMIT
+    assert m["sql"].endswith(f"LIMIT {FAST_PATH_LIST_LIMIT + 1}")
+    assert m["display"].endswith(f"LIMIT {FAST_PATH_LIST_LIMIT}")
+    assert match_question("how many customers are there", INDEX, "sqlite")["row_limit"] is None
+
+
+def test_fast_path_sql_that_fails_to_run_is_retried_through_the_llm(tmp_path, monkeypatch):
+    import sqlite3
+    import core.llm as llm
+
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        # the cached schema is stale: Customer was renamed
+        conn.execute("CREATE TABLE Client (Id INT, CompanyName TEXT, Country TEXT)")
+        conn.execute("INSERT INTO Client VALUES (1, 'Alfreds', 'Germany')")
+    db = llm._open_sql_database(f"sqlite:///{path}")
+    generated = []
+    monkeypatch.setattr(llm, "_fast_path_index", lambda *a: INDEX)
+    monkeypatch.setattr(llm, "_get_llm", lambda *a: object())
+    monkeypatch.setattr(llm, "_generate_sql", lambda *a, **k: generated.append(a[2]) or ("SELECT * FROM Client", 42))
+
+    run = llm.run_question("list customers where country = Germany", 1, "t", "gpt-4o", "openai",
+                           session=None, db=db)
+    assert generated == ["list customers where country = Germany"]
+    assert (run["sql_source"], run["fast_path_hit"], run["prompt_tokens"], len(run["df"])) == ("llm", False, 42, 1)
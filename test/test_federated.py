@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.federated as federated
+from core.cancellation import CancelToken, RequestCancelled, check_cancelled
+from core.federated import merge_results
+
+
+def test_same_columns_are_unioned_with_source():
+    frames = {
+        "east": pd.DataFrame({"Region": ["e"], "Total": [1]}),
+        "west": pd.DataFrame({"region": ["w", "w2"], "total": [2, 3]}),
+    }
+    strategy, merged = merge_results(frames)
+    assert strategy == "union"
+    assert list(merged.columns) == ["region", "total", "_source"]
+    assert merged["_source"].tolist() == ["east", "west", "west"]
+
+
+def test_different_columns_are_joined_on_shared_keys():
+    frames = {
+        "sales": pd.DataFrame({"id": [1, 2], "amount": [10, 20]}),
+        "crm": pd.DataFrame({"id": [2, 3], "name": ["b", "c"]}),
+    }
+    strategy, merged = merge_results(frames)
+    assert strategy == "join"
+    assert sorted(merged["id"].tolist()) == [1, 2, 3]
+    assert {"sales.amount", "crm.name"} <= set(merged.columns)
+
+
+def test_slow_legs_are_cancelled_at_the_timeout_and_on_disconnect(monkeypatch):
+    seen = []
+
+    def slow_leg(question, user_id, connection_name, provider, model_name):
+        while True:
+            try:
+                check_cancelled()
+            except RequestCancelled as e:
+                seen.append((connection_name, e.status_code))
+                raise
+            time.sleep(0.01)
+
+    monkeypatch.setattr(federated, "_answer_one", slow_leg)
+    events = [json.loads(line) for line in federated.federated_answer("q", 1, ["a", "b"], "openai", "m", timeout=0.2)]
+    assert {e["connection_name"] for e in events if e["type"] == "timeout"} == {"a", "b"}
+    time.sleep(0.1)
+    assert sorted(seen) == [("a", 504), ("b", 504)]
+
+    seen.clear()
+    token = CancelToken()
+    stream = federated.federated_answer("q", 1, ["c"], "openai", "m", timeout=30, token=token)
+    assert json.loads(next(stream))["type"] == "started"
+    token.cancel("client disconnected")
+    error = json.loads(next(stream))
+    assert (error["type"], error["status_code"]) == ("error", 499) and seen == [("c", 499)]
+
+
+def test_finished_legs_leave_the_request_token_and_report_truncation(monkeypatch):
+    def leg(question, user_id, connection_name, provider, model_name):
+        return {"df": pd.DataFrame({"n": [1]}), "sql": "SELECT n FROM t", "elapsed_ms": 1.0,
+                "truncated": connection_name == "capped"}
+
+    monkeypatch.setattr(federated, "_answer_one", leg)
+    token = CancelToken()
+    events = [json.loads(line) for line in
+              federated.federated_answer("q", 1, ["capped", "full"], "openai", "m", timeout=5, token=token)]
+    assert {e["connection_name"]: e["truncated"] for e in events if e["type"] == "partial"} == {
+        "capped": True, "full": False,
+    }
+    assert events[-1]["truncated_connections"] == ["capped"]
+    assert token._callbacks == {}
+
+
+def test_every_leg_goes_to_the_query_log(monkeypatch):
+    import core.llm as llm
+    from fastapi import HTTPException
+
+    def run_question(question, user_id, connection_name, *args):
+        if connection_name == "broken":
+            raise HTTPException(500, "no such table")
+        return {"df": pd.DataFrame({"n": [1]}), "sql": "SELECT 1", "execution_ms": 1.0,
+                "sql_cache_hit": False, "result_cache_hit": False}
+
+    logged = []
+    monkeypatch.setattr(llm, "run_question", run_question)
+    monkeypatch.setattr(federated, "record_answer", lambda *a, **k: logged.append((a[1], k.get("error"))))
+    list(federated.federated_answer("q", 1, ["sales", "broken"], "openai", "m", timeout=5))
+    assert sorted(logged) == [("broken", "no such table"), ("sales", None)]
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import OperationalError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.cancellation import RequestCancelled
+from core.index_advisor import advise_workload, benchmark_workload, filter_columns, replay
+
+COLUMNS = {"orders": ["id", "customer_id", "year", "total"], "customers": ["id", "name", "country"]}
+
+
+def test_filter_and_join_columns_are_attributed_to_tables():
+    sql = ("SELECT * FROM customers AS c JOIN orders o ON o.customer_id = c.id "
+           "WHERE o.year > 1996 AND c.country = 'DE'")
+    assert filter_columns(sql, COLUMNS) == {
+        "orders": {"eq": ["customer_id"], "range": ["year"]},
+        "customers": {"eq": ["id", "country"], "range": []},
+    }
+
+
+def test_advice_targets_scanned_tables_and_benchmark_cleans_up(tmp_path):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INT, year INT, total REAL)")
+        conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)",
+                         [(i, i % 500, 1990 + i % 10, i * 0.5) for i in range(20000)])
+    engine = create_engine(f"sqlite:///{path}")
+    workload = [
+        {"sql_hash": "a", "sql": "SELECT * FROM orders WHERE customer_id = 7", "runs": 10, "avg_execution_ms": 5.0},
+        {"sql_hash": "b", "sql": "SELECT * FROM orders WHERE id = 7", "runs": 50, "avg_execution_ms": 0.1},
+        {"sql_hash": "c", "sql": "SELECT COUNT(*) FROM orders", "runs": 3, "avg_execution_ms": 2.0},
+    ]
+
+    advice = advise_workload(engine, workload)
+    assert advice["queries_analyzed"] == 3
+    [proposal] = advice["proposals"]
+    assert proposal["columns"] == ["customer_id"] and proposal["benefit_ms"] == 50.0
+
+    result = benchmark_workload(engine, workload, advice["proposals"], repeat=2)
+    assert result["queries"][0]["sql_hash"] in ("a", "c")
+    assert [ix["name"] for ix in inspect(engine).get_indexes("orders")] == []
+
+
+def test_a_failed_create_drops_the_indexes_already_made_and_replay_times_out(tmp_path):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INT)")
+    engine = create_engine(f"sqlite:///{path}")
+    proposals = [
+        {"name": "ix_orders_customer_id", "table": "orders", "statement": "CREATE INDEX ix_orders_customer_id ON orders (customer_id)"},
+        {"name": "ix_orders_missing", "table": "orders", "statement": "CREATE INDEX ix_orders_missing ON orders (missing)"},
+    ]
+    with pytest.raises(OperationalError):
+        benchmark_workload(engine, [], proposals)
+    assert inspect(engine).get_indexes("orders") == []
+
+    slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    with pytest.raises(RequestCancelled) as e:
+        replay(engine, [{"sql_hash": "s", "sql": slow}], repeat=1, timeout=0.2)
+    assert e.value.status_code == 504
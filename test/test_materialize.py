@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.materialize as mat
+from core.sqlite_profile import sqlite_url
+
+
+class FakeS3:
+    """The bucket every worker shares."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put(self, key, payload, if_match=None):
+        if if_match is not None and self.head(key) != if_match:
+            return None
+        self.objects[key] = json.dumps(payload, default=str)
+        return hashlib.md5(self.objects[key].encode()).hexdigest()
+
+    def get(self, key):
+        return json.loads(self.objects[key]) if key in self.objects else None
+
+    def head(self, key):
+        return hashlib.md5(self.objects[key].encode()).hexdigest() if key in self.objects else None
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(mat, "put_json_to_s3", fake.put)
+    monkeypatch.setattr(mat, "get_json_from_s3", fake.get)
+    monkeypatch.setattr(mat, "head_s3_etag", fake.head)
+    monkeypatch.setattr(mat, "delete_json_from_s3", lambda key: fake.objects.pop(key, None))
+    monkeypatch.setattr(mat, "_snapshots", {})
+    monkeypatch.setattr(mat, "_etags", {})
+    monkeypatch.setattr(mat, "_checked", {})
+    monkeypatch.setattr(mat, "_schedule", {})
+    monkeypatch.setattr(mat, "list_s3_keys", lambda prefix: [k for k in list(fake.objects) if k.startswith(prefix)])
+
+    path = str(tmp_path / "sales.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (total INT)")
+        conn.executemany("INSERT INTO orders VALUES (?)", [(10,), (20,)])
+    monkeypatch.setattr(mat, "get_connection_string", lambda user_id, name, session: sqlite_url(path))
+    fake.db_path = path
+    fake.logged = []
+    monkeypatch.setattr(mat, "record_answer", lambda *a, **k: fake.logged.append((a[2], k.get("query_key"))))
+    return fake
+
+
+SAVED = {"question": "total?", "sql_query": "SELECT SUM(total) AS s FROM orders", "connection_name": "sales.sqlite"}
+
+
+def _other_worker():
+    """Forget every local copy, as a second process would have none."""
+    mat._snapshots.clear()
+    mat._etags.clear()
+    mat._checked.clear()
+    mat._schedule.clear()
+
+
+def test_store_get_and_drop_are_shared_through_s3(s3):
+    df = mat.run_saved_query(1, SAVED, session=None)
+    mat.store_snapshot(1, "total", SAVED, df, refresh_interval=60)
+    assert mat.get_snapshot(1, "total")["rows"] == [[30]]
+
+    _other_worker()
+    assert mat.get_snapshot(1, "total")["rows"] == [[30]]  # loaded from S3
+
+    mat.drop_snapshot(1, "total")
+    assert s3.objects == {} and mat.get_snapshot(1, "total") is None
+
+
+def test_refresh_picks_up_new_rows_and_other_workers_see_it(s3, monkeypatch):
+    monkeypatch.setattr("core.db.get_session", lambda: iter([SimpleNamespace(close=lambda: None)]))
+    mat.store_snapshot(1, "total", SAVED, mat.run_saved_query(1, SAVED, session=None), refresh_interval=60)
+    with sqlite3.connect(s3.db_path) as conn:
+        conn.execute("INSERT INTO orders VALUES (5)")
+
+    # not due yet: the refresh is a no-op
+    mat._refresh(1, "total")
+    assert mat.get_snapshot(1, "total")["rows"] == [[30]]
+
+    snapshot = mat._snapshots[(1, "total")]
+    s3.put(mat._snapshot_key(1, "total"), {**snapshot, "refreshed_ts": snapshot["refreshed_ts"] - 120})
+    s3.put(mat._meta_key(1, "total"), {**mat._meta(snapshot), "refreshed_ts": snapshot["refreshed_ts"] - 120})
+    mat._refresh(1, "total")
+    assert mat.get_snapshot(1, "total")["rows"] == [[35]]
+    assert s3.logged == [("total?", None), ("total?", "total")]  # refreshes reach the query log too
+
+    # a worker holding the old copy reloads it once its check interval passes
+    stale = {**mat._snapshots[(1, "total")], "rows": [[30]]}
+    mat._snapshots[(1, "total")], mat._etags[(1, "total")] = stale, "old-etag"
+    mat._checked[(1, "total")] = 0
+    assert mat.get_snapshot(1, "total")["rows"] == [[35]]
+
+
+def test_a_restarted_worker_refreshes_snapshots_it_never_served(s3, monkeypatch):
+    monkeypatch.setattr("core.db.get_session", lambda: iter([SimpleNamespace(close=lambda: None)]))
+    monkeypatch.setattr(mat._executor, "submit", lambda fn, *args: fn(*args))
+    mat.store_snapshot(1, "total", SAVED, mat.run_saved_query(1, SAVED, session=None), refresh_interval=60)
+    mat.store_snapshot(1, "once", SAVED, mat.run_saved_query(1, SAVED, session=None), refresh_interval=None)
+    meta = s3.get(mat._meta_key(1, "total"))
+    s3.put(mat._meta_key(1, "total"), {**meta, "refreshed_ts": meta["refreshed_ts"] - 120})
+    s3.put(mat._snapshot_key(1, "total"), {**s3.get(mat._snapshot_key(1, "total")),
+                                           "refreshed_ts": meta["refreshed_ts"] - 120})
+    with sqlite3.connect(s3.db_path) as conn:
+        conn.execute("INSERT INTO orders VALUES (5)")
+
+    _other_worker()
+    assert mat._tick(mat.time.time()) == []  # nothing in memory yet
+    mat._scan_schedule()
+    assert list(mat._schedule) == [(1, "total")]
+    assert mat._tick(mat.time.time()) == [(1, "total")]
+    assert s3.get(mat._snapshot_key(1, "total"))["rows"] == [[35]]
+    assert mat._tick(mat.time.time()) == []  # rescheduled from the new refreshed_ts
+
+    mat.drop_snapshot(1, "total")
+    mat._scan_schedule()
+    assert mat._schedule == {}
+
+
+def test_only_the_worker_that_claims_a_due_refresh_runs_it(s3, monkeypatch):
+    monkeypatch.setattr("core.db.get_session", lambda: iter([SimpleNamespace(close=lambda: None)]))
+    mat.store_snapshot(1, "total", SAVED, mat.run_saved_query(1, SAVED, session=None), refresh_interval=60)
+    meta = s3.get(mat._meta_key(1, "total"))
+    s3.put(mat._meta_key(1, "total"), {**meta, "refreshed_ts": meta["refreshed_ts"] - 120})
+    s3.put(mat._snapshot_key(1, "total"), {**s3.get(mat._snapshot_key(1, "total")),
+                                           "refreshed_ts": meta["refreshed_ts"] - 120})
+    now = mat.time.time()
+
+    assert mat._claim(1, "total", now) is not None
+    assert mat._claim(1, "total", now) is None  # a second worker finds it claimed
+    assert not mat._due(mat._schedule[(1, "total")], now)
+    # a claim whose worker died lapses
+    assert mat._claim(1, "total", now + mat.MATERIALIZE_CLAIM_TTL + 1) is not None
+
+    s3.logged.clear()
+    mat._refresh(1, "total")  # claimed elsewhere: no query runs
+    assert s3.logged == []
+
+
+def test_snapshots_keep_duplicate_column_names(s3):
+    saved = {**SAVED, "sql_query": "SELECT a.total AS id, b.total AS id FROM orders a JOIN orders b ON b.total > a.total"}
+    snapshot = mat.store_snapshot(1, "pairs", saved, mat.run_saved_query(1, saved, session=None), refresh_interval=None)
+    assert snapshot["columns"] == ["id", "id"] and snapshot["rows"] == [[10, 20]]
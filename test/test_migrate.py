@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect
+from sqlmodel import Session, create_engine, select
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.migrate import migrate_schema
+from db.model import Connection, Query
+
+# the metadata schema as create_all wrote it before any of the new columns
+BASELINE = """
+CREATE TABLE user (id INTEGER NOT NULL, name VARCHAR NOT NULL, email VARCHAR NOT NULL, password VARCHAR NOT NULL,
+    fernet_key VARCHAR, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL, PRIMARY KEY (id));
+CREATE TABLE connection (id INTEGER NOT NULL, user_id INTEGER NOT NULL, db_user VARCHAR, db_password VARCHAR,
+    db_host VARCHAR, db_port INTEGER, db_type VARCHAR NOT NULL, connection_name VARCHAR NOT NULL,
+    created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id));
+CREATE TABLE "query" (id INTEGER NOT NULL, user_id INTEGER NOT NULL, connection_id INTEGER NOT NULL,
+    query_key VARCHAR NOT NULL, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id),
+    FOREIGN KEY(connection_id) REFERENCES connection (id));
+CREATE TABLE apikey (id INTEGER NOT NULL, user_id INTEGER NOT NULL, provider VARCHAR NOT NULL,
+    encrypted_key VARCHAR NOT NULL, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id));
+INSERT INTO user VALUES (1, 'a', 'a@x', 'p', NULL, '2024-01-01 00:00:00', '2024-01-01 00:00:00');
+INSERT INTO connection VALUES (1, 1, NULL, NULL, NULL, NULL, 'sqlite', 'sales.sqlite',
+    '2024-01-01 00:00:00', '2024-01-01 00:00:00');
+INSERT INTO "query" VALUES (1, 1, 1, 'saved-1');
+"""
+
+
+def test_baseline_metadata_db_is_upgraded_in_place(tmp_path):
+    path = tmp_path / "db_llm.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE)
+    engine = create_engine(f"sqlite:///{path}")
+
+    changes = migrate_schema(engine)
+    assert "added connection.writable" in changes and "added connection.immutable" in changes
+    assert any(c.startswith("rebuilt query") for c in changes)  # query_key became nullable
+    assert migrate_schema(engine) == []  # idempotent
+
+    with Session(engine) as session:
+        [connection] = session.exec(select(Connection)).all()
+        assert (connection.connection_name, connection.writable, connection.immutable) == ("sales.sqlite", False, False)
+        [saved] = session.exec(select(Query)).all()
+        assert saved.query_key == "saved-1" and saved.status == "ok" and saved.sql_cache_hit is False
+        # a query-log row: no query_key, all the new columns
+        session.add(Query(user_id=1, connection_id=1, question="q", sql="SELECT 1", sql_hash="h",
+                          created_at=datetime.now(timezone.utc)))
+        session.commit()
+        assert len(session.exec(select(Query)).all()) == 2
+    assert "ix_query_sql_hash" in {i["name"] for i in inspect(engine).get_indexes("query")}
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.llm as llm
+import core.model_router as router
+from core.bulkhead import BulkheadRejected
+
+SCHEMA = {"Order": ["Id", "CustomerId"], "Customer": ["Id", "Region"], "Product": ["Id", "Price"]}
+
+
+def test_complexity_separates_simple_and_complex_questions():
+    simple = router.complexity("how many customers are there?", SCHEMA)
+    hard = router.complexity(
+        "total order value per region for customers who ordered products, compared with the previous year", SCHEMA,
+    )
+    assert simple["score"] < router.ROUTER_FAST_MAX_SCORE <= hard["score"]
+    assert hard["tables"] == ["Customer", "Order", "Product"]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE Customer (Id INTEGER PRIMARY KEY, Region TEXT)")
+    return llm._open_sql_database(f"sqlite:///{path}")
+
+
+def test_failed_fast_tier_escalates_to_strong(db, monkeypatch):
+    calls = []
+
+    def fake_run_question(question, user_id, db_name, model_name, provider, session, **kwargs):
+        calls.append(model_name)
+        if model_name == "small":
+            raise HTTPException(500, "Error executing SQL: no such column")
+        return {"sql": "SELECT 1"}
+
+    monkeypatch.setenv("ROUTER_TIERS_OPENAI", "small,large")
+    monkeypatch.setattr(llm, "run_question", fake_run_question)
+    run = router.run_routed("how many customers?", 1, "t", "openai", None, db=db)
+
+    assert calls == ["small", "large"]
+    assert run["model"] == "large" and run["router"]["escalated"]
+    stats = {s["model"]: s for s in router.router_stats()}
+    assert stats["small"]["success_rate"] == 0 and stats["large"]["escalated_to"] >= 1
+
+
+def test_client_errors_are_not_escalated(db, monkeypatch):
+    def fake_run_question(*args, **kwargs):
+        raise HTTPException(404, "No API key for openai")
+
+    monkeypatch.setenv("ROUTER_TIERS_OPENAI", "small,large")
+    monkeypatch.setattr(llm, "run_question", fake_run_question)
+    with pytest.raises(HTTPException) as exc:
+        router.run_routed("how many customers?", 1, "t", "openai", None, db=db)
+    assert exc.value.status_code == 404
+
+
+def test_bulkhead_rejections_are_not_escalated(db, monkeypatch):
+    calls = []
+
+    def fake_run_question(question, user_id, db_name, model_name, provider, session, **kwargs):
+        calls.append(model_name)
+        raise BulkheadRejected("Database is saturated", retry_after=2)
+
+    monkeypatch.setenv("ROUTER_TIERS_OPENAI", "small,large")
+    monkeypatch.setattr(llm, "run_question", fake_run_question)
+    with pytest.raises(BulkheadRejected):
+        router.run_routed("how many customers?", 1, "t", "openai", None, db=db)
+    assert calls == ["small"]
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.profiler as profiler
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(500))
+
+
+def test_profile_request_saves_tagged_folded_stacks(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    with profiler.profile_request(user_id=7, connection_name="sales", model="gpt-4o") as meta:
+        _spin(0.1)
+        meta["sql"] = "SELECT 1"
+
+    saved = profiler.get_profile(meta["id"])
+    assert saved["user_id"] == 7 and saved["connection_name"] == "sales"
+    assert saved["sql_hash"] and saved["samples"] > 0
+    with open(profiler.get_profile_folded_path(meta["id"])) as f:
+        assert "_spin" in f.read()
+    assert [p["id"] for p in profiler.list_profiles(user_id=7)] == [meta["id"]]
+    assert profiler.list_profiles(user_id=8) == []
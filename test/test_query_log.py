@@ -0,0 +1,52 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+from sqlmodel import Session, SQLModel, create_engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.query_log as query_log
+from db.model import Connection, User
+
+
+def test_answers_are_written_behind_and_ranked_by_execution_time(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'meta.sqlite3'}")
+    SQLModel.metadata.create_all(engine)
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.add(User(id=1, name="a", email="a@x", password="p", created_at=now, updated_at=now))
+        session.add(Connection(
+            id=1, user_id=1, db_type="sqlite", connection_name="sales.sqlite", created_at=now, updated_at=now,
+        ))
+        session.commit()
+    monkeypatch.setattr(query_log, "engine", engine)
+
+    for sql, ms in [("SELECT 1", 5.0), ("SELECT * FROM big", 900.0), ("SELECT * FROM big", 700.0)]:
+        result = {"last_sql_query": sql, "execution_ms": ms, "total_records": 10}
+        query_log.record_answer(1, "sales.sqlite", "q", "openai", "gpt-4o", duration_ms=ms + 50, result=result)
+    # a repeat served from the result cache ran nothing: it must not drag the average down
+    query_log.record_answer(1, "sales.sqlite", "q", "openai", "gpt-4o", duration_ms=4, result={
+        "last_sql_query": "SELECT * FROM big", "execution_ms": 0.4, "total_records": 10, "result_cache_hit": True,
+    })
+    query_log.record_answer(1, "sales.sqlite", "bad", "openai", "gpt-4o", duration_ms=3, error="boom")
+    query_log.flush_query_log()
+
+    slow = query_log.slow_queries(1)
+    assert [r["sql"] for r in slow] == ["SELECT * FROM big", "SELECT 1"]
+    assert slow[0]["runs"] == 2 and slow[0]["avg_execution_ms"] == 800.0
+    history = query_log.query_history(1)
+    assert len(history) == 5 and history[0]["status"] == "error" and history[1]["result_cache_hit"]
+
+
+def test_flush_writes_an_item_the_worker_already_took():
+    import time
+    from core.write_behind import WriteBehindQueue
+
+    written = []
+    q = WriteBehindQueue("test", written.extend, flush_interval=30)
+    q.put("last")
+    deadline = time.monotonic() + 5
+    while q._queue.qsize() and time.monotonic() < deadline:
+        time.sleep(0.01)  # the worker holds it while it waits for a batch
+    q.flush()
+    assert written == ["last"]
@@ -0,0 +1,33 @@
+import os
+import sqlite3
+import sys
+
+from sqlalchemy import create_engine, event, inspect
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.reflection import reflect_catalog
+
+
+def test_sqlite_catalog_matches_inspector_in_constant_round_trips(tmp_path):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE customer (id TEXT PRIMARY KEY, name VARCHAR(40) NOT NULL)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id TEXT REFERENCES customer, total REAL)")
+        conn.execute("CREATE TABLE line (order_id INT REFERENCES orders(id), n INT, PRIMARY KEY (order_id, n))")
+        for i in range(40):
+            conn.execute(f"CREATE TABLE extra_{i} (a INT, b TEXT)")
+        conn.execute("CREATE VIEW big_orders AS SELECT * FROM orders WHERE total > 100")
+    engine = create_engine(f"sqlite:///{path}")
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    catalog = reflect_catalog(engine)
+
+    assert len(statements) == 2
+    insp = inspect(engine)
+    for table in insp.get_table_names():
+        assert [c["name"] for c in catalog[table]["columns"]] == [c["name"] for c in insp.get_columns(table)]
+    assert catalog["line"]["pk"] == ["order_id", "n"]
+    assert catalog["orders"]["fks"] == [{"column": "customer_id", "referred_table": "customer", "referred_column": "id"}]
+    assert catalog["customer"]["columns"][1] == {"name": "name", "type": "VARCHAR(40)", "nullable": False}
+    assert catalog["big_orders"]["kind"] == "view"
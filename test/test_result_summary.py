@@ -0,0 +1,58 @@
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.result_summary import summarize_frame, summarize_rows
+
+
+def test_chunked_stats_match_whole_frame():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "amount": rng.normal(100, 10, 10_000),
+        "country": rng.choice(["US", "DE", None], 10_000, p=[0.6, 0.3, 0.1]),
+    })
+    cols = {c["name"]: c for c in summarize_frame(df, chunk_rows=997).summary()["columns"]}
+    assert cols["amount"]["min"] == df["amount"].min()
+    assert abs(cols["amount"]["mean"] - df["amount"].mean()) < 1e-9
+    assert cols["country"]["nulls"] == df["country"].isna().sum()
+    assert cols["country"]["top"][0] == ("US", (df["country"] == "US").sum())
+    assert abs(sum(b["approx_count"] for b in cols["amount"]["histogram"]) - 10_000) <= 5
+
+
+def test_description_is_bounded_regardless_of_row_count():
+    rows = [(i, f"name {i % 7}") for i in range(50_000)]
+    summary = summarize_rows(["id", "name"], [rows[:20_000], rows[20_000:]])
+    text = summary.describe(max_chars=400)
+    assert text.startswith("The query returned 50000 row(s)")
+    assert len(text) <= 400 and "name 0" in text
+
+
+def test_high_cardinality_text_keeps_a_distinct_lower_bound():
+    df = pd.DataFrame({"code": [f"c{i}" for i in range(5000)]})
+    assert "all distinct" in summarize_frame(df).describe()
+    chunked = summarize_frame(df, chunk_rows=700)
+    [col] = chunked.summary()["columns"]
+    assert col["distinct_at_least"] > 1024 and len(col["top"]) == 3
+    assert f"; {col['distinct_at_least']}+ distinct;" in chunked.describe()
+
+
+def test_tz_aware_datetimes_are_summarized_in_utc():
+    stamps = pd.date_range("2024-01-01 01:00", periods=3, freq="h", tz="Europe/Berlin")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        from_frame = summarize_frame(pd.DataFrame({"t": stamps})).summary()["columns"][0]
+        from_rows = summarize_rows(["t"], [[(t.to_pydatetime(),) for t in stamps]]).summary()["columns"][0]
+    assert from_frame["min"] == from_rows["min"] == "2024-01-01"
+    assert from_frame["max"] == from_rows["max"] == "2024-01-01 02:00:00"
+
+
+def test_sequence_cells_are_summarized_as_values():
+    # e.g. Postgres array columns: each cell is a list, of the same length as the row or not
+    rows = [(1, [1, 2]), (2, [1, 2]), (3, ["a"]), (4, None)]
+    cols = {c["name"]: c for c in summarize_rows(["id", "tags"], [rows[:2], rows[2:]]).summary()["columns"]}
+    assert cols["id"]["max"] == 4
+    assert cols["tags"]["nulls"] == 1 and cols["tags"]["top"][0] == ("[1, 2]", 2)
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.saved_query_index as idx
+
+
+@pytest.fixture(autouse=True)
+def _index_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(idx, "SAVED_QUERY_INDEX_PATH", str(tmp_path / "fts.sqlite3"))
+
+
+def test_ranked_prefix_search_is_per_user_and_paginated():
+    idx.index_saved_query(1, "rev", "Total revenue by region", "SELECT region, SUM(total) FROM orders", "3 rows")
+    idx.index_saved_query(1, "cust", "Customers in Germany", "SELECT * FROM customers WHERE country = 'Germany'",
+                          "revenue is not in this result")
+    idx.index_saved_query(2, "other", "Revenue for user two", "SELECT 1", "")
+    for i in range(25):
+        idx.index_saved_query(1, f"bulk{i}", f"Orders shipped in week {i}", "SELECT * FROM orders", "")
+
+    result = idx.search_saved_queries(1, "reven")
+    assert [r["query_key"] for r in result["results"]] == ["rev", "cust"]  # question hits outrank answer hits
+    assert "[revenue]" in result["results"][0]["highlight"].lower()
+
+    page = idx.search_saved_queries(1, "orders week", page=3, page_size=10)
+    assert page["total"] == 25 and len(page["results"]) == 5
+
+
+def test_resave_and_delete_update_the_index():
+    idx.index_saved_query(1, "k", "Old question", "SELECT 1", "")
+    idx.index_saved_query(1, "k", "New question about freight", "SELECT 1", "")
+    assert idx.search_saved_queries(1, "old")["total"] == 0
+    assert idx.search_saved_queries(1, "freight")["total"] == 1
+
+    idx.remove_saved_query(1, "k")
+    assert idx.search_saved_queries(1, "freight")["total"] == 0
+    assert idx.search_saved_queries(1, '" OR *')["results"] == []
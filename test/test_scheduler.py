@@ -0,0 +1,130 @@
+import os
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.cancellation import CancelToken, RequestCancelled
+from core.scheduler import FairScheduler, SchedulerFull
+
+
+def test_burst_from_one_user_does_not_starve_another():
+    sched = FairScheduler(max_concurrency=1, max_queue=50, max_per_user=20, max_wait=5)
+    order = []
+    lock = threading.Lock()
+
+    # Hold the only slot so every request below has to queue
+    blocker = sched.acquire(99, "openai", 1)
+
+    def worker(uid):
+        with sched.slot(uid, "openai", 1):
+            with lock:
+                order.append(uid)
+
+    threads = [threading.Thread(target=worker, args=(1,)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    late = threading.Thread(target=worker, args=(2,))
+    late.start()
+    time.sleep(0.1)
+
+    sched.release(blocker, 0.01)
+    for t in threads + [late]:
+        t.join(timeout=5)
+
+    assert len(order) == 6
+    # user 2 arrived after user 1's whole burst but is served within the first two slots
+    assert order.index(2) <= 1
+
+
+def test_full_queue_raises_with_retry_after():
+    sched = FairScheduler(max_concurrency=1, max_queue=1, max_per_user=1, max_wait=1)
+    held = sched.acquire(1, "openai", 1)
+    waiter = threading.Thread(target=lambda: sched.release(sched.acquire(2, "openai", 1), 0))
+    waiter.start()
+    time.sleep(0.05)
+
+    with pytest.raises(SchedulerFull) as exc:
+        sched.acquire(3, "openai", 1)
+    assert exc.value.retry_after >= 1
+    assert sched.metrics()["rejected_total"] == 1
+
+    sched.release(held, 0)
+    waiter.join(timeout=2)
+
+
+def test_rate_limit_headers_update_buckets():
+    sched = FairScheduler()
+    resp = httpx.Response(
+        200,
+        headers={
+            "x-ratelimit-limit-requests": "60",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-limit-tokens": "1000",
+            "x-ratelimit-remaining-tokens": "400",
+        },
+    )
+    sched.observe_response("openai", resp)
+    provider = sched.metrics()["providers"]["openai"]
+    assert provider["rpm_limit"] == 60
+    assert provider["rpm_available"] < 1
+    assert provider["tpm_limit"] == 1000
+
+
+def test_threaded_waiter_is_dequeued_when_its_request_is_cancelled():
+    sched = FairScheduler(max_concurrency=1, max_queue=10, max_per_user=10, max_wait=30)
+    held = sched.acquire(1, "openai", 1)
+    token = CancelToken()
+    outcome = []
+
+    def waiter():
+        try:
+            token.run(sched.acquire, 2, "openai", 1)
+        except RequestCancelled as e:
+            outcome.append(e.status_code)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    token.cancel("client disconnected")
+    thread.join(timeout=2)
+    assert outcome == [499] and time.monotonic() - started < 1
+    assert sched.metrics()["queued"] == 0
+    sched.release(held, 0)
+
+
+def test_generation_reserves_the_counted_prompt_tokens(monkeypatch):
+    from contextlib import contextmanager
+    from types import SimpleNamespace
+    import core.llm as llm
+    from core.scheduler import SCHEDULER_COMPLETION_TOKENS
+
+    reserved = []
+
+    @contextmanager
+    def slot(user_id, provider, estimated_tokens):
+        reserved.append(estimated_tokens)
+        yield
+
+    monkeypatch.setattr(llm, "scheduler", SimpleNamespace(slot=slot))
+    monkeypatch.setattr(llm, "_build_prompt", lambda *a: "prompt")
+    monkeypatch.setattr(llm, "count_tokens", lambda text, model: 5000)
+    monkeypatch.setattr(llm, "_invoke_llm", lambda model, prompt: SimpleNamespace(content="SELECT 1"))
+    monkeypatch.setattr(llm, "record_prompt", lambda *a: None)
+    monkeypatch.setattr(llm, "metered_call", lambda *a: _Call())
+
+    assert llm._generate_sql(None, None, "q", 1, "db", "gpt-4o", "openai")[1] == 5000
+    assert reserved == [5000 + SCHEDULER_COMPLETION_TOKENS]
+
+
+class _Call:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
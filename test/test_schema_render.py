@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import BigInteger, DateTime, Numeric, String
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.prompt_metrics as prompt_metrics
+from core.llm import _open_sql_database
+from core.schema_render import abbreviate_type, render_compact_table_info, render_ddl_table_info
+
+
+def test_types_are_abbreviated():
+    assert [abbreviate_type(t) for t in (BigInteger(), Numeric(10, 2), String(40), DateTime())] == \
+        ["int", "num", "str", "ts"]
+    assert [abbreviate_type(t) for t in ("bigserial", "smallserial", "serial", "interval", "varchar(40)")] == \
+        ["int", "int", "int", "interval", "str"]
+    assert abbreviate_type("geometry(Point,4326)") == "geometry"
+
+
+def test_compact_rendering_limits_and_truncates_sample_rows(tmp_path):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customer(id), "
+                     "freight NUMERIC)")
+        conn.executemany("INSERT INTO customer VALUES (?, ?)", [(i, "x" * 50) for i in range(5)])
+
+    db = _open_sql_database(f"sqlite:///{path}")
+    text = render_compact_table_info(db, sample_rows=2, max_value_len=10)
+    lines = text.splitlines()
+    assert lines[0] == "customer(id int PK, name str)"
+    assert lines[1:3] == ["  e.g. (0, 'xxxxxxxxx…')", "  e.g. (1, 'xxxxxxxxx…')"]
+    assert lines[3] == "orders(id int PK, customer_id int→customer.id, freight num)"
+    assert len(lines) == 4
+    assert render_compact_table_info(db, ["orders"]) == lines[3]
+
+
+def test_prompt_tokens_are_averaged_per_connection_and_mode(monkeypatch):
+    monkeypatch.setattr(prompt_metrics, "_stats",
+                        defaultdict(lambda: {"requests": 0, "prompt_tokens": 0, "generation_ms": 0.0}))
+    monkeypatch.setattr(prompt_metrics, "_encoding_for", lambda model: None)
+    assert prompt_metrics.count_tokens("x" * 400) == 100  # character fallback
+    assert prompt_metrics.count_tokens("") == 1
+
+    prompt_metrics.record_prompt(1, "sales", "compact", 100, 20.0)
+    prompt_metrics.record_prompt(1, "sales", "compact", 300, 40.0)
+    prompt_metrics.record_prompt(1, "sales", "ddl", 900, 90.0)
+    prompt_metrics.record_prompt(2, "sales", "ddl", 5, 1.0)
+    assert prompt_metrics.prompt_stats(1) == [
+        {"connection_name": "sales", "schema_mode": "compact", "requests": 2,
+         "avg_prompt_tokens": 200.0, "avg_generation_ms": 30.0},
+        {"connection_name": "sales", "schema_mode": "ddl", "requests": 1,
+         "avg_prompt_tokens": 900.0, "avg_generation_ms": 90.0},
+    ]
+
+
+def test_ddl_rendering_comes_from_the_catalog(tmp_path, monkeypatch):
+    path = tmp_path / "t.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE artist (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        conn.execute("CREATE TABLE album (id INTEGER PRIMARY KEY, title NVARCHAR(160), "
+                     "artist_id INTEGER REFERENCES artist(id))")
+        conn.execute("INSERT INTO artist VALUES (1, 'AC/DC')")
+
+    db = _open_sql_database(f"sqlite:///{path}")
+    monkeypatch.setattr(db, "get_table_info", lambda *a, **k: pytest.fail("per-table reflection"))
+    text = render_ddl_table_info(db, sample_rows=3)
+    assert "CREATE TABLE album (\n\tid INTEGER NOT NULL, \n\ttitle NVARCHAR(160), \n\tartist_id INTEGER, \n" \
+           "\tPRIMARY KEY (id), \n\tFOREIGN KEY(artist_id) REFERENCES artist (id)\n)" in text
+    assert "/*\n3 rows from artist table:\nid\tname\n1\tAC/DC\n*/" in text
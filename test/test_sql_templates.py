@@ -0,0 +1,56 @@
+import os
+import sys
+
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.sql_templates import bind_template, build_template, render_sql
+
+
+def test_literal_variant_binds_without_llm():
+    template = build_template(
+        "orders for customer alfki",
+        "SELECT OrderID FROM Orders WHERE CustomerID = 'ALFKI' AND Note <> 'a:b'",
+    )
+    params = bind_template(template, "Orders for customer bonap")
+    # the LLM upper-cased the id, so the new literal is upper-cased too
+    assert params == {"p0": "BONAP"}
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE Orders (OrderID INT, CustomerID TEXT, Note TEXT)"))
+        conn.execute(text("INSERT INTO Orders VALUES (1, 'ALFKI', ''), (2, 'BONAP', '')"))
+        rows = conn.execute(text(template["sql"]), params).fetchall()
+    assert rows == [(2,)]
+    assert render_sql(template, params).endswith("CustomerID = 'BONAP' AND Note <> 'a:b'")
+
+
+def test_different_shape_does_not_match():
+    template = build_template("top 5 products", "SELECT name FROM products LIMIT 5")
+    assert bind_template(template, "top 12 products") == {"p0": 12}
+    assert bind_template(template, "top five products") is None
+    assert bind_template(template, "top 5 products by price") is None
+    assert build_template("all products", "SELECT name FROM products") is None
+
+
+def test_slot_bound_to_a_non_literal_word_falls_back_to_the_llm(monkeypatch):
+    import core.sql_templates as sql_templates
+    import core.value_index as value_index
+    from core.cache import Cache, MemoryBackend
+
+    cache = Cache(MemoryBackend())
+    monkeypatch.setattr(sql_templates, "get_cache", lambda: cache)
+    monkeypatch.setattr(value_index, "ensure_value_index", lambda db_url: None)
+    url = "sqlite:///t.sqlite"
+    sql_templates.remember_template(url, "gpt-4o", "how many customers are in germany",
+                                    "SELECT COUNT(*) FROM Customers WHERE Country = 'Germany'")
+
+    assert sql_templates.match_template(url, "gpt-4o", "how many customers are in total") is None
+    assert sql_templates.match_template(url, "gpt-4o", "how many customers are in spain")[1] == {"p0": "Spain"}
+
+    # once the value index knows the column, only its values bind
+    index = value_index.ValueIndex()
+    index.set_column("Customers", "Country", ["France", "Germany"])
+    monkeypatch.setattr(value_index, "ensure_value_index", lambda db_url: index)
+    assert sql_templates.match_template(url, "gpt-4o", "how many customers are in spain") is None
+    assert sql_templates.match_template(url, "gpt-4o", "how many customers are in france")[1] == {"p0": "France"}
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.db import get_engine
+from core.sqlite_profile import sqlite_url, is_read_only_sqlite, SQLITE_READERS
+
+
+def test_analytics_connections_get_a_shared_read_only_pool(tmp_path):
+    path = str(tmp_path / "sales data.sqlite")  # spaces survive the file: URI
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (x INT)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+
+    url = sqlite_url(path)
+    assert is_read_only_sqlite(url) and not is_read_only_sqlite(sqlite_url(path, writable=True))
+    engine = get_engine(url, count_hit=False)
+    assert get_engine(url, count_hit=False) is engine
+    assert isinstance(engine.pool, QueuePool) and engine.pool.size() == SQLITE_READERS
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT SUM(x) FROM t")).scalar() == 45
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+        assert conn.execute(text("PRAGMA cache_size")).scalar() < -2000
+        with pytest.raises(OperationalError):
+            conn.execute(text("DELETE FROM t"))
+
+    # immutable files still read; missing files are not silently created
+    with get_engine(sqlite_url(path, immutable=True), count_hit=False).connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 10
+    with pytest.raises(OperationalError):
+        with get_engine(sqlite_url(str(tmp_path / "missing.sqlite")), count_hit=False).connect():
+            pass
+    assert not os.path.exists(tmp_path / "missing.sqlite")
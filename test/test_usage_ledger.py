@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from sqlmodel import SQLModel, create_engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.usage_ledger as usage_ledger
+from core.cancellation import RequestCancelled
+from core.write_behind import WriteBehindQueue
+
+
+def test_calls_are_ledgered_and_rolled_up_per_hour(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'meta.sqlite3'}")
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(usage_ledger, "engine", engine)
+    queue = WriteBehindQueue("usage_ledger_test", usage_ledger._flush, flush_interval=0.05)
+    monkeypatch.setattr(usage_ledger, "_queue", queue)
+
+    usage = {"input_tokens": 1200, "output_tokens": 40, "total_tokens": 1240}
+    for _ in range(2):
+        with usage_ledger.metered_call(1, "sales", "openai", "gpt-4o", "generate", 1000) as call:
+            usage_ledger.note_response(None)
+            usage_ledger.note_response(None)  # one client-side retry
+            call.message = AIMessage(content="SELECT 1", usage_metadata=usage)
+    # no usage reported: tokens are counted locally
+    with usage_ledger.metered_call(1, "sales", "openai", "gpt-4o-mini", "edit", 300) as call:
+        call.message = AIMessage(content="SELECT 2")
+    with pytest.raises(RequestCancelled):
+        with usage_ledger.metered_call(2, "hr", "openai", "gpt-4o", "generate", 500):
+            raise RequestCancelled("client disconnected", 499)
+    deadline = time.monotonic() + 5
+    while queue.stats().get("written", 0) < 4 and time.monotonic() < deadline:
+        usage_ledger.flush_usage()  # the writer thread may be holding the first event
+        time.sleep(0.05)
+
+    assert usage_ledger.rollup() == 3
+    assert usage_ledger.rollup() == 3  # idempotent
+
+    report = usage_ledger.usage_report(1, group_by=["connection_name", "model"])
+    by_model = {r["model"]: r for r in report["rows"]}
+    assert set(by_model) == {"gpt-4o", "gpt-4o-mini"}
+    heavy = by_model["gpt-4o"]
+    assert (heavy["calls"], heavy["retries"], heavy["prompt_tokens"], heavy["completion_tokens"]) == (2, 2, 2400, 80)
+    assert heavy["cost_usd"] == round((2400 * 2.5 + 80 * 10) / 1e6, 4)
+    assert by_model["gpt-4o-mini"]["estimated_calls"] == 1 and by_model["gpt-4o-mini"]["prompt_tokens"] == 300
+
+    everyone = usage_ledger.usage_report(None, group_by=["user_id"])
+    assert {r["user_id"]: r["calls"] for r in everyone["rows"]} == {1: 3, 2: 1}
@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.value_index import ValueIndex
+
+
+def _index():
+    index = ValueIndex()
+    index.set_column("Category", "CategoryName", ["Beverages", "Condiments", "Dairy Products", "Seafood"])
+    index.set_column("Customer", "Country", ["Germany", "Mexico", "UK", "USA"])
+    index.rebuild()
+    return index
+
+
+def test_question_phrases_find_exact_stored_literals():
+    matches = _index().lookup("total sales of beverage in germany")
+    found = {(m["column"], m["value"]) for m in matches}
+    assert ("CategoryName", "Beverages") in found
+    assert ("Country", "Germany") in found
+    assert ("CategoryName", "Seafood") not in found
+
+
+def test_unchanged_column_is_not_reindexed():
+    index = _index()
+    assert index.set_column("Customer", "Country", ["USA", "UK", "Mexico", "Germany"]) is False
+    assert index.set_column("Customer", "Country", ["USA", "France"]) is True
+
+
+def test_refresh_swaps_in_a_new_columns_dict(tmp_path, monkeypatch):
+    import sqlite3
+    import core.value_index as value_index
+    from core.sqlite_profile import sqlite_url
+
+    path = str(tmp_path / "shop.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE Customer (Country TEXT)")
+        conn.executemany("INSERT INTO Customer VALUES (?)", [("France",), ("Spain",)])
+    url = sqlite_url(path)
+    index = _index()
+    monkeypatch.setitem(value_index._indexes, url, index)
+    monkeypatch.setattr(value_index, "_text_columns", lambda db_url: [("Customer", "Country")])
+
+    seen = index.columns  # what a template lookup may be iterating
+    value_index._refresh(url, full=True)
+    assert index.columns == {("Customer", "Country"): ("France", "Spain")}
+    assert ("Category", "CategoryName") in seen and len(seen) == 2  # never edited in place
+    assert {m["value"] for m in index.lookup("customers in spain")} == {"Spain"}
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.cache as cache_mod
+import core.llm as llm
+import core.warmup as warmup
+from core.cache import Cache, SQLiteBackend
+
+
+def _fresh(monkeypatch, **settings):
+    submitted = []
+    monkeypatch.setattr(warmup, "_last_warmed", {})
+    monkeypatch.setattr(warmup, "_counters", warmup.defaultdict(int))
+    monkeypatch.setattr(warmup, "_hits", warmup.defaultdict(lambda: {"warm": 0, "cold": 0}))
+    monkeypatch.setattr(warmup, "_pending", 0)
+    monkeypatch.setattr(warmup._executor, "submit", lambda fn, *args: submitted.append(args))
+    for name, value in settings.items():
+        monkeypatch.setattr(warmup, name, value)
+    return submitted
+
+
+def test_a_user_is_warmed_once_per_cooldown(monkeypatch):
+    submitted = _fresh(monkeypatch, WARMUP_COOLDOWN=300)
+    assert warmup.schedule_user_warmup(1, ["sales"]) is True
+    assert warmup.schedule_user_warmup(1, ["sales"]) is False
+    assert warmup.schedule_user_warmup(2) is True
+    assert submitted == [(1, ["sales"]), (2, None)]
+    metrics = warmup.warmup_metrics()
+    assert (metrics["warmups_scheduled"], metrics["warmups_skipped_recent"], metrics["pending"]) == (2, 1, 2)
+
+
+def test_warmups_are_skipped_while_the_queue_is_full(monkeypatch):
+    submitted = _fresh(monkeypatch, WARMUP_MAX_PENDING=1)
+    assert warmup.schedule_user_warmup(1) is True
+    assert warmup.schedule_user_warmup(2) is False
+    assert len(submitted) == 1 and warmup.warmup_metrics()["warmups_skipped_busy"] == 1
+
+
+def test_hit_rates(monkeypatch):
+    _fresh(monkeypatch)
+    for warm in (True, True, True, False):
+        warmup.record_hit("engine", warm)
+    assert warmup.warmup_metrics()["hit_rates"]["engine"] == {"warm": 3, "cold": 1, "warm_rate": 0.75}
+
+
+def test_forgotten_api_keys_are_dropped_by_every_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_mod, "CACHE_EVENT_POLL", 0)
+    path = str(tmp_path / "cache.sqlite3")
+    a, b = Cache(SQLiteBackend(path)), Cache(SQLiteBackend(path))
+    monkeypatch.setattr(llm, "_api_keys", {(1, "openai"): ("sk-old", time.monotonic() + 60)})
+
+    # worker b holds the decrypted key; worker a handles the key update
+    monkeypatch.setattr(llm, "get_cache", lambda: b)
+    monkeypatch.setattr(llm, "_api_key_listener", False)
+    llm._listen_for_api_key_changes()
+    monkeypatch.setattr(llm, "get_cache", lambda: a)
+    monkeypatch.setattr(llm, "_api_key_listener", False)
+    llm.forget_api_keys(1)
+
+    # b's copy (the same dict here, so put it back) goes on b's next poll
+    monkeypatch.setattr(llm, "get_cache", lambda: b)
+    llm._api_keys[(1, "openai")] = ("sk-old", time.monotonic() + 60)
+    llm._api_keys[(2, "openai")] = ("sk-other", time.monotonic() + 60)
+    llm._listen_for_api_key_changes()
+    assert list(llm._api_keys) == [(2, "openai")]